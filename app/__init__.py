@@ -1,14 +1,19 @@
 # app/__init__.py
 
+import logging
+
 from flask import Flask
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_restx import Api
 from .config import Config
+from .replicas import RoutingSession
+from .sharding import todos_version
+
+logger = logging.getLogger(__name__)
 
-db = SQLAlchemy()
-migrate = Migrate()
+# RoutingSession sends the statements of replica-routed read requests to their replica
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def create_app(config_class=Config):
     """Application factory for creating Flask app instances."""
@@ -19,7 +24,7 @@ def create_app(config_class=Config):
     if hasattr(config_class, "validate"):
         config_class.validate()
 
-    print("DEBUG (create_app): SQLALCHEMY_DATABASE_URI in config:", app.config.get("SQLALCHEMY_DATABASE_URI"))
+    logger.debug("SQLALCHEMY_DATABASE_URI in config: %s", app.config.get("SQLALCHEMY_DATABASE_URI"))
 
     # Enable Cross-Origin Resource Sharing (CORS)
     CORS(app)
@@ -27,21 +32,81 @@ def create_app(config_class=Config):
     # Initialize database
     db.init_app(app)
 
+    # Hash-sharded todos: single-shard routing by id, scatter-gather listings
+    if app.config['TODOS_SHARD_URIS']:
+        if (app.config['SQLALCHEMY_REPLICA_URIS'] or app.config['TODOS_GROUP_COMMIT_ENABLED']
+                or app.config['TODOS_EVENTS_ENABLED']):
+            raise ValueError('TODOS_SHARD_URIS cannot be combined with read replicas, group commit '
+                             'or todo events')
+        from .sharding import TodoShards
+        TodoShards(app)
+
+    # Read replicas for the read-only todos views, with read-your-writes stickiness
+    if app.config['SQLALCHEMY_REPLICA_URIS']:
+        from .replicas import ReplicaRouter
+        ReplicaRouter(app)
+
+    # Per-endpoint request metrics, served at /api/metrics
+    if app.config['METRICS_ENABLED']:
+        from .metrics import RequestMetrics
+        RequestMetrics(app)
+
+    # Per-request SQL statement counts and timings (Server-Timing header, N+1 warnings)
+    if app.config['SQL_PROFILING_ENABLED']:
+        from .profiling import SQLProfiler
+        SQLProfiler(app)
+
+    # gzip/brotli response compression; registered after the metrics so they record compressed sizes
+    if app.config['COMPRESSION_ENABLED']:
+        from .compression import ResponseCompressor
+        ResponseCompressor(app)
+
     # Import models here to ensure they're registered with SQLAlchemy before initializing migrations
-    from .models import Todo  # Import all models here
+    from .models import Todo, IdSequence, ImportCheckpoint, TableVersion, TodoEvent, TodoTombstone  # Import all models here
+
+    # Initialize migrations after models are imported; Flask-Migrate pulls in Alembic, so lean
+    # workers skip it and only the process running `flask db` needs it
+    if app.config['MIGRATIONS_ENABLED']:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    # Read-through cache for single todos, invalidated across workers by the todos version stamp
+    if app.config['TODOS_CACHE_ENABLED']:
+        from .cache import TodoCache
+        from .routes.todos import _changed_todo_ids
+        app.extensions['todo_cache'] = TodoCache(
+            max_size=app.config['TODOS_CACHE_MAX_SIZE'],
+            ttl=app.config['TODOS_CACHE_TTL'],
+            version_loader=todos_version,
+            version_check_interval=app.config['TODOS_CACHE_VERSION_CHECK_INTERVAL'],
+            changes_loader=_changed_todo_ids,
+        )
 
-    # Initialize migrations after models are imported
-    migrate.init_app(app, db)
+    # Coalesce concurrent todo creations into one INSERT and commit per batch
+    if app.config['TODOS_GROUP_COMMIT_ENABLED']:
+        from .group_commit import GroupCommitter
+        app.extensions['group_commit'] = GroupCommitter(
+            app,
+            flush_interval=app.config['TODOS_GROUP_COMMIT_INTERVAL'],
+            max_batch_size=app.config['TODOS_GROUP_COMMIT_MAX_BATCH'],
+        )
 
-    # Initialize Flask-RESTx API
+    # Push todo create/update/delete events to GET /api/todos/events streams
+    if app.config['TODOS_EVENTS_ENABLED']:
+        from .events import create_broker
+        app.extensions['todo_events'] = create_broker(app)
+
+    # Initialize Flask-RESTx API; the Swagger spec itself is only built on the first docs request
+    docs_enabled = app.config['API_DOCS_ENABLED']
     api = Api(
-        app,
         version='1.0',
         title='Todo Management API',
         description='API documentation for Todo Management System',
-        doc='/api/docs',  # Swagger UI available at /api/docs
+        doc='/api/docs' if docs_enabled else False,  # Swagger UI available at /api/docs
         strict_slashes=False  # Disable strict slash enforcement globally
     )
+    # Api() only honours add_specs when passed to init_app
+    api.init_app(app, add_specs=docs_enabled)  # /swagger.json
 
     # Import and register namespaces
     from .routes.main import main_bp
@@ -53,4 +118,13 @@ def create_app(config_class=Config):
     api.add_namespace(helloworld_bp, path='/api/helloworld')  # Hello World route
     api.add_namespace(todos_bp, path='/api/todos')  # Todos routes
 
+    # `flask todos ...` commands (bulk import)
+    from .cli import todos_cli
+    app.cli.add_command(todos_cli)
+
+    # Serve /swagger.json from bytes encoded once, rebuilt only when the routes change
+    if docs_enabled:
+        from .swagger import SpecCache
+        SpecCache(app, api, max_age=app.config['SWAGGER_CACHE_MAX_AGE']).install()
+
     return app
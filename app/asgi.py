@@ -0,0 +1,414 @@
+# app/asgi.py
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from flask_restx import marshal
+from sqlalchemy import case, delete, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import RedirectResponse, Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import parse_etags, quote_etag
+from werkzeug.wrappers import Request as WerkzeugRequest
+
+from . import create_app
+from .config import Config
+from .events import Event, batch_events, batch_statement
+from .models import TableVersion, Todo, TodoTombstone
+from .routes import todos as views
+
+# Async drivers substituted for the sync ones when ASYNC_SQLALCHEMY_DATABASE_URI is not set
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'mysql': 'mysql+aiomysql'}
+
+
+def async_database_uri(uri):
+    """Return ``uri`` with its driver swapped for the asyncio one (e.g. pymysql -> aiomysql)."""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for '{backend}'; set ASYNC_SQLALCHEMY_DATABASE_URI")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def _engine_options(uri, options):
+    """Adapt SQLALCHEMY_ENGINE_OPTIONS to the async engine."""
+    # MeteredQueuePool is a sync pool; size its asyncio counterpart the same way
+    options = dict(options)
+    if options.pop('poolclass', None) is not None:
+        options['poolclass'] = AsyncAdaptedQueuePool
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # One shared connection, as Flask-SQLAlchemy does for in-memory SQLite
+        options = {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+    return options
+
+
+class AsyncTodosAPI:
+    """The todos resources of ``app/routes/todos.py`` served over ASGI with an async engine.
+
+    Routes, arguments, validation messages and JSON bodies are the same as in
+    the Flask views, whose parser, validators and statement builders are
+    reused under the Flask app's context; only the I/O is async, so a
+    request waiting on the database does not hold a thread.
+    """
+
+    def __init__(self, flask_app, engine):
+        self.flask_app = flask_app
+        self.engine = engine
+        self.sessions = async_sessionmaker(engine, expire_on_commit=False)
+        self.events = flask_app.extensions.get('todo_events')
+        # The async counterpart of the broker's commit_lock, which would block the event loop
+        self._commit_lock = asyncio.Lock()
+
+    def routes(self):
+        collection = self._endpoint(self.todo_list)
+        batch = self._endpoint(self.todo_batch)
+        item = self._endpoint(self.todo)
+        return [
+            Route('/api/todos', _redirect_to_slash, methods=['GET', 'POST']),
+            Route('/api/todos/', collection, methods=['GET', 'POST']),
+            Route('/api/todos/changes', self._endpoint(self.list_changes), methods=['GET']),
+            Route('/api/todos/events', self._endpoint(self.stream_events), methods=['GET']),
+            Route('/api/todos/batch', batch, methods=['POST', 'PATCH', 'DELETE']),
+            Route('/api/todos/{id:int}', item, methods=['GET', 'PUT', 'DELETE']),
+            Route('/api/todos/{id:int}/', item, methods=['GET', 'PUT', 'DELETE']),
+        ]
+
+    def _endpoint(self, handler):
+        """Run ``handler`` in the Flask app context and render aborts as the Flask API does."""
+        async def endpoint(request):
+            with self.flask_app.app_context():
+                try:
+                    return await handler(request)
+                except HTTPException as error:
+                    body = getattr(error, 'data', None) or {'message': error.description}
+                    return _json(body, error.code)
+        return endpoint
+
+    # Listing and creation
+
+    async def todo_list(self, request):
+        if request.method == 'POST':
+            return await self.create_todo(request)
+        return await self.list_todos(request)
+
+    async def list_todos(self, request):
+        """List todos, optionally filtered, sorted and paged, or search them with q"""
+        config = self.flask_app.config
+        req = _werkzeug_request(request)
+        args = views.list_parser.parse_args(req=req)
+        stream = views._wants_stream(args, req)
+        fast = not stream and views._use_fast_serializer(req)
+        mask = views._mask(req)
+
+        async with self.sessions() as session:
+            version = await session.scalar(TableVersion.current_statement(Todo.__tablename__)) or 0
+            # Tagged exactly as the Flask listing, so both APIs agree on a representation's ETag
+            etag = views._etag('todos', version, sorted(req.args.items(multi=True)), mask, stream, fast)
+            if parse_etags(request.headers.get('if-none-match')).contains_weak(etag):
+                return Response(status_code=304, headers={'ETag': quote_etag(etag)})
+            headers = {'ETag': quote_etag(etag)}
+
+            statement = views._listing_statement(args, Todo.id, Todo.title)
+            if stream:
+                if args['limit'] is not None:
+                    statement = statement.limit(views._page_size(args['limit']))
+                return StreamingResponse(self._stream(statement, config['TODOS_STREAM_BATCH_SIZE']),
+                                         media_type=views.NDJSON_MIMETYPE, headers=headers)
+
+            if not views._is_paged(args):
+                rows = (await session.execute(statement)).all()
+            else:
+                limit = views._page_size(args['limit'])
+                rows = (await session.execute(statement.limit(limit + 1))).all()
+                if len(rows) > limit:
+                    rows = rows[:limit]
+                    next_cursor = views._next_cursor(args, limit, *rows[-1])
+                    headers.update(views._next_page_headers(*next_cursor, req=req))
+
+        if not fast:
+            todos = [{'id': todo_id, 'title': title} for todo_id, title in rows]
+            return _json(marshal(todos, views.todo_model, mask=mask), headers=headers)
+        return Response(views._encode_rows(rows), media_type='application/json', headers=headers)
+
+    async def _stream(self, statement, batch_size):
+        """Yield NDJSON batches from a server-side cursor, as the Flask streaming listing does."""
+        async with self.sessions() as session:
+            result = await session.stream(statement.execution_options(yield_per=batch_size))
+            async for rows in result.partitions():
+                yield ''.join(json.dumps({'id': todo_id, 'title': title}) + '\n'
+                              for todo_id, title in rows)
+
+    async def create_todo(self, request):
+        """Create a new todo"""
+        data = await _json_body(request)
+        if not data or 'title' not in data:
+            views.todos_bp.abort(400, 'Title is required')
+
+        async with self.sessions() as session:
+            todo = Todo(title=data['title'], version=await session.run_sync(Todo.next_change_version))
+            session.add(todo)
+            await session.flush()
+            await self._commit_and_publish(session, [Event(todo.version, todo.id, 'created', todo.title)])
+            return _json(marshal(todo, views.todo_model), 201)
+
+    async def list_changes(self, request):
+        """List creates, updates and deletes after a change version, for incremental sync"""
+        req = _werkzeug_request(request)
+        args = views.changes_parser.parse_args(req=req)
+        statement, limit = views._changes_statement(args)
+        async with self.sessions() as session:
+            version = await session.scalar(TableVersion.current_statement(Todo.__tablename__)) or 0
+            rows = (await session.execute(statement)).all()
+        body, cursor = views._changes_page(args, version, rows, limit)
+        headers = None
+        if cursor is not None:
+            headers = views._next_page_headers(f"{cursor['since']}:{cursor['after_id']}", cursor, req)
+        return _json(marshal(body, views.todo_changes_model), headers=headers)
+
+    async def stream_events(self, request):
+        """Stream todo created, updated and deleted events as Server-Sent Events"""
+        if self.events is None:
+            views.todos_bp.abort(404, 'Todo events are disabled')
+        config = self.flask_app.config
+        stream = self.events.astream(request.headers.get('last-event-id'),
+                                     config['TODOS_EVENTS_HEARTBEAT'], config['TODOS_EVENTS_RETRY'])
+        return StreamingResponse(stream, media_type=views.EVENT_STREAM_MIMETYPE,
+                                 headers=views.EVENT_STREAM_HEADERS)
+
+    async def _commit_and_publish(self, session, events):
+        """Async counterpart of ``EventBroker.commit``; a plain commit when events are disabled."""
+        if self.events is None or not events:
+            return await session.commit()
+        outbox = self.events.outbox_statement(events)
+        if outbox is not None:
+            await session.execute(outbox)
+        async with self._commit_lock:
+            await session.commit()
+            self.events.publish_committed(events)
+
+    # Batch endpoints
+
+    async def _written_rows(self, session, version, event_type):
+        """Async counterpart of the Flask views' ``_written_rows``."""
+        if self.events is None:
+            return []
+        limit = self.flask_app.config['TODOS_EVENTS_MAX_BATCH'] + 1
+        return (await session.execute(batch_statement(version, event_type, limit))).all()
+
+    def _batch_events(self, version, event_type, rows):
+        if self.events is None:
+            return []
+        return batch_events(version, event_type, rows, self.flask_app.config['TODOS_EVENTS_MAX_BATCH'])
+
+    async def todo_batch(self, request):
+        handler = {'POST': self.create_batch, 'PATCH': self.update_batch,
+                   'DELETE': self.delete_batch}[request.method]
+        return await handler(request)
+
+    async def create_batch(self, request):
+        """Create many todos in a single transaction"""
+        data = await _batch_payload(request)
+        titles, errors = [], []
+        for index, item in enumerate(data):
+            message = Todo.title_error(item)
+            if message:
+                errors.append({'index': index, 'message': message})
+            else:
+                titles.append(item['title'])
+
+        if not titles:
+            return _json({'created': [], 'errors': errors}, 400)
+
+        async with self.sessions() as session:
+            version = await session.run_sync(Todo.next_change_version)
+            # The model helpers run on the sync session underneath, on the event loop's connection
+            ids = await session.run_sync(lambda sync_session: Todo.bulk_insert(titles, version, sync_session))
+            await self._commit_and_publish(
+                session, self._batch_events(version, 'created', list(zip(ids, titles))))
+
+        created = [{'id': todo_id, 'title': title} for todo_id, title in zip(ids, titles)]
+        return _json({'created': created, 'errors': errors}, 207 if errors else 201)
+
+    async def update_batch(self, request):
+        """Rename many todos with a single UPDATE ... WHERE id IN statement"""
+        data = await _batch_payload(request)
+        titles, errors = {}, []
+        for index, item in enumerate(data):
+            message = Todo.title_error(item)
+            if not message and not views._is_id(item.get('id')):
+                message = 'id must be an integer'
+            if message:
+                errors.append({'index': index, 'message': message})
+            else:
+                titles[item['id']] = item['title']
+
+        if not titles:
+            return _json({'updated': 0, 'errors': errors}, 400)
+
+        async with self.sessions() as session:
+            version = await session.run_sync(Todo.next_change_version)
+            statement = (
+                update(Todo)
+                .where(Todo.id.in_(titles))
+                .values(title=case(titles, value=Todo.id), version=version)
+                .execution_options(synchronize_session=False)
+            )
+            updated = (await session.execute(statement)).rowcount
+            written = await self._written_rows(session, version, 'updated')
+            await self._commit_and_publish(session, self._batch_events(version, 'updated', written))
+        return _json({'updated': updated, 'errors': errors})
+
+    async def delete_batch(self, request):
+        """Delete many todos by id list or filter with a single DELETE statement"""
+        data = await _json_body(request)
+        if not isinstance(data, dict) or ('ids' in data) == ('filter' in data):
+            views.todos_bp.abort(400, 'Provide exactly one of ids or filter')
+
+        if 'ids' in data:
+            ids = data['ids']
+            if not isinstance(ids, list) or not ids or not all(views._is_id(i) for i in ids):
+                views.todos_bp.abort(400, 'ids must be a non-empty list of integers')
+            views._check_batch_size(ids)
+            criteria = [Todo.id.in_(ids)]
+        else:
+            criteria = views._filter_criteria(data['filter'])
+
+        statement = delete(Todo).where(*criteria).execution_options(synchronize_session=False)
+        async with self.sessions() as session:
+            version = await session.run_sync(Todo.next_change_version)
+            for tombstones in TodoTombstone.record_statements(version, *criteria):
+                await session.execute(tombstones)
+            deleted = (await session.execute(statement)).rowcount
+            written = await self._written_rows(session, version, 'deleted')
+            await self._commit_and_publish(session, self._batch_events(version, 'deleted', written))
+        return _json({'deleted': deleted})
+
+    # Single todos
+
+    async def todo(self, request):
+        handler = {'GET': self.get_todo, 'PUT': self.update_todo,
+                   'DELETE': self.delete_todo}[request.method]
+        id = request.path_params['id']
+        if not views._is_id(id):  # past the database's integer range, as the Flask route's int(max=...)
+            views.todos_bp.abort(404, f'Todo {id} not found')
+        return await handler(request, id)
+
+    async def get_todo(self, request, id):
+        """Get a todo by ID"""
+        async with self.sessions() as session:
+            todo = await session.get(Todo, id)
+        if not todo:
+            views.todos_bp.abort(404, f'Todo {id} not found')
+
+        mask = request.headers.get(self.flask_app.config['RESTX_MASK_HEADER'])
+        etag = views._etag('todo', todo.id, todo.title, mask)
+        if parse_etags(request.headers.get('if-none-match')).contains_weak(etag):
+            return Response(status_code=304, headers={'ETag': quote_etag(etag)})
+        return _json(marshal(todo, views.todo_model, mask=mask), headers={'ETag': quote_etag(etag)})
+
+    async def update_todo(self, request, id):
+        """Update a todo"""
+        async with self.sessions() as session:
+            todo = await session.get(Todo, id)
+            if not todo:
+                views.todos_bp.abort(404, f'Todo {id} not found')
+
+            data = await _json_body(request)
+            if not data or 'title' not in data:
+                views.todos_bp.abort(400, 'Title is required')
+
+            todo.version = await session.run_sync(Todo.next_change_version)
+            todo.title = data['title']
+            await self._commit_and_publish(session, [Event(todo.version, id, 'updated', todo.title)])
+            return _json(marshal(todo, views.todo_model))
+
+    async def delete_todo(self, request, id):
+        """Delete a todo"""
+        async with self.sessions() as session:
+            todo = await session.get(Todo, id)
+            if not todo:
+                views.todos_bp.abort(404, f'Todo {id} not found')
+
+            version = await session.run_sync(Todo.next_change_version)
+            for tombstones in TodoTombstone.record_statements(version, Todo.id == id):
+                await session.execute(tombstones)
+            await session.delete(todo)
+            await self._commit_and_publish(session, [Event(version, id, 'deleted', None)])
+        return Response(status_code=204)
+
+
+def _json(data, status=200, headers=None):
+    return Response(json.dumps(data) + '\n', status_code=status, headers=headers,
+                    media_type='application/json')
+
+
+async def _redirect_to_slash(request):
+    """Redirect to the trailing-slash URL, as Flask's routing does (308 keeps the method and body)."""
+    return RedirectResponse(request.url.replace(path=request.url.path + '/'), status_code=308)
+
+
+def _werkzeug_request(request):
+    """A werkzeug request for the URL and headers of ``request``, for the shared Flask view helpers."""
+    environ = {
+        'REQUEST_METHOD': request.method,
+        'SCRIPT_NAME': request.scope.get('root_path', ''),
+        'PATH_INFO': request.url.path,
+        'QUERY_STRING': request.url.query,
+        'SERVER_NAME': request.url.hostname or '',
+        'SERVER_PORT': str(request.url.port or (443 if request.url.scheme == 'https' else 80)),
+        'wsgi.url_scheme': request.url.scheme,
+    }
+    for name, value in request.headers.items():
+        environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+    return WerkzeugRequest(environ)
+
+
+async def _json_body(request):
+    """The parsed JSON body, or None when it is missing or malformed."""
+    try:
+        return json.loads(await request.body())
+    except ValueError:
+        return None
+
+
+async def _batch_payload(request):
+    data = await _json_body(request)
+    if not isinstance(data, list) or not data:
+        views.todos_bp.abort(400, 'Request body must be a non-empty JSON array')
+    views._check_batch_size(data)
+    return data
+
+
+def create_asgi_app(config_class=Config):
+    """Application factory for the async (ASGI) todos API."""
+    flask_app = create_app(config_class=config_class)
+    config = flask_app.config
+    if config['TODOS_SHARD_URIS']:
+        raise ValueError('The async API does not support sharded todos (TODOS_SHARD_URIS)')
+    uri = config.get('ASYNC_SQLALCHEMY_DATABASE_URI') or async_database_uri(config['SQLALCHEMY_DATABASE_URI'])
+    engine = create_async_engine(uri, **_engine_options(uri, config['SQLALCHEMY_ENGINE_OPTIONS']))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await engine.dispose()
+
+    middleware = []
+    if config['COMPRESSION_ENABLED']:
+        # Starlette's middleware negotiates gzip only
+        middleware.append(Middleware(GZipMiddleware, minimum_size=config['COMPRESSION_MIN_SIZE'],
+                                     compresslevel=config['COMPRESSION_GZIP_LEVEL']))
+
+    api = AsyncTodosAPI(flask_app, engine)
+    app = Starlette(routes=api.routes(), middleware=middleware, lifespan=lifespan)
+    app.state.flask_app = flask_app
+    app.state.engine = engine
+    return app
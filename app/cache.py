@@ -0,0 +1,133 @@
+# app/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TodoCache:
+    """Bounded, in-process LRU cache for single todos with a per-entry TTL.
+
+    Every entry is tagged with the table version that was current when it
+    was loaded. When a ``version_loader`` is given, the version stamp stored
+    in the database is re-read at most every ``version_check_interval``
+    seconds (0: on every lookup), so a write committed by another worker
+    process is seen within that interval; this worker's own writes drop
+    their entries at once. Between checks a hit does no database work.
+
+    When the stamp has moved, ``changes_loader(since, limit)`` returns the
+    keys written after version ``since`` (None when there are more than
+    ``limit``): only those entries are dropped and the others are carried
+    over to the new version. Without it, or after a large write, the whole
+    cache is dropped.
+    """
+
+    def __init__(self, max_size, ttl, version_loader=None, version_check_interval=0,
+                 changes_loader=None, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version_loader = version_loader
+        self.version_check_interval = version_check_interval
+        self.changes_loader = changes_loader
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # One thread re-reads the stamp while the others keep using the current one
+        self._refresh_lock = threading.Lock()
+        self._version = None
+        self._version_checked_at = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _version_due(self, now):
+        return (self._version_checked_at is None
+                or now - self._version_checked_at >= self.version_check_interval)
+
+    def _current_version(self):
+        """Return the shared version stamp, re-reading it when it is due."""
+        if self.version_loader is None:
+            return None
+        now = self.clock()
+        if self._version_due(now):
+            with self._refresh_lock:
+                if self._version_due(now):
+                    self._refresh(now)
+        return self._version
+
+    def _refresh(self, now):
+        """Re-read the stamp and drop the entries written since the last read."""
+        version = self.version_loader()
+        previous = self._version
+        if previous is not None and version != previous:
+            changed = None
+            if self.changes_loader is not None:
+                changed = self.changes_loader(previous, self.max_size)
+            with self._lock:
+                if changed is None:
+                    self._entries.clear()
+                else:
+                    for key in changed:
+                        self._entries.pop(key, None)
+                    # Entries loaded at the previous version are still current; ones loaded
+                    # at an older version (by a lookup that raced a refresh) are left stale
+                    for key, (value, entry_version, expires_at) in list(self._entries.items()):
+                        if entry_version == previous:
+                            self._entries[key] = (value, version, expires_at)
+        self._version = version
+        self._version_checked_at = now
+
+    def get_or_load(self, key, loader, store=True):
+        """Return the cached value for ``key``, calling ``loader`` on a miss.
+
+        ``loader`` returns the value to cache, or None when there is nothing
+        to cache (e.g. the todo does not exist). With ``store=False`` the
+        loaded value is returned without being cached.
+        """
+        version = self._current_version()
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, entry_version, expires_at = entry
+                if entry_version == version and expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+
+        value = loader()
+        if value is not None and store:
+            self._store(key, value, version, now + self.ttl)
+        return value
+
+    def _store(self, key, value, version, expires_at):
+        with self._lock:
+            self._entries[key] = (value, version, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys=None):
+        """Drop ``keys`` from the cache, or every entry when ``keys`` is None."""
+        with self._lock:
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+            # Make the next lookup re-read the version stamp after our own write
+            self._version_checked_at = None
+
+    def stats(self):
+        """Return the cache counters."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,203 @@
+# app/cli.py
+
+import contextlib
+import csv
+import gzip
+import itertools
+import json
+import os
+import sys
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import delete, insert
+
+from . import db
+from .events import batch_events, batch_statement
+from .models import ImportCheckpoint, Todo, TodoTombstone
+
+todos_cli = AppGroup('todos', help='Todo data commands.')
+
+FORMATS = ('csv', 'ndjson')
+
+
+def _detect_format(path):
+    """Guess the input format from ``path``'s extension (ignoring ``.gz``)."""
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return None
+
+
+def _open_source(path):
+    """Open ``path`` (``-`` for stdin) as text, decompressing ``.gz`` files."""
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_records(source, fmt):
+    """Yield ``(line_number, record)`` for every record in ``source``."""
+    if fmt == 'csv':
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(source, start=1):
+        if line.strip():
+            try:
+                yield line_number, json.loads(line)
+            except ValueError as error:
+                raise click.ClickException(f'Line {line_number}: invalid JSON ({error})')
+
+
+def _row(line_number, record, keep_ids):
+    """Validate ``record`` and return the todos row to insert."""
+    error = Todo.title_error(record)
+    if error:
+        raise click.ClickException(f'Line {line_number}: {error}')
+    row = {'title': record['title']}
+    if keep_ids:
+        try:
+            row['id'] = int(record['id'])
+        except (KeyError, TypeError, ValueError):
+            raise click.ClickException(f'Line {line_number}: id must be an integer')
+    return row
+
+
+def _load_checkpoint(name, source):
+    """Rows of ``source`` already committed according to import checkpoint ``name``."""
+    if not name:
+        return 0
+    checkpoint = db.session.get(ImportCheckpoint, name)
+    if checkpoint is None:
+        return 0
+    if checkpoint.source != source:
+        raise click.ClickException(
+            f"Checkpoint {name} belongs to {checkpoint.source}, not {source}"
+        )
+    return checkpoint.rows
+
+
+def _group_by_shard(rows, keep_ids):
+    """``{shard index: rows}`` for a chunk of ``rows``; ``{None: rows}`` when todos are not sharded.
+
+    Sharded, rows get ids from the shared sequence, or with ``keep_ids`` the
+    sequence is moved past theirs so that it never hands them out again.
+    Either runs in a transaction of its own, so call it before writing.
+    """
+    shards = current_app.extensions.get('todo_shards')
+    if shards is None:
+        return {None: rows}
+    if keep_ids:
+        shards.skip_ids_past(max(row['id'] for row in rows))
+    else:
+        for row, todo_id in zip(rows, shards.allocate_ids(len(rows))):
+            row['id'] = todo_id
+    groups = {}
+    for row in rows:
+        groups.setdefault(shards.shard_of(row['id']), []).append(row)
+    return dict(sorted(groups.items()))
+
+
+@todos_cli.command('import')
+@click.argument('path', default='-')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS),
+              help='Input format; guessed from the file extension, required for stdin.')
+@click.option('--chunk-size', default=1000, show_default=True,
+              help='Rows inserted and committed per transaction.')
+@click.option('--keep-ids/--new-ids', default=False, show_default=True,
+              help='Insert the ids from the input instead of letting the database assign them.')
+@click.option('--checkpoint', metavar='NAME',
+              help='Record committed rows under this name; an import restarted with it resumes after them.')
+@click.option('--progress-every', default=10000, show_default=True,
+              help='Report progress every this many rows (0 to disable).')
+def import_todos(path, fmt, chunk_size, keep_ids, checkpoint, progress_every):
+    """Bulk import todos from a CSV or NDJSON file, or stdin (PATH ``-``).
+
+    Records need a ``title`` (and an ``id`` with --keep-ids). Each chunk is
+    one executemany INSERT (multi-row VALUES where the driver supports it)
+    and one commit, publishing its ``created`` events (or, for chunks larger
+    than TODOS_EVENTS_MAX_BATCH, one reset event). With --checkpoint the
+    count of imported rows is stored in the import_checkpoints table by that
+    same commit, so a failed import restarted with the same command skips
+    exactly the rows already committed. Sharded chunks commit on several
+    databases, so --checkpoint is refused.
+    """
+    fmt = fmt or _detect_format(path)
+    if fmt is None:
+        raise click.UsageError('Cannot tell the input format; pass --format.')
+    if chunk_size < 1:
+        raise click.UsageError('--chunk-size must be at least 1.')
+    if checkpoint and current_app.extensions.get('todo_shards') is not None:
+        raise click.UsageError('--checkpoint is not supported when todos are sharded.')
+    source = 'stdin' if path == '-' else os.path.abspath(path)
+    skip = _load_checkpoint(checkpoint, source)
+    if skip:
+        click.echo(f'Resuming after {skip} committed rows', err=True)
+
+    statement = insert(Todo.__table__)
+    broker = current_app.extensions.get('todo_events')
+    max_events = current_app.config['TODOS_EVENTS_MAX_BATCH']
+    imported = skip
+    session = db.session()
+    start = time.perf_counter()
+    with _open_source(path) as f:
+        records = itertools.islice(read_records(f, fmt), skip, None)
+        while True:
+            rows = [_row(line_number, record, keep_ids)
+                    for line_number, record in itertools.islice(records, chunk_size)]
+            if not rows:
+                break
+            try:
+                events = []
+                for index, shard_rows in _group_by_shard(rows, keep_ids).items():
+                    if index is not None:
+                        current_app.extensions['todo_shards'].route(index)
+                    # Every shard has its own version stamp
+                    version = Todo.next_change_version()
+                    for row in shard_rows:
+                        row['version'] = version
+                    if keep_ids:
+                        # A re-imported id is live again, not deleted
+                        session.execute(delete(TodoTombstone).where(
+                            TodoTombstone.id.in_([row['id'] for row in shard_rows])))
+                    session.execute(statement, shard_rows)
+                    if broker is not None:
+                        written = session.execute(batch_statement(version, 'created', max_events + 1)).all()
+                        events += batch_events(version, 'created', written, max_events)
+                if checkpoint:
+                    ImportCheckpoint.advance(checkpoint, source, imported + len(rows))
+                if broker is not None:
+                    broker.commit(session, events)
+                else:
+                    session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            imported += len(rows)
+            if progress_every and (imported - len(rows)) // progress_every < imported // progress_every:
+                click.echo(f'{imported} rows imported '
+                           f'({(imported - skip) / (time.perf_counter() - start):.0f} rows/s)',
+                           err=True)
+
+    elapsed = time.perf_counter() - start
+    new_rows = imported - skip
+    click.echo(f'Imported {new_rows} todos in {elapsed:.2f} s '
+               f'({new_rows / elapsed if elapsed else 0:.0f} rows/s)')
+
+
+@todos_cli.command('init-shards')
+def init_shards():
+    """Create the todos tables on every shard of TODOS_SHARD_URIS that lacks them."""
+    shards = current_app.extensions.get('todo_shards')
+    if shards is None:
+        raise click.UsageError('Todos are not sharded; set TODOS_SHARD_URIS.')
+    shards.create_all()
+    click.echo(f'Todos tables ready on {len(shards)} shards')
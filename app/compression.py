@@ -0,0 +1,105 @@
+# app/compression.py
+
+import gzip
+import zlib
+from contextlib import closing
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always offered
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/plain', 'text/html'}
+
+
+def _encoded(chunks):
+    """Yield ``chunks`` as bytes, closing the iterable (e.g. a stream_with_context) when done."""
+    try:
+        for chunk in chunks:
+            yield chunk.encode() if isinstance(chunk, str) else chunk
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def _gzip_stream(chunks, level):
+    """Gzip ``chunks`` incrementally, flushing after each so clients get rows as they are sent."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    with closing(_encoded(chunks)) as source:
+        for chunk in source:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks, level):
+    compressor = brotli.Compressor(quality=level)
+    with closing(_encoded(chunks)) as source:
+        for chunk in source:
+            yield compressor.process(chunk) + compressor.flush()
+    yield compressor.finish()
+
+
+class ResponseCompressor:
+    """Compresses responses with gzip or brotli, as negotiated by ``Accept-Encoding``.
+
+    Buffered responses are compressed only from ``min_size`` bytes up, so
+    small ones such as the health checks go out untouched. Streamed
+    responses (the NDJSON listing) are compressed chunk by chunk with a sync
+    flush after each, so they stay streamed. A compressed response's ETag is
+    made weak, as its bytes differ from the identity representation; the
+    todos views compare ETags weakly, so conditional requests still get 304s.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_size = app.config['COMPRESSION_MIN_SIZE']
+        self.levels = {
+            'gzip': app.config['COMPRESSION_GZIP_LEVEL'],
+            'br': app.config['COMPRESSION_BROTLI_LEVEL'],
+        }
+        # Preferred first when the client accepts both with the same quality
+        self.encodings = (['br'] if brotli is not None else []) + ['gzip']
+        app.after_request(self._after_request)
+        app.extensions['compression'] = self
+
+    def compress(self, data, encoding):
+        """Compress ``data`` in one piece with ``encoding`` at its configured level."""
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.levels['br'])
+        return gzip.compress(data, self.levels['gzip'], mtime=0)
+
+    def _after_request(self, response):
+        if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.direct_passthrough):
+            return response
+
+        if not response.is_streamed:
+            length = response.content_length
+            if length is None:
+                length = len(response.get_data())
+            if length < self.min_size:
+                return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            stream = _brotli_stream if encoding == 'br' else _gzip_stream
+            response.response = stream(response.response, self.levels[encoding])
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(self.compress(response.get_data(), encoding))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -1,16 +1,118 @@
 # app/config.py
 
+import logging
 import os
 
+from .pool import MeteredQueuePool
+
+logger = logging.getLogger(__name__)
+
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default-secret-key')
     DEBUG = os.getenv('DEBUG', 'True') == 'True'
     SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Database for the async (ASGI) todos API; derived from SQLALCHEMY_DATABASE_URI when unset
+    ASYNC_SQLALCHEMY_DATABASE_URI = os.getenv('ASYNC_SQLALCHEMY_DATABASE_URI')
+
+    # Read replicas (comma-separated URIs) for GET /api/todos/ and /api/todos/<id>
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.getenv('SQLALCHEMY_REPLICA_URIS', '').split(',') if uri]
+    # round_robin or least_connections (fewest requests in flight)
+    DB_REPLICA_BALANCING = os.getenv('DB_REPLICA_BALANCING', 'round_robin')
+    # Seconds a failed replica is left out before it is probed again
+    DB_REPLICA_RETRY_INTERVAL = float(os.getenv('DB_REPLICA_RETRY_INTERVAL', '30'))
+    # Seconds a client reads from the primary after a write (recent_write cookie); 0 disables
+    DB_REPLICA_READ_YOUR_WRITES_SECONDS = int(os.getenv('DB_REPLICA_READ_YOUR_WRITES_SECONDS', '5'))
+
+    # Hash-shard the todos over these databases (comma-separated URIs); each shard has its own todos
+    # version stamp, the primary keeps the id sequences. Create the shards' tables with
+    # `flask todos init-shards`
+    TODOS_SHARD_URIS = [uri for uri in os.getenv('TODOS_SHARD_URIS', '').split(',') if uri]
+    # Todo ids each worker reserves from the primary at a time
+    TODOS_SHARD_ID_BLOCK_SIZE = int(os.getenv('TODOS_SHARD_ID_BLOCK_SIZE', '100'))
+
+    # Lean startup for production workers: skips Flask-Migrate and the Swagger docs unless re-enabled below
+    LEAN_STARTUP = os.getenv('LEAN_STARTUP', 'False') == 'True'
+    MIGRATIONS_ENABLED = os.getenv('MIGRATIONS_ENABLED', str(not LEAN_STARTUP)) == 'True'
+    API_DOCS_ENABLED = os.getenv('API_DOCS_ENABLED', str(not LEAN_STARTUP)) == 'True'
+    # Seconds clients and gateways may reuse /swagger.json before revalidating its ETag
+    SWAGGER_CACHE_MAX_AGE = int(os.getenv('SWAGGER_CACHE_MAX_AGE', '3600'))
+
+    # Connection pool; pre-ping and recycle guard against connections dropped by MySQL or proxies
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': MeteredQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', '10')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'True') == 'True',
+    }
+
+    # Prometheus request metrics at /api/metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+    # Shared directory for aggregating metrics across worker processes (empty it before starting)
+    METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '1'))
+
+    # gzip/brotli response compression, negotiated from Accept-Encoding (brotli needs `pip install brotli`)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True') == 'True'
+    # Buffered responses smaller than this many bytes are sent uncompressed; streams always compress
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_LEVEL = int(os.getenv('COMPRESSION_BROTLI_LEVEL', '4'))
+
+    # Per-request SQL profiling; warn when one statement repeats this often in a request
+    SQL_PROFILING_ENABLED = os.getenv('SQL_PROFILING_ENABLED', 'True') == 'True'
+    SQL_REPEAT_WARNING_THRESHOLD = int(os.getenv('SQL_REPEAT_WARNING_THRESHOLD', '5'))
+
+    # Keyset pagination for GET /api/todos/
+    TODOS_DEFAULT_PAGE_SIZE = int(os.getenv('TODOS_DEFAULT_PAGE_SIZE', '100'))
+    TODOS_MAX_PAGE_SIZE = int(os.getenv('TODOS_MAX_PAGE_SIZE', '1000'))
+    # Rows fetched per round trip when streaming the listing as NDJSON
+    TODOS_STREAM_BATCH_SIZE = int(os.getenv('TODOS_STREAM_BATCH_SIZE', '1000'))
+    # Encode list responses straight from (id, title) tuples instead of marshalling ORM objects
+    TODOS_FAST_SERIALIZER = os.getenv('TODOS_FAST_SERIALIZER', 'False') == 'True'
+    # Largest number of items accepted by the /api/todos/batch endpoints
+    TODOS_MAX_BATCH_SIZE = int(os.getenv('TODOS_MAX_BATCH_SIZE', '1000'))
+
+    # Group commit for POST /api/todos/: queue concurrent creations in each worker and write them
+    # as one multi-row INSERT every TODOS_GROUP_COMMIT_INTERVAL seconds or MAX_BATCH titles
+    TODOS_GROUP_COMMIT_ENABLED = os.getenv('TODOS_GROUP_COMMIT_ENABLED', 'False') == 'True'
+    TODOS_GROUP_COMMIT_INTERVAL = float(os.getenv('TODOS_GROUP_COMMIT_INTERVAL', '0.005'))
+    TODOS_GROUP_COMMIT_MAX_BATCH = int(os.getenv('TODOS_GROUP_COMMIT_MAX_BATCH', '100'))
+    # Seconds a queued create waits for its batch to start before it is withdrawn and answered with
+    # 503 (safe to retry); a create whose batch has started waits for the commit
+    TODOS_GROUP_COMMIT_TIMEOUT = float(os.getenv('TODOS_GROUP_COMMIT_TIMEOUT', '10'))
+
+    # Server-Sent Events at GET /api/todos/events. The local broker only reaches streams in the
+    # worker that made the change; with several workers use the database broker (todo_events table).
+    # Events are ordered by a single version stamp, so they are off (and refused) with sharded todos
+    TODOS_EVENTS_ENABLED = os.getenv('TODOS_EVENTS_ENABLED', str(not TODOS_SHARD_URIS)) == 'True'
+    TODOS_EVENTS_BROKER = os.getenv('TODOS_EVENTS_BROKER', 'local')
+    # Events kept in memory by each worker for streams to resume from (Last-Event-ID)
+    TODOS_EVENTS_HISTORY = int(os.getenv('TODOS_EVENTS_HISTORY', '1000'))
+    # Database broker: seconds between reads of other workers' events, and seconds events are kept
+    TODOS_EVENTS_POLL_INTERVAL = float(os.getenv('TODOS_EVENTS_POLL_INTERVAL', '0.5'))
+    TODOS_EVENTS_RETENTION = int(os.getenv('TODOS_EVENTS_RETENTION', '3600'))
+    # Seconds between keepalive comments on an idle stream, and the reconnection delay sent to clients
+    TODOS_EVENTS_HEARTBEAT = float(os.getenv('TODOS_EVENTS_HEARTBEAT', '15'))
+    TODOS_EVENTS_RETRY = float(os.getenv('TODOS_EVENTS_RETRY', '3'))
+    # Batch writes of more todos than this publish one reset event (resync from /changes) instead
+    TODOS_EVENTS_MAX_BATCH = int(os.getenv('TODOS_EVENTS_MAX_BATCH', '100'))
+
+    # In-process cache for GET /api/todos/<id>
+    TODOS_CACHE_ENABLED = os.getenv('TODOS_CACHE_ENABLED', 'True') == 'True'
+    TODOS_CACHE_MAX_SIZE = int(os.getenv('TODOS_CACHE_MAX_SIZE', '10000'))
+    TODOS_CACHE_TTL = float(os.getenv('TODOS_CACHE_TTL', '60'))
+    # Seconds between re-reads of the shared version stamp. The default 0 re-reads it on every hit,
+    # so no worker serves a todo (or its ETag) after a write committed elsewhere. A positive value
+    # opts into serving another worker's writes up to that many seconds late, in exchange for hits
+    # that do no database work
+    TODOS_CACHE_VERSION_CHECK_INTERVAL = float(os.getenv('TODOS_CACHE_VERSION_CHECK_INTERVAL', '0'))
 
     @classmethod
     def validate(cls):
-        print("DEBUG (Config): SQLALCHEMY_DATABASE_URI loaded:", cls.SQLALCHEMY_DATABASE_URI)
+        logger.debug("SQLALCHEMY_DATABASE_URI loaded: %s", cls.SQLALCHEMY_DATABASE_URI)
         if not cls.SQLALCHEMY_DATABASE_URI:
             raise ValueError(
                 "SQLALCHEMY_DATABASE_URI is not set. Ensure it's defined in the .env file "
@@ -22,3 +124,5 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"  # Use in-memory SQLite database
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # In-memory SQLite runs on a StaticPool
+    TODOS_CACHE_ENABLED = False
@@ -0,0 +1,400 @@
+# app/events.py
+
+import abc
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+
+from sqlalchemy import delete, exists, insert, null, select
+
+logger = logging.getLogger(__name__)
+
+BROKERS = ('local', 'database')
+# Type of the event that stands in for a batch too large to send todo by todo
+RESET = 'reset'
+# Key before every event: versions start at 1
+START = (0, 0)
+# Seconds between prunes of old events by the database broker
+PRUNE_INTERVAL = 60
+
+
+class Event(namedtuple('Event', 'version todo_id type title')):
+    """A todo create/update/delete, ordered by its change version and todo id."""
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return self.version, self.todo_id
+
+    @property
+    def id(self):
+        """The SSE event id, sent back by clients as ``Last-Event-ID``."""
+        return f"{self.version}:{self.todo_id}"
+
+    def frame(self):
+        """The event as a Server-Sent Events frame."""
+        if self.type == RESET:
+            return reset_frame(self.key)
+        data = json.dumps({'id': self.todo_id, 'title': self.title, 'version': self.version})
+        return f"id: {self.id}\nevent: {self.type}\ndata: {data}\n\n"
+
+
+def parse_event_id(value):
+    """The (version, todo_id) key of a ``Last-Event-ID``, or None if it is missing or malformed."""
+    try:
+        version, todo_id = (int(part) for part in (value or '').split(':'))
+    except ValueError:
+        return None
+    return (version, todo_id) if version >= 0 and todo_id >= 0 else None
+
+
+def reset_frame(key):
+    """Tells a client that events after its Last-Event-ID are no longer available.
+
+    The client should resync from ``GET /api/todos/changes``; its next
+    reconnection resumes from ``key``.
+    """
+    return f"id: {key[0]}:{key[1]}\nevent: reset\ndata: {{}}\n\n"
+
+
+def batch_statement(version, event_type, limit):
+    """SELECT (id, title) of the todos a batch wrote at change ``version``, for its events.
+
+    Run in the batch's own transaction: ``version`` is stamped by it alone,
+    so the rows are exactly the todos it created or updated, or (for
+    ``deleted``) the tombstones it recorded. Both seek a version index.
+    """
+    from .models import Todo, TodoTombstone
+    if event_type == 'deleted':
+        statement = select(TodoTombstone.id, null()).where(TodoTombstone.version == version)
+        return statement.order_by(TodoTombstone.id).limit(limit)
+    return select(Todo.id, Todo.title).where(Todo.version == version).order_by(Todo.id).limit(limit)
+
+
+def batch_events(version, event_type, rows, max_events):
+    """The events of a batch write at ``version``: one per (id, title) in ``rows``.
+
+    Beyond ``max_events`` rows, a single reset event instead: streams tell
+    their clients to resync from the change feed rather than carry a
+    burst of events that the client would apply one by one.
+    """
+    if len(rows) > max_events:
+        return [Event(version, 0, RESET, None)]
+    return [Event(version, todo_id, event_type, title) for todo_id, title in rows]
+
+
+class EventBroker(abc.ABC):
+    """Fans todo events out to the event streams of this worker process.
+
+    Keeps the last ``history`` events in memory; streams wait for new ones
+    without polling, so an idle subscriber costs a callback rather than a
+    busy thread (with gevent workers or the ASGI app, not even a thread).
+    Subclasses decide how events get from the write that caused them to
+    :meth:`_deliver`.
+    """
+
+    name = None
+
+    def __init__(self, history=1000):
+        self._history = deque(maxlen=history)
+        # Key of the newest event no longer in the history
+        self._floor = START
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        # Held around each commit and its publish, so events are published in commit (version)
+        # order. It makes every evented write in this process wait for the previous one's commit
+        # and publish; the todos version stamp already serializes the commits themselves
+        # (see TableVersion), so what it adds is the in-memory publish and the lock handoff.
+        self.commit_lock = threading.Lock()
+        self.delivered = 0
+
+    def outbox_statement(self, events):
+        """A statement to run in the write's transaction before committing, or None."""
+        return None
+
+    @abc.abstractmethod
+    def published(self, events):
+        """Called, under :attr:`commit_lock`, once the transaction that produced ``events`` has committed."""
+
+    def commit(self, session, events):
+        """Commit the (sync) ``session`` whose changes produced ``events`` and publish them.
+
+        Raises only when the commit fails. Once the write is committed a
+        publish failure is logged instead: the write has happened, and
+        streams that miss the events resync from the change feed.
+        """
+        outbox = self.outbox_statement(events)
+        if outbox is not None:
+            session.execute(outbox)
+        with self.commit_lock:
+            session.commit()
+            self.publish_committed(events)
+
+    def publish_committed(self, events):
+        """Call :meth:`published` for committed ``events``, logging rather than raising failures."""
+        try:
+            self.published(events)
+        except Exception:
+            logger.exception('Committed %d todo events but could not publish them', len(events))
+
+    @property
+    def latest(self):
+        """Key of the newest event seen by this worker: where a new stream starts."""
+        with self._lock:
+            return self._history[-1].key if self._history else self._floor
+
+    def _deliver(self, events):
+        with self._lock:
+            for event in events:
+                if len(self._history) == self._history.maxlen:
+                    self._floor = self._history[0].key
+                self._history.append(event)
+            self.delivered += len(events)
+            subscribers = list(self._subscribers)
+        for notify in subscribers:
+            notify()
+
+    def subscribe(self, notify):
+        """Call ``notify()`` (from any thread) whenever new events arrive."""
+        with self._lock:
+            self._subscribers.add(notify)
+
+    def unsubscribe(self, notify):
+        with self._lock:
+            self._subscribers.discard(notify)
+
+    def replay(self, key):
+        """Return ``(events after key, complete)`` from memory.
+
+        ``complete`` is False when events after ``key`` have left the
+        history; :meth:`replay_stored` may still have them.
+        """
+        with self._lock:
+            if key < self._floor:
+                return [], False
+            return [event for event in self._history if event.key > key], True
+
+    def replay_stored(self, key):
+        """Return ``(events after key, complete)`` from durable storage; the local broker has none."""
+        return [], False
+
+    def _frames(self, key, events, complete):
+        """The frames to send a stream at ``key`` for a replay, and the stream's next key."""
+        if not complete:
+            latest = self.latest
+            return [reset_frame(latest)], latest
+        return [event.frame() for event in events], events[-1].key if events else key
+
+    def _start_key(self, last_event_id):
+        """Where a new stream starts: after ``Last-Event-ID`` if it has one, else at the newest event."""
+        key = parse_event_id(last_event_id)
+        return self.latest if key is None else key
+
+    def stream(self, last_event_id, heartbeat, retry):
+        """Yield the SSE frames of the events after ``last_event_id``, forever; for WSGI servers."""
+        wake = threading.Event()
+        notify = wake.set
+        self.subscribe(notify)
+        key = self._start_key(last_event_id)
+        try:
+            yield f"retry: {int(retry * 1000)}\n\n"
+            while True:
+                wake.clear()
+                events, complete = self.replay(key)
+                if not complete:
+                    events, complete = self.replay_stored(key)
+                frames, key = self._frames(key, events, complete)
+                if frames:
+                    yield ''.join(frames)
+                elif not wake.wait(heartbeat):
+                    yield ': keepalive\n\n'
+        finally:
+            self.unsubscribe(notify)
+
+    async def astream(self, last_event_id, heartbeat, retry):
+        """Async counterpart of :meth:`stream` for the ASGI app, holding no thread while idle."""
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+
+        def notify():
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:  # the loop closed under a stream that is going away
+                pass
+
+        await asyncio.to_thread(self.subscribe, notify)
+        key = self._start_key(last_event_id)
+        try:
+            yield f"retry: {int(retry * 1000)}\n\n"
+            while True:
+                wake.clear()
+                events, complete = self.replay(key)
+                if not complete:
+                    events, complete = await asyncio.to_thread(self.replay_stored, key)
+                frames, key = self._frames(key, events, complete)
+                if frames:
+                    yield ''.join(frames)
+                    continue
+                try:
+                    await asyncio.wait_for(wake.wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+        finally:
+            self.unsubscribe(notify)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'broker': self.name,
+                'subscribers': len(self._subscribers),
+                'delivered': self.delivered,
+                'history': len(self._history),
+                'latest': self._history[-1].id if self._history else None,
+            }
+
+
+class LocalBroker(EventBroker):
+    """Delivers events to the streams of the worker that made the change.
+
+    Enough for a single worker process; with several, each stream only sees
+    the writes its own worker handled (use :class:`DatabaseBroker`). Resumes
+    only from this worker's in-memory history.
+    """
+
+    name = 'local'
+
+    def published(self, events):
+        self._deliver(events)
+
+
+class DatabaseBroker(EventBroker):
+    """Delivers the events of every worker process through the ``todo_events`` table.
+
+    Writes add their events to the table in their own transaction. One
+    thread per process, started with the first stream, reads new rows in
+    (version, todo_id) order every ``poll_interval`` seconds (at once after
+    a local write) and fans them out. Streams resuming from before the
+    in-memory history read the table directly, so ``Last-Event-ID`` works
+    across workers and restarts for ``retention`` seconds.
+    """
+
+    name = 'database'
+
+    def __init__(self, app, history=1000, poll_interval=0.5, retention=3600):
+        super().__init__(history)
+        self.app = app
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self._last_prune = 0
+
+    def outbox_statement(self, events):
+        from .models import TodoEvent
+        now = int(time.time())
+        return insert(TodoEvent).values([
+            {'version': event.version, 'todo_id': event.todo_id, 'type': event.type,
+             'title': event.title, 'created_at': now}
+            for event in events
+        ])
+
+    def published(self, events):
+        self._wake.set()
+
+    def subscribe(self, notify):
+        self._ensure_started()
+        super().subscribe(notify)
+
+    def _ensure_started(self):
+        """Start the polling thread in this process, from the newest stored event."""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    with self._lock:
+                        self._history.clear()
+                        self._floor = self._newest_stored()
+                self._thread = threading.Thread(target=self._run, name='todo-events', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _newest_stored(self):
+        from . import db
+        from .models import TodoEvent
+        with self.app.app_context():
+            row = db.session.execute(
+                select(TodoEvent.version, TodoEvent.todo_id)
+                .order_by(TodoEvent.version.desc(), TodoEvent.todo_id.desc()).limit(1)
+            ).first()
+        return tuple(row) if row else START
+
+    def stop(self):
+        """Stop the polling thread of this process."""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._stopping = True
+            self._wake.set()
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stopping:
+                return
+            try:
+                self._poll()
+            except Exception:
+                logger.warning('Polling todo events failed', exc_info=True)
+
+    def _poll(self):
+        from . import db
+        from .models import TodoEvent
+        with self.app.app_context():
+            while True:
+                statement = TodoEvent.after_statement(self.latest).limit(self._history.maxlen)
+                events = [Event(*row) for row in db.session.execute(statement)]
+                db.session.commit()  # end the read, so the next poll sees newer commits
+                if events:
+                    self._deliver(events)
+                if len(events) < self._history.maxlen:
+                    break
+            if time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+                self._last_prune = time.monotonic()
+                db.session.execute(delete(TodoEvent).where(
+                    TodoEvent.created_at < int(time.time()) - self.retention))
+                db.session.commit()
+
+    def replay_stored(self, key):
+        from . import db
+        from .models import TodoEvent
+        with self.app.app_context():
+            events = [Event(*row) for row in db.session.execute(
+                TodoEvent.after_statement(key).limit(self._history.maxlen))]
+            # Complete only if the client's own last event is still stored: pruning removes
+            # the oldest events, so nothing after it has been pruned either
+            complete = db.session.scalar(select(exists().where(
+                TodoEvent.version == key[0], TodoEvent.todo_id == key[1])))
+        return events, complete
+
+    def stats(self):
+        return {**super().stats(), 'poll_interval': self.poll_interval, 'retention': self.retention}
+
+
+def create_broker(app):
+    """The event broker configured by ``TODOS_EVENTS_BROKER``."""
+    config = app.config
+    if config['TODOS_EVENTS_BROKER'] not in BROKERS:
+        raise ValueError(f"TODOS_EVENTS_BROKER must be one of {', '.join(BROKERS)}")
+    if config['TODOS_EVENTS_BROKER'] == 'database':
+        return DatabaseBroker(app, history=config['TODOS_EVENTS_HISTORY'],
+                              poll_interval=config['TODOS_EVENTS_POLL_INTERVAL'],
+                              retention=config['TODOS_EVENTS_RETENTION'])
+    return LocalBroker(history=config['TODOS_EVENTS_HISTORY'])
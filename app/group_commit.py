@@ -0,0 +1,192 @@
+# app/group_commit.py
+
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from time import monotonic
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_METRIC = 'todo_group_commit_batch_size'
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class GroupCommitter:
+    """Coalesces concurrent todo creations into one INSERT and one commit.
+
+    Each :meth:`submit` queues a title and returns a Future. A flusher thread
+    takes the first queued title, keeps collecting until ``max_batch_size``
+    titles are queued or ``flush_interval`` seconds have passed, and writes
+    the whole batch with :meth:`Todo.bulk_insert` in a single transaction.
+    Every Future then resolves to its own new id, so a request only answers
+    once its row is committed.
+
+    When a batch is rolled back its titles are retried one transaction each,
+    so a bad row only fails its own request. A batch is never retried once
+    committed: errors publishing its events are logged by the broker. A
+    title whose Future is cancelled before its batch starts is skipped. The
+    thread is started on first use in each process, which keeps the
+    committer safe to create before workers are forked.
+    """
+
+    def __init__(self, app, flush_interval=0.005, max_batch_size=100):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.failed_batches = 0
+
+        metrics = app.extensions.get('metrics')
+        if metrics is not None:
+            metrics.register_histogram(BATCH_SIZE_METRIC, 'Todos created per group commit',
+                                       BATCH_SIZE_BUCKETS)
+
+    def _ensure_started(self):
+        """Start the flusher thread in this process if it is not running."""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()  # items queued in a parent process are not ours
+                self._thread = threading.Thread(target=self._run, name='todo-group-commit',
+                                                daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, title):
+        """Queue ``title`` for the next group commit; returns a Future of its id."""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((title, future))
+        return future
+
+    def create(self, title, timeout=None):
+        """Create a todo through the group commit and wait for its id.
+
+        Raises ``FutureTimeoutError`` only when the title was taken back out
+        of the queue after ``timeout`` seconds, so it was not created; once
+        its batch has started, waits for the batch's outcome instead.
+        """
+        future = self.submit(title)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise
+            return future.result()
+
+    def stop(self):
+        """Flush whatever is queued and stop the flusher thread."""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = [first], False
+            deadline = monotonic() + self.flush_interval
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch):
+        """Write ``batch`` in one transaction, falling back to one transaction per title.
+
+        :meth:`_commit` only raises when its transaction was rolled back, so
+        the fallback never writes a title twice.
+        """
+        # Claim every Future, skipping the titles whose requests gave up waiting
+        batch = [(title, future) for title, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        failed = False
+        with self.app.app_context():
+            try:
+                outcomes = [(future, todo_id, None) for (_, future), todo_id
+                            in zip(batch, self._commit([title for title, _ in batch]))]
+            except Exception:
+                logger.warning('Group commit of %d todos failed; retrying them one by one',
+                               len(batch), exc_info=True)
+                failed, outcomes = True, []
+                for title, future in batch:
+                    try:
+                        [todo_id] = self._commit([title])
+                    except Exception as error:
+                        outcomes.append((future, None, error))
+                    else:
+                        outcomes.append((future, todo_id, None))
+
+        # Record the batch before answering, so it is in the metrics of the requests it served
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.failed_batches += failed
+        metrics = self.app.extensions.get('metrics')
+        if metrics is not None:
+            metrics.observe(BATCH_SIZE_METRIC, len(batch))
+
+        for future, todo_id, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(todo_id)
+
+    def _commit(self, titles):
+        """Insert ``titles`` at a new todos change version in one transaction, publishing their events.
+
+        Raises only when nothing was committed; the session is rolled back.
+        """
+        from . import db
+        from .events import Event
+        from .models import Todo
+        try:
+            version = Todo.next_change_version()
+            ids = Todo.bulk_insert(titles, version)
+            broker = self.app.extensions.get('todo_events')
+            if broker is not None:
+                broker.commit(db.session, [Event(version, todo_id, 'created', title)
+                                           for todo_id, title in zip(ids, titles)])
+            else:
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return ids
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'mean_batch_size': round(self.items / self.batches, 2) if self.batches else 0,
+                'largest_batch': self.largest_batch,
+                'failed_batches': self.failed_batches,
+                'queued': self._queue.qsize(),
+                'flush_interval': self.flush_interval,
+                'max_batch_size': self.max_batch_size,
+            }
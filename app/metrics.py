@@ -0,0 +1,291 @@
+# app/metrics.py
+
+import atexit
+import glob
+import json
+import os
+import threading
+from bisect import bisect_left
+from time import monotonic, perf_counter
+
+from flask import current_app, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+LABELS = ('endpoint', 'method', 'status')
+START_KEY = 'app.metrics.start'
+
+
+class Series:
+    """Latency and response size samples for one endpoint/method/status."""
+    __slots__ = ('latency', 'latency_sum', 'size', 'size_sum', 'size_count')
+
+    def __init__(self):
+        # Per-bucket (non-cumulative) counts; the last slot is +Inf
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.size = [0] * (len(SIZE_BUCKETS) + 1)
+        self.size_sum = 0
+        self.size_count = 0
+
+    def to_list(self):
+        return [self.latency, self.latency_sum, self.size, self.size_sum, self.size_count]
+
+    def merge_list(self, data):
+        latency, latency_sum, size, size_sum, size_count = data
+        self.latency = [a + b for a, b in zip(self.latency, latency)]
+        self.latency_sum += latency_sum
+        self.size = [a + b for a, b in zip(self.size, size)]
+        self.size_sum += size_sum
+        self.size_count += size_count
+
+
+class Histogram:
+    """Samples of one application-level value (e.g. a batch size), outside the request series."""
+    __slots__ = ('help_text', 'buckets', 'counts', 'sum')
+
+    def __init__(self, help_text, buckets):
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def to_list(self):
+        return [self.counts, self.sum]
+
+    def merge_list(self, data):
+        counts, total = data
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.sum += total
+
+
+class RequestMetrics:
+    """Per-endpoint request metrics for a Flask app, in Prometheus text format.
+
+    Records request counts, in-flight requests, latency and response size
+    labelled by endpoint/method/status. Samples are kept in plain Python
+    counters rather than a metrics client library, which keeps the cost of
+    the request hooks to a few microseconds (see benchmarks/metrics_overhead.py).
+
+    With ``METRICS_MULTIPROC_DIR`` set, every worker process snapshots its
+    counters into that directory at most every ``METRICS_FLUSH_INTERVAL``
+    seconds and on exit, and a scrape of any worker sums all snapshots.
+    Snapshots of exited workers keep counting towards the totals (counters
+    never go backwards), so empty the directory before starting the workers.
+
+    Latency is measured up to the point the view returns its response, so for
+    streamed listings it excludes the time spent sending the body.
+
+    Other parts of the app can add their own histograms with
+    :meth:`register_histogram` and :meth:`observe`; they are aggregated and
+    rendered alongside the request metrics.
+    """
+
+    def __init__(self, app=None):
+        self._series = {}
+        self._histograms = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.multiproc_dir = None
+        self.flush_interval = 1.0
+        self._last_flush = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.multiproc_dir = app.config.get('METRICS_MULTIPROC_DIR')
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            atexit.register(self.flush)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.extensions['metrics'] = self
+
+    def register_histogram(self, name, help_text, buckets):
+        """Declare histogram ``name``; registering the same name again is a no-op."""
+        with self._lock:
+            self._histograms.setdefault(name, Histogram(help_text, buckets))
+
+    def observe(self, name, value):
+        """Record ``value`` in the registered histogram ``name``."""
+        with self._lock:
+            histogram = self._histograms[name]
+            histogram.counts[bisect_left(histogram.buckets, value)] += 1
+            histogram.sum += value
+
+    def _endpoint_label(self, endpoint):
+        """Label a Flask endpoint by its resource class.
+
+        flask-restx registers one endpoint per route of a resource (e.g.
+        ``todos_todo_resource`` and ``todos_todo_resource_2`` for the
+        trailing-slash variant); both are reported as ``TodoResource``.
+        """
+        view = current_app.view_functions.get(endpoint)
+        view_class = getattr(view, 'view_class', None)
+        return view_class.__name__ if view_class else (endpoint or 'none')
+
+    def _labels(self, endpoint, method, status):
+        """Return the label tuple for a request, resolving it once per key."""
+        key = (endpoint, method, status)
+        labels = self._keys.get(key)
+        if labels is None:
+            labels = (self._endpoint_label(endpoint), method, str(status))
+            self._keys[key] = labels
+        return labels
+
+    # The hooks resolve the request proxy once and keep their state in the
+    # WSGI environ: every proxy attribute access costs about a microsecond.
+
+    def _before_request(self):
+        request._get_current_object().environ[START_KEY] = perf_counter()
+        with self._lock:
+            self.in_flight += 1
+
+    def _after_request(self, response):
+        req = request._get_current_object()
+        start = req.environ.get(START_KEY)
+        if start is None:
+            return response
+        elapsed = perf_counter() - start
+        labels = self._labels(req.endpoint, req.method, response.status_code)
+        length = response.headers.get('Content-Length')
+
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = Series()
+            series.latency[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            series.latency_sum += elapsed
+            if length is not None:
+                length = int(length)
+                series.size[bisect_left(SIZE_BUCKETS, length)] += 1
+                series.size_sum += length
+                series.size_count += 1
+
+        if self.multiproc_dir and monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return response
+
+    def _teardown_request(self, exc):
+        if request._get_current_object().environ.pop(START_KEY, None) is not None:
+            with self._lock:
+                self.in_flight -= 1
+
+    def snapshot(self):
+        """Return this process's counters as a JSON-serialisable dict."""
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'in_flight': self.in_flight,
+                'series': [[list(labels), *series.to_list()]
+                           for labels, series in self._series.items()],
+                'histograms': {name: histogram.to_list()
+                               for name, histogram in self._histograms.items()},
+            }
+
+    def flush(self):
+        """Write this process's snapshot to the multiprocess directory."""
+        if not self.multiproc_dir:
+            return
+        self._last_flush = monotonic()
+        path = os.path.join(self.multiproc_dir, f'metrics-{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temporary, path)
+
+    def _collect(self):
+        """Return (series by labels, in-flight total, histograms by name) across all processes."""
+        if not self.multiproc_dir:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush()
+            snapshots = []
+            for path in glob.glob(os.path.join(self.multiproc_dir, 'metrics-*.json')):
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue  # being replaced or removed by its worker right now
+
+        merged, in_flight = {}, 0
+        with self._lock:
+            histograms = {name: Histogram(histogram.help_text, histogram.buckets)
+                          for name, histogram in self._histograms.items()}
+        for snapshot in snapshots:
+            if _process_alive(snapshot['pid']):
+                in_flight += snapshot['in_flight']
+            for labels, *data in snapshot['series']:
+                merged.setdefault(tuple(labels), Series()).merge_list(data)
+            for name, data in snapshot.get('histograms', {}).items():
+                if name in histograms:
+                    histograms[name].merge_list(data)
+        return merged, in_flight, histograms
+
+    def render(self):
+        """Return ``(body, content_type)`` in the Prometheus text format."""
+        series, in_flight, histograms = self._collect()
+        lines = [
+            '# HELP http_requests_total HTTP requests served',
+            '# TYPE http_requests_total counter',
+        ]
+        for labels, data in sorted(series.items()):
+            lines.append(f'http_requests_total{_format_labels(labels)} {sum(data.latency)}')
+
+        lines += [
+            '# HELP http_requests_in_flight HTTP requests being served',
+            '# TYPE http_requests_in_flight gauge',
+            f'http_requests_in_flight {in_flight}',
+        ]
+        lines += _histogram_lines('http_request_duration_seconds', 'HTTP request latency',
+                                  LATENCY_BUCKETS, series, 'latency', 'latency_sum')
+        lines += _histogram_lines('http_response_size_bytes', 'HTTP response body size',
+                                  SIZE_BUCKETS, series, 'size', 'size_sum')
+        for name, histogram in sorted(histograms.items()):
+            lines += [f'# HELP {name} {histogram.help_text}', f'# TYPE {name} histogram']
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f'{name}_sum {histogram.sum}', f'{name}_count {cumulative}']
+        return '\n'.join(lines) + '\n', CONTENT_TYPE
+
+
+def _process_alive(pid):
+    """Whether process ``pid`` is still running."""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, **extra):
+    pairs = [*zip(LABELS, labels), *extra.items()]
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _histogram_lines(name, help_text, buckets, series, counts_attr, sum_attr):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for labels, data in sorted(series.items()):
+        counts = getattr(data, counts_attr)
+        cumulative = 0
+        for bound, count in zip((*buckets, '+Inf'), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels(labels, le=bound)} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {getattr(data, sum_attr)}')
+        lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    return lines
@@ -1,12 +1,356 @@
 # app/models.py
 
+import re
+
+from sqlalchemy import (DDL, BigInteger, and_, column, delete, event, insert, literal, null, select, table, true,
+                        update)
+from sqlalchemy.exc import IntegrityError
+
 from . import db
 
+# SQLite full-text index over todos.title: an external-content FTS5 table kept
+# in sync by triggers, so every write path (ORM or bulk Core statements) is covered
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE todos_fts USING fts5(title, content='todos', content_rowid='id')",
+    "CREATE TRIGGER todos_fts_insert AFTER INSERT ON todos BEGIN "
+    "INSERT INTO todos_fts(rowid, title) VALUES (new.id, new.title); END",
+    "CREATE TRIGGER todos_fts_delete AFTER DELETE ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title) VALUES ('delete', old.id, old.title); END",
+    "CREATE TRIGGER todos_fts_update AFTER UPDATE OF title ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title) VALUES ('delete', old.id, old.title); "
+    "INSERT INTO todos_fts(rowid, title) VALUES (new.id, new.title); END",
+]
+MYSQL_SEARCH_DDL = "CREATE FULLTEXT INDEX ix_todos_title_fulltext ON todos (title)"
+
+todos_fts = table('todos_fts', column('rowid'), column('title'), column('rank'))
+
 class Todo(db.Model):
     """Model for the todos table."""
     __tablename__ = 'todos'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    title = db.Column(db.String(255), nullable=False)
+    title = db.Column(db.String(255), nullable=False, index=True)
+    # Change version (the todos TableVersion) of the last write to this todo; 0 for rows
+    # older than change tracking
+    version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0', index=True)
 
     def __repr__(self):
         return f"<Todo {self.id}: {self.title}>"
+
+    @classmethod
+    def next_change_version(cls, session=None):
+        """Bump the todos version stamp and return it, to stamp this transaction's changes with.
+
+        Call it before writing: the stamp's row stays locked until commit, so
+        change versions become visible in increasing order and a reader that
+        has seen version N has seen every change up to N. ``session``
+        defaults to ``db.session``; the async API passes its own through
+        ``AsyncSession.run_sync``.
+        """
+        return TableVersion.bump(cls.__tablename__, session)
+
+    @staticmethod
+    def _bulk_returning_supported(session):
+        """Whether the database of ``session`` can return ids from a batched INSERT."""
+        return session.get_bind().dialect.insert_executemany_returning
+
+    @classmethod
+    def bulk_insert(cls, titles, version=0, session=None):
+        """Insert many todos at change ``version`` in the current transaction and return their ids.
+
+        Where the dialect can return ids from an executemany (SQLite, MariaDB,
+        PostgreSQL) this is a batched multi-row INSERT ... RETURNING. Otherwise
+        (MySQL) the ORM flush still sends every row in the one transaction.
+        The caller is responsible for committing. ``session`` defaults to
+        ``db.session``.
+        """
+        session = db.session if session is None else session
+        if not titles:
+            return []
+        rows = [{'title': title, 'version': version} for title in titles]
+        if cls._bulk_returning_supported(session):
+            # Auto-increment ids are handed out in row order, so sorting the
+            # returned ids lines them up with ``titles``. Asking SQLAlchemy to
+            # do this (sort_by_parameter_order) makes SQLite fall back to one
+            # INSERT per row.
+            statement = insert(cls).returning(cls.id)
+            return sorted(session.scalars(statement, rows))
+
+        todos = [cls(**row) for row in rows]
+        session.add_all(todos)
+        session.flush()
+        return [todo.id for todo in todos]
+
+    @classmethod
+    def title_prefix_criteria(cls, prefix):
+        """Criteria for titles starting with ``prefix``, as a range the title index can seek.
+
+        A half-open range rather than ``LIKE 'prefix%'``, which SQLite only
+        runs against an index under case-insensitive collations.
+        """
+        criteria = [cls.title >= prefix]
+        if ord(prefix[-1]) < 0x10FFFF:
+            criteria.append(cls.title < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        return and_(*criteria)
+
+    @classmethod
+    def title_error(cls, item):
+        """Return why ``item`` is not a valid todo input (``{'title': ...}``), or None if it is.
+
+        Shared by the Flask and async APIs and the import command.
+        """
+        if not isinstance(item, dict) or 'title' not in item:
+            return 'Title is required'
+        title = item['title']
+        if not isinstance(title, str) or not title:
+            return 'Title must be a non-empty string'
+        max_length = cls.__table__.c.title.type.length
+        if len(title) > max_length:
+            return f'Title must be at most {max_length} characters'
+        return None
+
+    @staticmethod
+    def search_terms(text):
+        """Split free text into the words a title search matches on."""
+        return re.findall(r'\w+', text)
+
+    @classmethod
+    def search_statement(cls, terms, *entities):
+        """SELECT ``entities`` for todos whose title contains every word in ``terms``, best match first.
+
+        Backed by the FTS5 table on SQLite and the FULLTEXT index on MySQL,
+        so the cost grows with the number of matches, not the table size.
+        Ties (and other databases, which fall back to a LIKE scan) are
+        ordered by id.
+        """
+        dialect = db.engine.dialect.name
+        statement = select(*entities)
+        if dialect == 'sqlite':
+            query = ' '.join(f'"{term}"' for term in terms)
+            return (statement.join(todos_fts, todos_fts.c.rowid == cls.id)
+                    .where(todos_fts.c.title.match(query))
+                    .order_by(todos_fts.c.rank, cls.id))
+        if dialect == 'mysql':
+            # Rendered as MATCH (title) AGAINST (... IN BOOLEAN MODE); '+' makes each word required
+            relevance = cls.title.match(' '.join(f'+{term}' for term in terms))
+            return statement.where(relevance).order_by(relevance.desc(), cls.id)
+        criteria = [cls.title.contains(term, autoescape=True) for term in terms]
+        return statement.where(*criteria).order_by(cls.id)
+
+    @classmethod
+    def changes_statement(cls, since=None, after_id=None, limit=None):
+        """SELECT (op, id, title, version) of the upserts and deletes after change ``since``.
+
+        ``since=None`` selects every todo (including rows written before
+        change tracking, at version 0) and every tombstone. Ordered by
+        (version, id), the keyset to page with: ``after_id`` continues within
+        version ``since``. Each side seeks its version index, ordered and cut
+        to ``limit`` rows on its own, so a page reads at most ``2 * limit``
+        index entries whatever the size of the feed.
+        """
+        def changes(model, op, title):
+            statement = select(literal(op).label('op'), model.id, title, model.version)
+            if since is not None and after_id is None:
+                statement = statement.where(model.version > since)
+            elif since is not None:
+                # The version range first, so that the index seek does not depend on after_id
+                statement = statement.where(model.version >= since,
+                                            (model.version > since) | (model.id > after_id))
+            statement = statement.order_by(model.version, model.id)
+            if limit is not None:
+                statement = statement.limit(limit)
+            # A subquery, as SQLite allows no ORDER BY or LIMIT on the arms of a UNION itself
+            return select(statement.subquery())
+
+        changes = changes(cls, 'upsert', cls.title).union_all(
+            changes(TodoTombstone, 'delete', null().label('title'))).subquery()
+        statement = select(changes).order_by(changes.c.version, changes.c.id)
+        return statement if limit is None else statement.limit(limit)
+
+
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Todo.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Todo.__table__, 'after_create', DDL(MYSQL_SEARCH_DDL).execute_if(dialect='mysql'))
+event.listen(Todo.__table__, 'before_drop', DDL('DROP TABLE IF EXISTS todos_fts').execute_if(dialect='sqlite'))
+
+
+class TodoTombstone(db.Model):
+    """Marks a deleted todo, so change feeds can report the delete."""
+    __tablename__ = 'todo_tombstones'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.BigInteger, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<TodoTombstone {self.id}: {self.version}>"
+
+    @classmethod
+    def record_statements(cls, version, *criteria):
+        """Statements tombstoning the todos matching ``criteria`` at ``version``; run before deleting them.
+
+        An id can be deleted again after it was reused (SQLite hands out a
+        deleted max id anew, imports may keep ids), so the earlier tombstone
+        is dropped first: the DELETE and the INSERT upsert (id, version).
+        """
+        return [
+            delete(cls).where(cls.id.in_(select(Todo.id).where(*criteria))),
+            insert(cls).from_select(['id', 'version'],
+                                    select(Todo.id, literal(version, BigInteger)).where(*criteria)),
+        ]
+
+
+class TodoEvent(db.Model):
+    """Outbox of todo create/update/delete events, for the database-backed event broker.
+
+    Written in the transaction of the change it describes and keyed by
+    (version, todo_id), the order in which changes commit, so that every
+    worker process can read the events of all the others in order.
+    """
+    __tablename__ = 'todo_events'
+    version = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    todo_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    type = db.Column(db.String(16), nullable=False)
+    title = db.Column(db.String(255))
+    # Unix time of the write, for pruning old events
+    created_at = db.Column(db.BigInteger, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<TodoEvent {self.version}:{self.todo_id} {self.type}>"
+
+    @classmethod
+    def after_statement(cls, key):
+        """SELECT the events after ``key`` (a (version, todo_id) pair), in order."""
+        version, todo_id = key
+        return (
+            select(cls.version, cls.todo_id, cls.type, cls.title)
+            .where((cls.version > version) | ((cls.version == version) & (cls.todo_id > todo_id)))
+            .order_by(cls.version, cls.todo_id)
+        )
+
+
+class IdSequence(db.Model):
+    """Named counters handing out blocks of globally unique ids (for todos spread over shards)."""
+    __tablename__ = 'id_sequences'
+    name = db.Column(db.String(64), primary_key=True)
+    next_id = db.Column(db.BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<IdSequence {self.name}: {self.next_id}>"
+
+    @classmethod
+    def reserve(cls, name, count):
+        """Reserve ``count`` ids of sequence ``name`` and return the first.
+
+        Runs in a transaction of its own, committed before the ids are used,
+        so a write that fails only wastes its ids and never hands them out twice.
+        """
+        try:
+            with db.engine.begin() as connection:
+                reserved = connection.execute(
+                    update(cls).where(cls.name == name).values(next_id=cls.next_id + count))
+                if not reserved.rowcount:
+                    connection.execute(insert(cls).values(name=name, next_id=1 + count))
+                    return 1
+                return connection.scalar(select(cls.next_id).where(cls.name == name)) - count
+        except IntegrityError:  # another worker created the sequence first
+            return cls.reserve(name, count)
+
+    @classmethod
+    def skip_past(cls, name, last_id):
+        """Make sequence ``name`` hand out only ids above ``last_id`` (after inserting explicit ids)."""
+        first = cls.reserve(name, 0)
+        if first <= last_id:
+            cls.reserve(name, last_id + 1 - first)
+
+
+class ImportCheckpoint(db.Model):
+    """Rows of an import source already committed, for resuming ``flask todos import --checkpoint``.
+
+    Advanced in the same transaction as the chunk it counts, so a crash can
+    never leave a chunk committed but not counted (or the reverse).
+    """
+    __tablename__ = 'import_checkpoints'
+    name = db.Column(db.String(255), primary_key=True)
+    source = db.Column(db.String(1024), nullable=False)
+    rows = db.Column(db.BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f"<ImportCheckpoint {self.name}: {self.rows} rows of {self.source}>"
+
+    @classmethod
+    def advance(cls, name, source, rows):
+        """Record, in the current transaction, that the first ``rows`` rows of ``source`` are imported."""
+        updated = db.session.execute(
+            update(cls).where(cls.name == name).values(source=source, rows=rows))
+        if not updated.rowcount:
+            db.session.execute(insert(cls).values(name=name, source=source, rows=rows))
+
+
+class TableVersion(db.Model):
+    """Per-table write counter, bumped in the same transaction as each write.
+
+    Lets every worker process detect that a table changed (cache invalidation,
+    collection ETags) without reading the table itself, and stamps the change
+    feed's versions.
+
+    The bump takes the row lock of the table's counter and holds it until
+    commit, so writes to one table commit one at a time. This is deliberate:
+    versions then become visible in commit order, and a reader that has seen
+    version N will never later find a change at N or below. A sequence or
+    AUTO_INCREMENT hands numbers out at the start of a transaction rather
+    than at its commit, so sync clients could skip changes committed late.
+    Write throughput is bounded by the time from the bump to the commit:
+    bump last thing before writing, and batch writes (the batch endpoints,
+    group commit) to share one bump. ``benchmarks/stamp_contention.py``
+    measures the cost.
+    """
+    __tablename__ = 'table_versions'
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TableVersion {self.name}: {self.version}>"
+
+    @classmethod
+    def current_statement(cls, name):
+        """SELECT the version of table ``name``."""
+        return select(cls.version).where(cls.name == name)
+
+    @classmethod
+    def bump_statement(cls, name):
+        """UPDATE incrementing the version of table ``name``; matches no row if the counter is missing."""
+        return update(cls).where(cls.name == name).values(version=cls.version + 1)
+
+    @classmethod
+    def seed_statement(cls, name, version=0):
+        """INSERT the counter of table ``name``."""
+        return insert(cls).values(name=name, version=version)
+
+    @classmethod
+    def current(cls, name, session=None):
+        """Return the current version of table ``name`` (0 before any write)."""
+        session = db.session if session is None else session
+        return session.scalar(cls.current_statement(name)) or 0
+
+    @classmethod
+    def bump(cls, name, session=None):
+        """Increment the version of table ``name`` in the current transaction and return it.
+
+        The counters are seeded with the table; should one be missing, it is
+        created in a savepoint, and if a concurrent transaction created it
+        first the bump waits for that one and increments its row instead.
+        ``session`` defaults to ``db.session``.
+        """
+        session = db.session if session is None else session
+        if not session.execute(cls.bump_statement(name)).rowcount:
+            try:
+                with session.begin_nested():
+                    session.execute(cls.seed_statement(name, 1))
+                return 1
+            except IntegrityError:
+                return cls.bump(name, session)
+        return cls.current(name, session)
+
+
+# Seed the counters of the versioned tables with the table itself, as the migration does
+event.listen(TableVersion.__table__, 'after_create',
+             lambda target, connection, **kw: connection.execute(
+                 TableVersion.seed_statement(Todo.__tablename__)))
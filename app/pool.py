@@ -0,0 +1,93 @@
+# app/pool.py
+
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """Counters for one connection pool, safe to update from many threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.connections_invalidated = 0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_time_total += seconds
+            self.wait_time_max = max(self.wait_time_max, seconds)
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_time_total_ms': round(self.wait_time_total * 1000, 3),
+                'wait_time_max_ms': round(self.wait_time_max * 1000, 3),
+                'wait_time_avg_ms': round(self.wait_time_total * 1000 / self.checkouts, 3)
+                if self.checkouts else 0.0,
+                'connections_opened': self.connections_opened,
+                'connections_closed': self.connections_closed,
+                'connections_invalidated': self.connections_invalidated,
+            }
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records checkout wait times and connection churn.
+
+    The counters live on the pool instance, so they restart when the engine
+    is disposed and the pool recreated.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        event.listen(self, 'connect', lambda *_: self.stats.increment('connections_opened'))
+        event.listen(self, 'close', lambda *_: self.stats.increment('connections_closed'))
+        event.listen(self, 'invalidate', lambda *_: self.stats.increment('connections_invalidated'))
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+
+def pool_status(engine):
+    """Describe the live state of ``engine``'s connection pool."""
+    pool = engine.pool
+    status = {'class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+            'recycle': pool._recycle,
+            'pre_ping': pool._pre_ping,
+        })
+    else:
+        status['status'] = pool.status()
+    if isinstance(pool, MeteredQueuePool):
+        status.update(pool.stats.as_dict())
+    return status
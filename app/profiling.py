@@ -0,0 +1,118 @@
+# app/profiling.py
+
+import logging
+from collections import Counter
+from time import perf_counter
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfile:
+    """SQL statements executed while serving one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.statements = Counter()
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        self.statements[statement] += 1
+        if elapsed >= self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+
+    def repeated(self, threshold):
+        """Return ``(statement, count)`` pairs executed at least ``threshold`` times."""
+        return [(statement, count) for statement, count in self.statements.most_common()
+                if count >= threshold]
+
+    def server_timing(self):
+        """Format the profile as a Server-Timing header value."""
+        return (f'db;dur={self.total_time * 1000:.2f};desc="{self.count} queries", '
+                f'db-slowest;dur={self.slowest_time * 1000:.2f}')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('app.profiling.start', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('app.profiling.start')
+    if not started:
+        return
+    elapsed = perf_counter() - started.pop()
+    if has_request_context():
+        profile = g.get('_sql_profile')
+        if profile is not None:
+            profile.record(statement, elapsed)
+
+
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    started = context.connection.info.get('app.profiling.start') if context.connection else None
+    if started:
+        started.pop()
+
+
+_listening = False
+
+
+def _listen():
+    """Hook cursor execution on every engine (primary, replicas, shards) once per process."""
+    global _listening
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        _listening = True
+
+
+class SQLProfiler:
+    """Per-request SQL statement counts and timings.
+
+    Each response gets a ``Server-Timing`` header with the number of
+    statements, the total database time and the slowest statement, and the
+    same summary is logged at debug level. A statement text repeated at
+    least ``SQL_REPEAT_WARNING_THRESHOLD`` times within one request (the
+    shape of an N+1 query) is logged as a warning.
+
+    Statements run while a streamed response body is being sent happen after
+    the headers have left, so they are not included.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.repeat_threshold = app.config['SQL_REPEAT_WARNING_THRESHOLD']
+        _listen()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.extensions['sql_profiler'] = self
+
+    def _before_request(self):
+        g._sql_profile = RequestProfile()
+
+    def _after_request(self, response):
+        profile = g.pop('_sql_profile', None)
+        if profile is None:
+            return response
+
+        response.headers.add('Server-Timing', profile.server_timing())
+        if profile.count:
+            logger.debug('%s queries in %.2f ms, slowest %.2f ms: %s', profile.count,
+                         profile.total_time * 1000, profile.slowest_time * 1000,
+                         profile.slowest_statement)
+        for statement, count in profile.repeated(self.repeat_threshold):
+            logger.warning('Possible N+1 query: statement executed %s times in one request: %s',
+                           count, statement)
+        return response
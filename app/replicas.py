@@ -0,0 +1,245 @@
+# app/replicas.py
+
+import itertools
+import logging
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+from .pool import pool_status
+from .sharding import commit_shards, shard_bind
+
+logger = logging.getLogger(__name__)
+
+BALANCING = ('round_robin', 'least_connections')
+RECENT_WRITE_COOKIE = 'recent_write'
+READ_PRIMARY_HEADER = 'X-Read-Primary'
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class RoutingSession(Session):
+    """``db.session`` class that sends a request's reads to its chosen replica.
+
+    A view decorated with :func:`read_replica` sets ``g._db_replica``; every
+    statement the session runs for that request then goes to the replica's
+    engine. Flushes always go to the primary.
+
+    When todos are sharded, statements on the sharded tables go to the
+    request's shard instead (see :mod:`app.sharding`), and commits commit
+    the shards before the primary.
+    """
+
+    def __init__(self, *args, **kwargs):
+        # Shard connections are handed to the session in a transaction of our own, which
+        # the session rolls back with its own but leaves to commit_shards() to commit
+        kwargs.setdefault('join_transaction_mode', 'rollback_only')
+        super().__init__(*args, **kwargs)
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            shard = shard_bind(mapper, clause)
+            if shard is not None:
+                return shard
+        if bind is None and not self._flushing and has_app_context():
+            replica = g.get('_db_replica')
+            if replica is not None:
+                return replica.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def commit(self):
+        if has_app_context():
+            commit_shards(self)
+        super().commit()
+
+
+def _connect_failure_is_disconnect(context):
+    """Report a failure to open a connection as a disconnect, as the dialects do for dropped ones."""
+    if context.connection is None:
+        context.is_disconnect = True
+
+
+class Replica:
+    """One read replica: its engine, load and health."""
+
+    def __init__(self, uri, engine_options):
+        self.url = make_url(uri)
+        self.engine = create_engine(self.url, **engine_options)
+        # Errors with connection_invalidated set are the ones that eject the replica
+        event.listen(self.engine, 'handle_error', _connect_failure_is_disconnect)
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejected_until = None
+        # Set while one request probes this ejected replica, so others do not probe it too
+        self.probing = False
+
+    def describe(self):
+        return {
+            'url': self.url.render_as_string(hide_password=True),
+            'healthy': self.ejected_until is None,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures,
+            'pool': pool_status(self.engine),
+        }
+
+
+class ReplicaRouter:
+    """Routes read-only requests across read replicas of the primary database.
+
+    Reads are balanced round-robin or to the replica with the fewest
+    requests in flight. A replica whose connection fails or drops is
+    ejected for ``retry_interval`` seconds (other errors, such as a bad
+    query, are not its fault and leave it in rotation). After that one
+    request probes it with a ``SELECT 1``, outside the router's lock, before
+    it gets traffic again; with every replica ejected, reads fall back to
+    the primary.
+
+    Successful writes set a short-lived ``recent_write`` cookie so that the
+    same client reads from the primary until replicas have had time to
+    catch up; an ``X-Read-Primary`` request header does the same for one
+    request.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        if config['DB_REPLICA_BALANCING'] not in BALANCING:
+            raise ValueError(f"DB_REPLICA_BALANCING must be one of {', '.join(BALANCING)}")
+        self.balancing = config['DB_REPLICA_BALANCING']
+        self.retry_interval = config['DB_REPLICA_RETRY_INTERVAL']
+        self.read_your_writes = config['DB_REPLICA_READ_YOUR_WRITES_SECONDS']
+        self.replicas = [Replica(uri, config['SQLALCHEMY_ENGINE_OPTIONS'])
+                         for uri in config['SQLALCHEMY_REPLICA_URIS']]
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.extensions['replicas'] = self
+
+    def wants_primary(self):
+        """Whether the current request must read its own writes from the primary."""
+        return (request.headers.get(READ_PRIMARY_HEADER, '').lower() in ('1', 'true')
+                or RECENT_WRITE_COOKIE in request.cookies)
+
+    def _claim_probes(self):
+        """Ejected replicas whose retry time has come and that nobody is probing; call under the lock."""
+        now = time.monotonic()
+        due = [replica for replica in self.replicas
+               if replica.ejected_until is not None and replica.ejected_until <= now
+               and not replica.probing]
+        for replica in due:
+            replica.probing = True
+        return due
+
+    def _probe(self, replica):
+        """Check a claimed replica with ``SELECT 1``, without holding the lock."""
+        try:
+            with replica.engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+        except OperationalError:
+            healthy = False
+            logger.warning('Replica %s still unavailable', replica.url.render_as_string(True))
+        else:
+            healthy = True
+            logger.info('Replica %s is back', replica.url.render_as_string(True))
+        with self._lock:
+            replica.ejected_until = None if healthy else time.monotonic() + self.retry_interval
+            replica.probing = False
+
+    def acquire(self):
+        """Pick a replica for this request and count it as in flight; None to use the primary."""
+        with self._lock:
+            due = self._claim_probes()
+        for replica in due:
+            self._probe(replica)
+        with self._lock:
+            available = [replica for replica in self.replicas if replica.ejected_until is None]
+            if not available:
+                return None
+            if self.balancing == 'least_connections':
+                replica = min(available, key=lambda replica: replica.in_flight)
+            else:
+                replica = available[next(self._turn) % len(available)]
+            replica.in_flight += 1
+            replica.requests += 1
+        g._db_replica_lease = replica
+        return replica
+
+    def eject(self, replica):
+        """Take ``replica`` out of rotation after its connection failed or dropped."""
+        with self._lock:
+            replica.failures += 1
+            replica.ejected_until = time.monotonic() + self.retry_interval
+        replica.engine.dispose()
+        logger.warning('Ejected replica %s for %s s', replica.url.render_as_string(True),
+                       self.retry_interval)
+
+    def _after_request(self, response):
+        if request.method in WRITE_METHODS and response.status_code < 400 and self.read_your_writes:
+            response.set_cookie(RECENT_WRITE_COOKIE, '1', max_age=self.read_your_writes,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def release(self):
+        """Stop counting the current request against the replica it acquired."""
+        replica = g.pop('_db_replica_lease', None)
+        if replica is not None:
+            with self._lock:
+                replica.in_flight -= 1
+
+    def _teardown_request(self, exc):
+        self.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'balancing': self.balancing,
+                'replicas': [replica.describe() for replica in self.replicas],
+            }
+
+
+def reads_from_replica():
+    """Whether the current request's reads go to a replica (see :func:`read_replica`)."""
+    return has_app_context() and g.get('_db_replica') is not None
+
+
+def read_replica(view):
+    """Run a read-only view against a replica when replicas are configured.
+
+    If the replica's connection fails or drops (the error has
+    ``connection_invalidated`` set), it is ejected and the view runs again
+    on another replica or the primary. Other errors propagate as they would
+    on the primary.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        router = current_app.extensions.get('replicas')
+        if router is None or router.wants_primary():
+            return view(*args, **kwargs)
+        from . import db
+        while True:
+            replica = router.acquire()
+            g._db_replica = replica
+            if replica is None:
+                return view(*args, **kwargs)
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as error:
+                if not error.connection_invalidated:
+                    raise
+                db.session.rollback()
+                router.release()
+                router.eject(replica)
+                logger.warning('Read failed on replica %s; retrying',
+                               replica.url.render_as_string(True), exc_info=True)
+    return wrapper
@@ -1,6 +1,9 @@
 # app/routes/main.py
 
+from flask import Response, current_app
 from flask_restx import Namespace, Resource
+from app import db
+from app.pool import pool_status
 
 main_bp = Namespace('main', description='Main API endpoints')
 
@@ -13,3 +16,71 @@ class MainResource(Resource):
             'message': 'Todo Management API is running',
             'version': '1.0'
         }, 200
+
+
+@main_bp.route('/cache')
+class CacheStatsResource(Resource):
+    def get(self):
+        """Todo cache counters"""
+        cache = current_app.extensions.get('todo_cache')
+        if cache is None:
+            return {'status': 'disabled'}, 200
+        return {'status': 'enabled', **cache.stats()}, 200
+
+
+@main_bp.route('/group-commit')
+class GroupCommitStatsResource(Resource):
+    def get(self):
+        """Todo group commit batch statistics"""
+        committer = current_app.extensions.get('group_commit')
+        if committer is None:
+            return {'status': 'disabled'}, 200
+        return {'status': 'enabled', **committer.stats()}, 200
+
+
+@main_bp.route('/events')
+class EventStatsResource(Resource):
+    def get(self):
+        """Todo event broker subscribers and deliveries"""
+        broker = current_app.extensions.get('todo_events')
+        if broker is None:
+            return {'status': 'disabled'}, 200
+        return {'status': 'enabled', **broker.stats()}, 200
+
+
+@main_bp.route('/pool')
+class PoolStatsResource(Resource):
+    def get(self):
+        """Database connection pool statistics"""
+        return {'status': 'success', 'pool': pool_status(db.engine)}, 200
+
+
+@main_bp.route('/replicas')
+class ReplicaStatsResource(Resource):
+    def get(self):
+        """Read replica health and load"""
+        router = current_app.extensions.get('replicas')
+        if router is None:
+            return {'status': 'disabled'}, 200
+        return {'status': 'enabled', **router.stats()}, 200
+
+
+@main_bp.route('/shards')
+class ShardStatsResource(Resource):
+    def get(self):
+        """Todo shards and their pools"""
+        shards = current_app.extensions.get('todo_shards')
+        if shards is None:
+            return {'status': 'disabled'}, 200
+        return {'status': 'enabled', **shards.stats()}, 200
+
+
+@main_bp.route('/metrics')
+class MetricsResource(Resource):
+    def get(self):
+        """Request metrics in Prometheus text format"""
+        metrics = current_app.extensions.get('metrics')
+        if metrics is None:
+            main_bp.abort(404, 'Metrics are disabled')
+        body, content_type = metrics.render()
+        return Response(body, content_type=content_type)
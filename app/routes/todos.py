@@ -1,9 +1,21 @@
 # app/routes/todos.py
 
-from flask import request
-from flask_restx import Namespace, Resource, fields
+import hashlib
+import heapq
+import itertools
+import json
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from urllib.parse import urlencode
+
+from flask import Response, current_app, request, stream_with_context
+from flask_restx import Namespace, Resource, fields, inputs, marshal
+from sqlalchemy import and_, case, delete, insert, or_, select, update
+from werkzeug.http import quote_etag
 from app import db
-from app.models import Todo
+from app.events import Event, batch_events, batch_statement
+from app.models import TableVersion, Todo, TodoTombstone
+from app.replicas import read_replica, reads_from_replica
+from app.sharding import todos_version
 
 todos_bp = Namespace('todos', description='Todo management endpoints')
 
@@ -17,14 +29,590 @@ todo_input_model = todos_bp.model('TodoInput', {
     'title': fields.String(required=True, description='Todo title')
 })
 
+todo_batch_error_model = todos_bp.model('TodoBatchError', {
+    'index': fields.Integer(description='Position of the rejected item in the request'),
+    'message': fields.String(description='Why the item was rejected')
+})
+
+todo_batch_result_model = todos_bp.model('TodoBatchResult', {
+    'created': fields.List(fields.Nested(todo_model), description='Created todos, in request order'),
+    'errors': fields.List(fields.Nested(todo_batch_error_model), description='Rejected items')
+})
+
+todo_batch_update_model = todos_bp.model('TodoBatchUpdate', {
+    'id': fields.Integer(required=True, description='Todo unique identifier'),
+    'title': fields.String(required=True, description='New todo title')
+})
+
+todo_batch_update_result_model = todos_bp.model('TodoBatchUpdateResult', {
+    'updated': fields.Integer(description='Number of todos updated'),
+    'errors': fields.List(fields.Nested(todo_batch_error_model), description='Rejected items')
+})
+
+todo_filter_model = todos_bp.model('TodoFilter', {
+    'title': fields.String(description='Exact title match'),
+    'title_prefix': fields.String(description='Title starts with this text'),
+    'min_id': fields.Integer(description='Smallest id to include'),
+    'max_id': fields.Integer(description='Largest id to include')
+})
+
+todo_batch_delete_model = todos_bp.model('TodoBatchDelete', {
+    'ids': fields.List(fields.Integer, description='Ids of the todos to delete'),
+    'filter': fields.Nested(todo_filter_model, description='Delete every todo matching this filter')
+})
+
+todo_batch_delete_result_model = todos_bp.model('TodoBatchDeleteResult', {
+    'deleted': fields.Integer(description='Number of todos deleted')
+})
+
+todo_change_model = todos_bp.model('TodoChange', {
+    'op': fields.String(enum=['upsert', 'delete'], description='upsert: created or updated; delete: deleted'),
+    'id': fields.Integer(description='Todo unique identifier'),
+    'title': fields.String(description='Current title (null for deletes)'),
+    'version': fields.Integer(description='Change version of the write')
+})
+
+todo_changes_model = todos_bp.model('TodoChanges', {
+    'changes': fields.List(fields.Nested(todo_change_model), description='Changes in version order'),
+    'since': fields.Raw(description='Pass as since on the next request: a change version, '
+                                    'or when todos are sharded a token of every shard\'s position'),
+    'after_id': fields.Integer(description='Pass as after_id on the next request (set while has_more)'),
+    'has_more': fields.Boolean(description='Whether more changes follow right away')
+})
+
+
+# Ids and change versions are stored as (at most) signed 64-bit integers
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _int64(value):
+    """reqparse type for ids and versions: an integer the database can store."""
+    value = int(value)
+    if not INT64_MIN <= value <= INT64_MAX:
+        raise ValueError('must be a signed 64-bit integer')
+    return value
+
+
+_int64.__schema__ = {'type': 'integer', 'format': 'int64'}
+
+list_parser = todos_bp.parser()
+list_parser.add_argument('limit', type=int, location='args',
+                         help='Maximum number of todos to return')
+list_parser.add_argument('after_id', type=_int64, location='args',
+                         help='Cursor: only return todos after the todo with this id in the listing order')
+list_parser.add_argument('after_title', type=str, location='args',
+                         help='Cursor for sort=title: title of the todo given by after_id')
+list_parser.add_argument('sort', choices=('id', 'title'), location='args',
+                         help='Sort by id (default) or by title, ties broken by id')
+list_parser.add_argument('order', choices=('asc', 'desc'), location='args',
+                         help='Sort direction, ascending by default')
+list_parser.add_argument('title_prefix', type=str, location='args',
+                         help='Only return todos whose title starts with this text')
+list_parser.add_argument('min_id', type=_int64, location='args',
+                         help='Smallest id to include')
+list_parser.add_argument('max_id', type=_int64, location='args',
+                         help='Largest id to include')
+list_parser.add_argument('q', type=str, location='args',
+                         help='Full-text search: only return todos whose title contains every word, best match first')
+list_parser.add_argument('offset', type=_int64, location='args',
+                         help='With q: number of ranked results to skip')
+list_parser.add_argument('stream', type=inputs.boolean, location='args', default=False,
+                         help='Stream the listing as NDJSON (same as Accept: application/x-ndjson)')
+
+changes_parser = todos_bp.parser()
+changes_parser.add_argument('since', type=str, location='args',
+                            help='Only return changes after this version, or the since token of a sharded feed '
+                                 '(omit for a full sync)')
+changes_parser.add_argument('after_id', type=_int64, location='args',
+                            help='Cursor: continue within version since after this todo id')
+changes_parser.add_argument('limit', type=int, location='args',
+                            help='Maximum number of changes to return')
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+EVENT_STREAM_MIMETYPE = 'text/event-stream'
+# Keep proxies (nginx) from caching or buffering event streams
+EVENT_STREAM_HEADERS = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+
+# Listing arguments that only position a page; the rest are carried over to the next page link
+CURSOR_ARGS = ('limit', 'after_id', 'after_title', 'offset')
+
+
+def _document_model(model):
+    """Document ``model`` (or ``[model]``) as the 200 response without marshalling.
+
+    Equivalent to ``marshal_with``/``marshal_list_with`` for Swagger, but lets
+    the view return a raw ``Response`` (a stream, a 304) that must not go
+    through marshalling.
+    """
+    return todos_bp.doc(responses={'200': (None, model, {})}, __mask__=True)
+
+
+def _mask(req=None):
+    """Return the X-Fields mask sent by the client of ``req`` (default: the current request), if any."""
+    req = request if req is None else req
+    return req.headers.get(current_app.config['RESTX_MASK_HEADER'])
+
+
+def _marshal(data, model):
+    """Marshal ``data`` the way ``marshal_with`` would, honouring X-Fields."""
+    return marshal(data, model, mask=_mask())
+
+
+def _etag(*parts):
+    """Return a strong entity tag (unquoted) derived from ``parts``."""
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def _not_modified(etag):
+    """Return a 304 response if the client already holds ``etag``, else None."""
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers={'ETag': quote_etag(etag)})
+    return None
+
+
+def _page_size(limit):
+    """Resolve the requested page size against the configured bounds."""
+    if limit is None:
+        return current_app.config['TODOS_DEFAULT_PAGE_SIZE']
+    max_size = current_app.config['TODOS_MAX_PAGE_SIZE']
+    if limit < 1 or limit > max_size:
+        todos_bp.abort(400, f'limit must be between 1 and {max_size}')
+    return limit
+
+
+def _is_paged(args):
+    """Whether the listing is returned a page at a time.
+
+    Without paging arguments the full listing is returned, as before; search
+    results are always paged.
+    """
+    return args['limit'] is not None or args['after_id'] is not None or args['q'] is not None
+
+
+def _next_cursor(args, limit, last_id, last_title):
+    """Return the next cursor and the arguments fetching the page after the todo ``last_id``."""
+    if args['q'] is not None:
+        offset = (args['offset'] or 0) + limit
+        return offset, {'limit': limit, 'offset': offset}
+    cursor = {'limit': limit, 'after_id': last_id}
+    if args['sort'] == 'title':
+        cursor['after_title'] = last_title
+    return last_id, cursor
+
+
+def _next_page_headers(next_cursor, cursor, req=None):
+    """Build the headers advertising the following page, resumed with the ``cursor`` arguments.
+
+    ``req`` defaults to the current Flask request, as in reqparse's ``parse_args``.
+    """
+    req = request if req is None else req
+    params = {key: value for key, value in req.args.items() if key not in CURSOR_ARGS}
+    params.update(cursor)
+    query = urlencode(params)
+    return {
+        'X-Next-Cursor': str(next_cursor),
+        'Link': f'<{req.base_url}?{query}>; rel="next"',
+    }
+
+
+def _wants_stream(args, req=None):
+    """Whether the client of ``req`` (default: the current request) opted into the NDJSON listing."""
+    if args['stream']:
+        return True
+    req = request if req is None else req
+    best = req.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def _search_terms(args):
+    """Return the words of the ``q`` search, or None when the listing is not a search."""
+    if args['q'] is None:
+        if args['offset'] is not None:
+            todos_bp.abort(400, 'offset is only supported together with q')
+        return None
+    terms = Todo.search_terms(args['q'])
+    if not terms:
+        todos_bp.abort(400, 'q must contain at least one word')
+    if args['after_id'] is not None:
+        todos_bp.abort(400, 'Search results are ranked; page them with offset instead of after_id')
+    if args['sort'] is not None or args['order'] is not None:
+        todos_bp.abort(400, 'Search results are ranked and cannot be sorted')
+    if args['offset'] is not None and args['offset'] < 0:
+        todos_bp.abort(400, 'offset must not be negative')
+    return terms
+
+
+def _listing_criteria(args):
+    """Translate the title_prefix/min_id/max_id listing filters into SQL criteria."""
+    criteria = []
+    if args['title_prefix'] is not None:
+        if not args['title_prefix']:
+            todos_bp.abort(400, 'title_prefix must be a non-empty string')
+        criteria.append(Todo.title_prefix_criteria(args['title_prefix']))
+    if args['min_id'] is not None:
+        criteria.append(Todo.id >= args['min_id'])
+    if args['max_id'] is not None:
+        criteria.append(Todo.id <= args['max_id'])
+    return criteria
+
+
+def _after_cursor(args):
+    """Criteria resuming the listing after the ``after_id`` (and ``after_title``) cursor."""
+    descending = args['order'] == 'desc'
+    if args['sort'] == 'title':
+        if args['after_id'] is None and args['after_title'] is None:
+            return None
+        if args['after_id'] is None or args['after_title'] is None:
+            todos_bp.abort(400, 'sort=title pages with both after_title and after_id')
+        title, todo_id = args['after_title'], args['after_id']
+        if descending:
+            return or_(Todo.title < title, and_(Todo.title == title, Todo.id < todo_id))
+        return or_(Todo.title > title, and_(Todo.title == title, Todo.id > todo_id))
+
+    if args['after_title'] is not None:
+        todos_bp.abort(400, 'after_title is only used with sort=title')
+    if args['after_id'] is None:
+        return None
+    return Todo.id < args['after_id'] if descending else Todo.id > args['after_id']
+
+
+def _listing_statement(args, *entities):
+    """SELECT ``entities`` from todos: ranked ``q`` matches, or filtered and sorted after the cursor.
+
+    Every filter and sort is pushed down into SQL, where the primary key and
+    the title index serve them.
+    """
+    terms = _search_terms(args)
+    criteria = _listing_criteria(args)
+    if terms is not None:
+        statement = Todo.search_statement(terms, *entities).where(*criteria)
+        if args['offset']:
+            statement = statement.offset(args['offset'])
+        return statement
+
+    columns = (Todo.title, Todo.id) if args['sort'] == 'title' else (Todo.id,)
+    if args['order'] == 'desc':
+        columns = tuple(column.desc() for column in columns)
+    statement = select(*entities).where(*criteria).order_by(*columns)
+    cursor = _after_cursor(args)
+    if cursor is not None:
+        statement = statement.where(cursor)
+    return statement
+
+
+def _use_fast_serializer(req=None):
+    """Whether to skip marshalling (TODOS_FAST_SERIALIZER, unless ``req`` requests a mask)."""
+    req = request if req is None else req
+    return (current_app.config['TODOS_FAST_SERIALIZER']
+            and current_app.config['RESTX_MASK_HEADER'] not in req.headers)
+
+
+def _encode_rows(rows):
+    """Encode ``(id, title)`` tuples straight to a JSON array of todos."""
+    return json.dumps([{'id': todo_id, 'title': title} for todo_id, title in rows]) + '\n'
+
+
+def _stream_todos(args):
+    """Stream todos as NDJSON straight from a server-side cursor.
+
+    Rows are fetched ``TODOS_STREAM_BATCH_SIZE`` at a time and each batch is
+    written out as soon as it arrives, so memory stays flat and the first
+    bytes leave before the rest of the table has been read.
+    """
+    statement = _listing_statement(args, Todo.id, Todo.title)
+    if args['limit'] is not None:
+        statement = statement.limit(_page_size(args['limit']))
+    batch_size = current_app.config['TODOS_STREAM_BATCH_SIZE']
+
+    def generate():
+        result = db.session.execute(statement.execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            yield ''.join(
+                json.dumps({'id': todo_id, 'title': title}) + '\n'
+                for todo_id, title in rows
+            )
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+def _changes_statement(args):
+    """Validate the change feed arguments; returns the statement for one page (plus a row) and its size."""
+    since, after_id = args['since'], args['after_id']
+    if since is not None:
+        try:
+            since = args['since'] = _int64(since)
+        except ValueError:
+            todos_bp.abort(400, 'since must be a signed 64-bit integer')
+    if since is not None and since < 0:
+        todos_bp.abort(400, 'since must not be negative')
+    if after_id is not None and since is None:
+        todos_bp.abort(400, 'after_id continues a page of changes and needs since')
+    limit = _page_size(args['limit'])
+    return Todo.changes_statement(since, after_id, limit + 1), limit
+
+
+def _changes_page(args, version, rows, limit):
+    """Return the change feed body and, when more changes follow, the cursor arguments for them.
+
+    ``version`` is the todos stamp read before the rows: once the feed is
+    drained the client resumes from it, skipping versions without changes.
+    """
+    changes = [row._asdict() for row in rows[:limit]]
+    if len(rows) > limit:
+        last = changes[-1]
+        cursor = {'since': last['version'], 'after_id': last['id']}
+        return {'changes': changes, 'has_more': True, **cursor}, {'limit': limit, **cursor}
+    since = max([version, args['since'] or 0] + [change['version'] for change in changes])
+    return {'changes': changes, 'since': since, 'after_id': None, 'has_more': False}, None
+
+
+def _shard_positions(since, count):
+    """Parse the sharded change feed's ``since`` token into a (version, after_id) position per shard.
+
+    The token joins each shard's position with '.', as ``version`` or
+    ``version:after_id``; version -1 means from the start of that shard.
+    """
+    if since is None:
+        return [(-1, None)] * count
+    try:
+        positions = [[_int64(value) for value in part.split(':')] for part in since.split('.')]
+    except ValueError:
+        positions = []
+    if len(positions) != count or any(not 1 <= len(position) <= 2 or position[0] < -1
+                                      for position in positions):
+        todos_bp.abort(400, 'since must be a token returned by this change feed')
+    return [(position[0], position[1] if len(position) == 2 else None) for position in positions]
+
+
+def _sharded_changes_page(args, shards):
+    """The change feed over todo shards: ``_changes_page``'s body and cursor, ``since`` being a token.
+
+    Every shard has its own version stamp, so changes are merged by
+    (version, id) and the feed keeps a position on each shard: a shard
+    that is drained resumes from its stamp, one cut short after its last
+    change on the page.
+    """
+    if args['after_id'] is not None:
+        todos_bp.abort(400, 'after_id is part of the since token when todos are sharded')
+    positions = _shard_positions(args['since'], len(shards))
+    limit = _page_size(args['limit'])
+    # Read the stamps first: every change up to them is committed and in the rows below
+    versions = shards.versions()
+    rows = shards.gather_each([Todo.changes_statement(since, after_id, limit + 1)
+                               for since, after_id in positions])
+    merged = heapq.merge(*([(index, row) for row in shard_rows] for index, shard_rows in enumerate(rows)),
+                         key=lambda item: (item[1].version, item[1].id))
+    page = list(itertools.islice(merged, limit))
+    has_more = False
+    for index, shard_rows in enumerate(rows):
+        taken = [row for shard, row in page if shard == index]
+        if len(taken) == len(shard_rows) <= limit:
+            since = max([versions[index], positions[index][0]] + [row.version for row in taken])
+            positions[index] = (since, None)
+        else:
+            has_more = True
+            if taken:
+                positions[index] = (taken[-1].version, taken[-1].id)
+    token = '.'.join(str(since) if after_id is None else f'{since}:{after_id}' for since, after_id in positions)
+    body = {'changes': [row._asdict() for _, row in page], 'since': token, 'after_id': None,
+            'has_more': has_more}
+    return body, {'limit': limit, 'since': token} if has_more else None
+
+
+def _shards():
+    """The todo shards (TODOS_SHARD_URIS), or None when todos live on the primary database."""
+    return current_app.extensions.get('todo_shards')
+
+
+def _changed_todo_ids(since, limit):
+    """Ids of the todos written after change ``since``, or None when there are more than ``limit``.
+
+    The todo cache's ``changes_loader``. Sharded, ``since`` holds a version per shard (see ``todos_version``).
+    """
+    shards = _shards()
+
+    def statement(version):
+        return select(Todo.changes_statement(version, limit=limit + 1).subquery().c.id)
+
+    if shards is None:
+        ids = db.session.scalars(statement(since)).all()
+    else:
+        ids = [todo_id for rows in shards.gather_each([statement(version) for version in since])
+               for todo_id, in rows]
+    return None if len(ids) > limit else ids
+
+
+def _route_to_todo(todo_id):
+    """Send this request's statements on todos to the shard holding ``todo_id``, if sharded."""
+    shards = _shards()
+    if shards is not None:
+        shards.route(shards.shard_of(todo_id))
+
+
+def _new_todo_id():
+    """A new todo's id, already routed to its shard; None (autoincrement) when todos are not sharded."""
+    shards = _shards()
+    if shards is None:
+        return None
+    [todo_id] = shards.allocate_ids(1)
+    shards.route(shards.shard_of(todo_id))
+    return todo_id
+
+
+def _by_shard(ids=None):
+    """Yield the part of ``ids`` (None: all todos) on each shard, with the request routed to that shard.
+
+    Unsharded, yields ``ids`` once. A write bumps the todos version stamp in
+    each iteration: every shard has its own.
+    """
+    shards = _shards()
+    if shards is None:
+        yield ids
+        return
+    groups = shards.group(ids) if ids is not None else dict.fromkeys(range(len(shards)))
+    for index, shard_ids in groups.items():
+        shards.route(index)
+        yield shard_ids
+
+
+def _bulk_insert(titles):
+    """``Todo.bulk_insert`` at a new change version; returns the ids and the version.
+
+    Sharded, each shard gets its rows at a new version of its own stamp
+    (the returned version is None), and the ids are allocated first, as a
+    new id block is reserved in a transaction of its own.
+    """
+    shards = _shards()
+    if shards is None:
+        version = Todo.next_change_version()
+        return Todo.bulk_insert(titles, version), version
+    ids = shards.allocate_ids(len(titles))
+    titles_by_id = dict(zip(ids, titles))
+    for shard_ids in _by_shard(ids):
+        version = Todo.next_change_version()
+        db.session.execute(insert(Todo), [{'id': todo_id, 'title': titles_by_id[todo_id], 'version': version}
+                                          for todo_id in shard_ids])
+    return ids, None
+
+
+def _written_rows(version, event_type):
+    """(id, title) of the todos this write stamped with ``version`` on the routed shard, for its events.
+
+    Reads one row past TODOS_EVENTS_MAX_BATCH at most, and nothing when events are disabled.
+    """
+    if current_app.extensions.get('todo_events') is None:
+        return []
+    limit = current_app.config['TODOS_EVENTS_MAX_BATCH'] + 1
+    return db.session.execute(batch_statement(version, event_type, limit)).all()
+
+
+def _batch_events(version, event_type, rows):
+    """The events of a batch write (see ``batch_events``); none when events are disabled."""
+    if current_app.extensions.get('todo_events') is None:
+        return []
+    return batch_events(version, event_type, rows, current_app.config['TODOS_EVENTS_MAX_BATCH'])
+
+
+def _listing_key(args):
+    """Sort key of listing (id, title) rows, matching the ORDER BY of ``_listing_statement``."""
+    if args['sort'] == 'title':
+        return lambda row: (row.title, row.id)
+    return lambda row: row.id
+
+
+def _commit_todo_changes(todo_ids=None, events=()):
+    """Commit a write to todos, publish its ``events`` and invalidate cached copies of ``todo_ids``.
+
+    The write has already bumped the todos version stamp with
+    ``Todo.next_change_version()``, so caches in other worker processes
+    notice it. ``todo_ids=None`` means the affected ids are unknown and the
+    whole local cache is dropped.
+    """
+    broker = current_app.extensions.get('todo_events')
+    if broker is not None and events:
+        broker.commit(db.session, events)
+    else:
+        db.session.commit()
+    cache = current_app.extensions.get('todo_cache')
+    if cache is not None:
+        cache.invalidate(todo_ids)
+
+
+def _load_todo(id):
+    """Return todo ``id`` as a dict, through the read-through cache when enabled.
+
+    Only reads served by the primary fill the cache, and requests pinned to
+    the primary (read-your-writes) bypass it: a copy read from a lagging
+    replica must never reach a client that has to see its own writes.
+    """
+    def load():
+        todo = db.session.get(Todo, id)
+        return {'id': todo.id, 'title': todo.title} if todo else None
+
+    cache = current_app.extensions.get('todo_cache')
+    router = current_app.extensions.get('replicas')
+    if cache is None or (router is not None and router.wants_primary()):
+        return load()
+    return cache.get_or_load(id, load, store=not reads_from_replica())
+
 @todos_bp.route('/')
 class TodoList(Resource):
     @todos_bp.doc('list_todos')
-    @todos_bp.marshal_list_with(todo_model)
+    @todos_bp.expect(list_parser)
+    @_document_model([todo_model])
+    @read_replica
     def get(self):
-        """List all todos"""
-        todos = Todo.query.all()
-        return todos, 200
+        """List todos, optionally filtered, sorted and one keyset page at a time, or search them by title with q"""
+        args = list_parser.parse_args()
+        stream = _wants_stream(args)
+        fast = not stream and _use_fast_serializer()
+        shards = _shards()
+        if shards is not None and (stream or args['q'] is not None):
+            todos_bp.abort(400, 'Search and streaming are not available while todos are sharded')
+
+        # The collection ETag comes from the todos version stamp (every shard's), so
+        # an unchanged listing is answered without reading or encoding any todo.
+        version = todos_version()
+        etag = _etag('todos', version, sorted(request.args.items(multi=True)),
+                     _mask(), stream, fast)
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        headers = {'ETag': quote_etag(etag)}
+
+        if stream:
+            response = _stream_todos(args)
+            response.headers.update(headers)
+            return response
+
+        # The fast path reads bare (id, title) tuples; the default path
+        # hydrates Todo instances and marshals them through todo_model.
+        # Shards are read as tuples too, which are merged in listing order.
+        tuples = fast or shards is not None
+        if tuples:
+            statement = _listing_statement(args, Todo.id, Todo.title)
+        else:
+            statement = _listing_statement(args, Todo)
+
+        limit = _page_size(args['limit']) if _is_paged(args) else None
+        if limit is not None:
+            # Fetch one extra row to find out whether another page exists
+            statement = statement.limit(limit + 1)
+        if shards is not None:
+            rows = shards.merge(statement, _listing_key(args), reverse=args['order'] == 'desc',
+                                limit=None if limit is None else limit + 1)
+        else:
+            rows = db.session.execute(statement).all()
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1] if tuples else (rows[-1][0].id, rows[-1][0].title)
+            headers.update(_next_page_headers(*_next_cursor(args, limit, *last)))
+
+        if fast:
+            return Response(_encode_rows(rows), mimetype='application/json', headers=headers)
+        if shards is not None:
+            todos = [{'id': todo_id, 'title': title} for todo_id, title in rows]
+            return _marshal(todos, todo_model), 200, headers
+        return _marshal([row[0] for row in rows], todo_model), 200, headers
 
     @todos_bp.doc('create_todo')
     @todos_bp.expect(todo_input_model)
@@ -36,30 +624,233 @@ class TodoList(Resource):
         if not data or 'title' not in data:
             todos_bp.abort(400, 'Title is required')
 
-        new_todo = Todo(title=data['title'])
+        committer = current_app.extensions.get('group_commit')
+        if committer is not None:
+            # Answered only once the batch holding this todo has committed
+            try:
+                todo_id = committer.create(data['title'],
+                                           current_app.config['TODOS_GROUP_COMMIT_TIMEOUT'])
+            except FutureTimeoutError:
+                # Taken back out of the queue, so the todo was not created and the client may retry
+                todos_bp.abort(503, 'Timed out waiting for the todo to be committed; it was not created')
+            return {'id': todo_id, 'title': data['title']}, 201
+
+        new_todo = Todo(id=_new_todo_id(), title=data['title'], version=Todo.next_change_version())
         db.session.add(new_todo)
-        db.session.commit()
+        db.session.flush()
+        _commit_todo_changes([], [Event(new_todo.version, new_todo.id, 'created', new_todo.title)])
 
         return new_todo, 201
 
-@todos_bp.route('/<int:id>')
-@todos_bp.route('/<int:id>/')
+def _check_batch_size(items):
+    """Abort with 400 when ``items`` is larger than TODOS_MAX_BATCH_SIZE."""
+    max_size = current_app.config['TODOS_MAX_BATCH_SIZE']
+    if len(items) > max_size:
+        todos_bp.abort(400, f'Batch size {len(items)} exceeds the maximum of {max_size}')
+
+
+def _batch_payload():
+    """Return the JSON array posted to a batch endpoint, enforcing the size cap."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, list) or not data:
+        todos_bp.abort(400, 'Request body must be a non-empty JSON array')
+    _check_batch_size(data)
+    return data
+
+
+def _is_id(value):
+    """Whether ``value`` is a JSON integer usable as a todo id."""
+    return isinstance(value, int) and not isinstance(value, bool) and INT64_MIN <= value <= INT64_MAX
+
+
+def _filter_criteria(spec):
+    """Translate a TodoFilter object into SQL criteria."""
+    if not isinstance(spec, dict):
+        todos_bp.abort(400, 'filter must be an object')
+
+    criteria = []
+    if 'title' in spec:
+        message = Todo.title_error(spec)
+        if message:
+            todos_bp.abort(400, f'filter: {message}')
+        criteria.append(Todo.title == spec['title'])
+    if 'title_prefix' in spec:
+        if not isinstance(spec['title_prefix'], str) or not spec['title_prefix']:
+            todos_bp.abort(400, 'title_prefix must be a non-empty string')
+        criteria.append(Todo.title_prefix_criteria(spec['title_prefix']))
+    for key in ('min_id', 'max_id'):
+        if key in spec and not _is_id(spec[key]):
+            todos_bp.abort(400, f'{key} must be an integer')
+    if 'min_id' in spec:
+        criteria.append(Todo.id >= spec['min_id'])
+    if 'max_id' in spec:
+        criteria.append(Todo.id <= spec['max_id'])
+
+    if not criteria:
+        todos_bp.abort(400, 'filter must contain at least one of title, title_prefix, min_id, max_id')
+    return criteria
+
+@todos_bp.route('/changes')
+class TodoChanges(Resource):
+    @todos_bp.doc('list_todo_changes')
+    @todos_bp.expect(changes_parser)
+    @todos_bp.marshal_with(todo_changes_model)
+    def get(self):
+        """List creates, updates and deletes after a change version, for incremental sync"""
+        args = changes_parser.parse_args()
+        shards = _shards()
+        if shards is not None:
+            body, cursor = _sharded_changes_page(args, shards)
+            next_cursor = cursor and cursor['since']
+        else:
+            statement, limit = _changes_statement(args)
+            # Read the stamp first: every change up to it is committed and in the rows below
+            version = TableVersion.current(Todo.__tablename__)
+            rows = db.session.execute(statement).all()
+            body, cursor = _changes_page(args, version, rows, limit)
+            next_cursor = cursor and f"{cursor['since']}:{cursor['after_id']}"
+        if cursor is None:
+            return body, 200
+        return body, 200, _next_page_headers(next_cursor, cursor)
+
+@todos_bp.route('/events')
+class TodoEvents(Resource):
+    @todos_bp.doc('stream_todo_events', params={'Last-Event-ID': {'in': 'header', 'type': 'string',
+                  'description': 'Resume after this event (sent by EventSource on reconnect)'}})
+    @todos_bp.produces([EVENT_STREAM_MIMETYPE])
+    def get(self):
+        """Stream todo created, updated and deleted events as Server-Sent Events"""
+        broker = current_app.extensions.get('todo_events')
+        if broker is None:
+            todos_bp.abort(404, 'Todo events are disabled')
+        config = current_app.config
+        # Not stream_with_context: the stream outlives the request and must not hold its session
+        stream = broker.stream(request.headers.get('Last-Event-ID'),
+                               config['TODOS_EVENTS_HEARTBEAT'], config['TODOS_EVENTS_RETRY'])
+        return Response(stream, mimetype=EVENT_STREAM_MIMETYPE, headers=EVENT_STREAM_HEADERS)
+
+@todos_bp.route('/batch')
+class TodoBatch(Resource):
+    @todos_bp.doc('create_todos_batch')
+    @todos_bp.expect([todo_input_model])
+    @todos_bp.response(207, 'Some items were rejected', todo_batch_result_model)
+    @todos_bp.response(400, 'No valid items, or the batch is too large', todo_batch_result_model)
+    @todos_bp.marshal_with(todo_batch_result_model, code=201)
+    def post(self):
+        """Create many todos in a single transaction"""
+        data = _batch_payload()
+
+        titles, errors = [], []
+        for index, item in enumerate(data):
+            message = Todo.title_error(item)
+            if message:
+                errors.append({'index': index, 'message': message})
+            else:
+                titles.append(item['title'])
+
+        if not titles:
+            return {'created': [], 'errors': errors}, 400
+
+        ids, version = _bulk_insert(titles)
+        _commit_todo_changes([], _batch_events(version, 'created', list(zip(ids, titles))))
+
+        created = [{'id': todo_id, 'title': title} for todo_id, title in zip(ids, titles)]
+        return {'created': created, 'errors': errors}, 207 if errors else 201
+
+    @todos_bp.doc('update_todos_batch')
+    @todos_bp.expect([todo_batch_update_model])
+    @todos_bp.marshal_with(todo_batch_update_result_model)
+    def patch(self):
+        """Rename many todos with a single UPDATE ... WHERE id IN statement"""
+        data = _batch_payload()
+
+        titles, errors = {}, []
+        for index, item in enumerate(data):
+            message = Todo.title_error(item)
+            if not message and not _is_id(item.get('id')):
+                message = 'id must be an integer'
+            if message:
+                errors.append({'index': index, 'message': message})
+            else:
+                titles[item['id']] = item['title']  # the last entry for an id wins
+
+        if not titles:
+            return {'updated': 0, 'errors': errors}, 400
+
+        updated, events = 0, []
+        for ids in _by_shard(list(titles)):
+            version = Todo.next_change_version()
+            statement = (
+                update(Todo)
+                .where(Todo.id.in_(ids))
+                .values(title=case({todo_id: titles[todo_id] for todo_id in ids}, value=Todo.id),
+                        version=version)
+                .execution_options(synchronize_session=False)
+            )
+            updated += db.session.execute(statement).rowcount
+            events += _batch_events(version, 'updated', _written_rows(version, 'updated'))
+        _commit_todo_changes(list(titles), events)
+
+        return {'updated': updated, 'errors': errors}, 200
+
+    @todos_bp.doc('delete_todos_batch')
+    @todos_bp.expect(todo_batch_delete_model)
+    @todos_bp.marshal_with(todo_batch_delete_result_model)
+    def delete(self):
+        """Delete many todos by id list or filter with a single DELETE statement"""
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or ('ids' in data) == ('filter' in data):
+            todos_bp.abort(400, 'Provide exactly one of ids or filter')
+
+        ids = None
+        if 'ids' in data:
+            ids = data['ids']
+            if not isinstance(ids, list) or not ids or not all(_is_id(i) for i in ids):
+                todos_bp.abort(400, 'ids must be a non-empty list of integers')
+            _check_batch_size(ids)
+        else:
+            criteria = _filter_criteria(data['filter'])
+
+        deleted, events = 0, []
+        for shard_ids in _by_shard(ids):
+            version = Todo.next_change_version()
+            if shard_ids is not None:
+                criteria = [Todo.id.in_(shard_ids)]
+            for tombstones in TodoTombstone.record_statements(version, *criteria):
+                db.session.execute(tombstones)
+            statement = delete(Todo).where(*criteria).execution_options(synchronize_session=False)
+            deleted += db.session.execute(statement).rowcount
+            events += _batch_events(version, 'deleted', _written_rows(version, 'deleted'))
+        _commit_todo_changes(ids, events)
+
+        return {'deleted': deleted}, 200
+
+@todos_bp.route(f'/<int(max={INT64_MAX}):id>')
+@todos_bp.route(f'/<int(max={INT64_MAX}):id>/')
 @todos_bp.param('id', 'The todo identifier')
 class TodoResource(Resource):
     @todos_bp.doc('get_todo')
-    @todos_bp.marshal_with(todo_model)
+    @_document_model(todo_model)
+    @read_replica
     def get(self, id):
         """Get a todo by ID"""
-        todo = Todo.query.get(id)
+        _route_to_todo(id)
+        todo = _load_todo(id)
         if not todo:
             todos_bp.abort(404, f'Todo {id} not found')
-        return todo, 200
+
+        etag = _etag('todo', todo['id'], todo['title'], _mask())
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        return _marshal(todo, todo_model), 200, {'ETag': quote_etag(etag)}
 
     @todos_bp.doc('update_todo')
     @todos_bp.expect(todo_input_model)
     @todos_bp.marshal_with(todo_model)
     def put(self, id):
         """Update a todo"""
+        _route_to_todo(id)
         todo = Todo.query.get(id)
         if not todo:
             todos_bp.abort(404, f'Todo {id} not found')
@@ -68,8 +859,9 @@ class TodoResource(Resource):
         if not data or 'title' not in data:
             todos_bp.abort(400, 'Title is required')
 
+        todo.version = Todo.next_change_version()
         todo.title = data['title']
-        db.session.commit()
+        _commit_todo_changes([id], [Event(todo.version, id, 'updated', todo.title)])
 
         return todo, 200
 
@@ -77,11 +869,15 @@ class TodoResource(Resource):
     @todos_bp.response(204, 'Todo deleted')
     def delete(self, id):
         """Delete a todo"""
+        _route_to_todo(id)
         todo = Todo.query.get(id)
         if not todo:
             todos_bp.abort(404, f'Todo {id} not found')
 
+        version = Todo.next_change_version()
+        for tombstones in TodoTombstone.record_statements(version, Todo.id == id):
+            db.session.execute(tombstones)
         db.session.delete(todo)
-        db.session.commit()
+        _commit_todo_changes([id], [Event(version, id, 'deleted', None)])
 
         return '', 204
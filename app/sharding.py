@@ -0,0 +1,252 @@
+# app/sharding.py
+
+import heapq
+import itertools
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.util import find_tables
+
+from .pool import pool_status
+
+# Tables spread over the shards; every other table stays on the primary database. Each shard
+# keeps its own todos version stamp, committed with the rows and tombstones it versions
+SHARDED_TABLES = ('todos', 'todo_tombstones', 'table_versions')
+ID_SEQUENCE = 'todos'
+# Databases whose title order the merged listings can match: code point order, SQLite's default
+# collation, which MySQL shards get from create_all. Others sort titles by locale, so are refused
+SHARD_BACKENDS = ('sqlite', 'mysql', 'mariadb')
+MYSQL_BINARY_TITLE_DDL = ("ALTER TABLE todos MODIFY title VARCHAR(255) "
+                          "CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL")
+
+
+def _targets_shard(mapper, clause):
+    """Whether a statement for ``mapper`` / ``clause`` reads or writes a sharded table."""
+    if mapper is not None:
+        return mapper.local_table.name in SHARDED_TABLES
+    if clause is not None:
+        return any(getattr(table, 'name', None) in SHARDED_TABLES
+                   for table in find_tables(clause, include_crud=True))
+    return False
+
+
+def shard_bind(mapper, clause):
+    """The connection to run a sharded statement on, or None for statements on the primary.
+
+    Called by ``RoutingSession.get_bind``. The shard is the one the current
+    request selected with :meth:`TodoShards.route`; reaching a sharded table
+    without one is a bug, as it would silently read the primary's empty copy.
+    """
+    if not has_app_context():
+        return None
+    shards = current_app.extensions.get('todo_shards')
+    if shards is None or not _targets_shard(mapper, clause):
+        return None
+    index = g.get('_todo_shard')
+    if index is None:
+        raise RuntimeError('todos are sharded: route the request to a shard first')
+    return shards.connection(index)
+
+
+def todos_version():
+    """The todos version stamp, or when sharded the tuple of every shard's stamp.
+
+    Compares like the single stamp: it changes whenever any shard commits
+    a todo write (collection ETags, the cache).
+    """
+    from .models import TableVersion, Todo
+    shards = current_app.extensions.get('todo_shards')
+    if shards is None:
+        return TableVersion.current(Todo.__tablename__)
+    return shards.versions()
+
+
+def commit_shards(session):
+    """Flush ``session`` and commit the request's shard transactions, ahead of the primary's.
+
+    Called by ``RoutingSession.commit`` before it commits the primary. A
+    shard's transaction holds its rows, tombstones and version stamp, so
+    each commit is self-contained; the primary only holds what is not about
+    todos. There is no two-phase commit: should a shard fail to commit
+    after another has, a write spanning both stays applied on the first.
+    """
+    connections = [connection for connection in g.get('_todo_shard_connections', {}).values()
+                   if connection.in_transaction()]
+    if connections:
+        session.flush()
+        for connection in connections:
+            connection.commit()
+
+
+class TodoShards:
+    """Hash-shards the todos (and their tombstones) over the ``TODOS_SHARD_URIS`` databases.
+
+    A todo lives on shard ``crc32(id) % N``. Ids are globally unique: they
+    come from blocks of ``id_block_size`` reserved on the primary's
+    ``id_sequences`` table, in a transaction of their own, so each worker
+    hands out ids without a round trip per todo.
+
+    Views route single-todo statements to one shard with :meth:`route`; the
+    session then runs everything on ``SHARDED_TABLES`` over that shard's
+    connection (including the todos version stamp, bumped once per shard a
+    write touches), and the rest on the primary. Listings run on every
+    shard at once with :meth:`merge`, each shard answering the same keyset
+    query, and are merged in the same order. A write spanning several
+    shards is atomic on each of them, not across them.
+    Titles are merged in code point order, which matches SQLite's default
+    collation; :meth:`create_all` gives ``todos.title`` a binary collation
+    on MySQL, so every shard sorts (and filters by prefix) case-sensitively.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        self.urls = [make_url(uri) for uri in config['TODOS_SHARD_URIS']]
+        for url in self.urls:
+            if url.get_backend_name() not in SHARD_BACKENDS:
+                raise ValueError(f'TODOS_SHARD_URIS supports {", ".join(SHARD_BACKENDS)} databases, '
+                                 f'not {url.get_backend_name()}')
+        self.engines = [create_engine(url, **config['SQLALCHEMY_ENGINE_OPTIONS']) for url in self.urls]
+        self.id_block_size = config['TODOS_SHARD_ID_BLOCK_SIZE']
+        self._lock = threading.Lock()
+        self._pid = None
+        self._next_id = self._end_id = 0
+        self._executor = None
+        self._executor_pid = None
+        app.teardown_appcontext(self._teardown)
+        app.extensions['todo_shards'] = self
+
+    def __len__(self):
+        return len(self.engines)
+
+    def shard_of(self, todo_id):
+        """Index of the shard holding todo ``todo_id``."""
+        return zlib.crc32(todo_id.to_bytes(8, 'big')) % len(self.engines)
+
+    def route(self, index):
+        """Send this request's statements on the sharded tables to shard ``index`` from now on."""
+        g._todo_shard = index
+
+    def connection(self, index):
+        """This request's connection to shard ``index``, in a transaction the session joins.
+
+        The session rolls it back with its own transaction but leaves the
+        commit to :func:`commit_shards`.
+        """
+        connections = g.setdefault('_todo_shard_connections', {})
+        if index not in connections:
+            connections[index] = self.engines[index].connect()
+        connection = connections[index]
+        if not connection.in_transaction():
+            connection.begin()
+        return connection
+
+    def _teardown(self, exc):
+        for connection in g.pop('_todo_shard_connections', {}).values():
+            connection.close()
+
+    def group(self, ids):
+        """``{shard index: ids}`` for ``ids``, keeping their order within each shard."""
+        groups = {}
+        for todo_id in ids:
+            groups.setdefault(self.shard_of(todo_id), []).append(todo_id)
+        return dict(sorted(groups.items()))
+
+    def allocate_ids(self, count):
+        """Return ``count`` new globally unique todo ids."""
+        from .models import IdSequence
+        with self._lock:
+            if self._pid != os.getpid():
+                # A block reserved before a fork belongs to the parent
+                self._next_id = self._end_id = 0
+                self._pid = os.getpid()
+            ids = []
+            while len(ids) < count:
+                if self._next_id == self._end_id:
+                    size = max(self.id_block_size, count - len(ids))
+                    self._next_id = IdSequence.reserve(ID_SEQUENCE, size)
+                    self._end_id = self._next_id + size
+                take = min(count - len(ids), self._end_id - self._next_id)
+                ids.extend(range(self._next_id, self._next_id + take))
+                self._next_id += take
+            return ids
+
+    def skip_ids_past(self, last_id):
+        """Never hand out ids up to ``last_id`` again, after todos were inserted with explicit ids.
+
+        Drops this process's reserved block if it overlaps; blocks other
+        worker processes already hold are not affected.
+        """
+        from .models import IdSequence
+        with self._lock:
+            IdSequence.skip_past(ID_SEQUENCE, last_id)
+            if self._next_id <= last_id:
+                self._next_id = self._end_id = 0
+
+    def _pool(self):
+        """The thread pool for scatter-gather reads, created in each process on first use."""
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=len(self.engines),
+                                                        thread_name_prefix='todo-shards')
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def gather(self, statement):
+        """Run the read-only ``statement`` on every shard in parallel; returns each shard's rows."""
+        return self.gather_each([statement] * len(self.engines))
+
+    def gather_each(self, statements):
+        """Run read-only ``statements[i]`` on shard ``i``, all in parallel; returns each shard's rows."""
+        def run(engine, statement):
+            with engine.connect() as connection:
+                return connection.execute(statement).all()
+
+        if len(self.engines) == 1:
+            return [run(self.engines[0], statements[0])]
+        return list(self._pool().map(run, self.engines, statements))
+
+    def versions(self):
+        """Every shard's todos version stamp, as a tuple in shard order."""
+        from .models import TableVersion, Todo
+        rows = self.gather(TableVersion.current_statement(Todo.__tablename__))
+        return tuple(shard_rows[0][0] if shard_rows else 0 for shard_rows in rows)
+
+    def merge(self, statement, key, reverse=False, limit=None):
+        """Gather ``statement``, ordered by ``key`` on every shard, and merge the rows in that order.
+
+        With ``limit`` each shard needs to return at most ``limit`` rows
+        (the statement's own LIMIT), as the merged page cannot take more
+        than that from any one of them.
+        """
+        merged = heapq.merge(*self.gather(statement), key=key, reverse=reverse)
+        return list(itertools.islice(merged, limit))
+
+    def create_all(self):
+        """Create the sharded tables on every shard that lacks them (seeding the version stamp).
+
+        On MySQL, also (re)sets ``todos.title`` to the binary collation that
+        the merged title order relies on.
+        """
+        from . import db
+        tables = [db.metadata.tables[name] for name in SHARDED_TABLES]
+        for engine in self.engines:
+            db.metadata.create_all(engine, tables=tables)
+            if engine.dialect.name == 'mysql':
+                with engine.begin() as connection:
+                    connection.exec_driver_sql(MYSQL_BINARY_TITLE_DDL)
+
+    def stats(self):
+        return {
+            'shards': [{'url': url.render_as_string(hide_password=True), 'pool': pool_status(engine)}
+                       for url, engine in zip(self.urls, self.engines)],
+        }
@@ -0,0 +1,85 @@
+# app/swagger.py
+
+import hashlib
+import json
+import logging
+import threading
+from http import HTTPStatus
+
+from flask import Response, request
+from flask_restx.swagger import Swagger
+
+logger = logging.getLogger(__name__)
+
+
+def routes_fingerprint(app):
+    """Hash of the app's registered URL rules; changes whenever a route is added or removed."""
+    rules = sorted(
+        (rule.rule, rule.endpoint, ','.join(sorted(rule.methods or ())))
+        for rule in app.url_map.iter_rules()
+    )
+    return hashlib.sha1(json.dumps(rules).encode()).hexdigest()
+
+
+class SpecCache:
+    """Serves the flask-restx Swagger spec from bytes encoded once per process.
+
+    flask-restx keeps the spec dict after the first build, never invalidates
+    it, and re-encodes it on every request to ``/swagger.json``. This encodes
+    it once with sorted keys, so every worker produces the same bytes and
+    ETag, serves it with long-lived cache headers, and only rebuilds it when
+    the registered routes change.
+    """
+
+    def __init__(self, app, api, max_age=3600):
+        self.app = app
+        self.api = api
+        self.max_age = max_age
+        self._fingerprint = None
+        self._body = None
+        self._etag = None
+        self._lock = threading.Lock()
+        self.builds = 0
+
+    def spec(self):
+        """Return ``(body, etag)``, building the spec on first use or after the routes changed."""
+        fingerprint = routes_fingerprint(self.app)
+        if fingerprint != self._fingerprint:
+            with self._lock:
+                if fingerprint != self._fingerprint:
+                    try:
+                        schema = Swagger(self.api).as_dict()
+                    except Exception:
+                        logger.exception('Unable to render schema')
+                        return None, None
+                    self._body = json.dumps(schema, sort_keys=True, separators=(',', ':')).encode()
+                    self._etag = hashlib.sha1(self._body).hexdigest()
+                    self._fingerprint = fingerprint
+                    self.builds += 1
+        return self._body, self._etag
+
+    def view(self):
+        """Flask view replacing flask-restx's ``specs`` endpoint."""
+        body, etag = self.spec()
+        if body is None:
+            return {'error': 'Unable to render schema'}, HTTPStatus.INTERNAL_SERVER_ERROR
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': f'public, max-age={self.max_age}'}
+        if request.if_none_match.contains_weak(etag):
+            return Response(status=HTTPStatus.NOT_MODIFIED, headers=headers)
+        return Response(body, content_type='application/json', headers=headers)
+
+    def install(self):
+        """Route the API's ``/swagger.json`` to :meth:`view`."""
+        self.app.view_functions[self.api.endpoint('specs')] = self.view
+        self.app.extensions['swagger_spec'] = self
+        return self
+
+    def write(self, path):
+        """Emit the spec to a static file, e.g. at build time; returns its ETag."""
+        with self.app.test_request_context():
+            body, etag = self.spec()
+        if body is None:
+            raise RuntimeError('Unable to render schema')
+        with open(path, 'wb') as f:
+            f.write(body)
+        return etag
@@ -0,0 +1,153 @@
+# benchmarks/async_vs_sync.py
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx2
+
+from app import create_app, db
+from benchmarks.endpoint_suite import make_config, percentile, seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Flask on Werkzeug's threaded server (what run.py uses), one thread per in-flight request;
+# HTTP/1.1 so both servers keep client connections alive
+SYNC_SERVER = """
+import logging, sys
+from werkzeug.serving import WSGIRequestHandler, run_simple
+from app import create_app
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+run_simple('127.0.0.1', int(sys.argv[1]), create_app(), threaded=True)
+"""
+
+# The async todos API on uvicorn's event loop
+ASYNC_SERVER = """
+import sys, uvicorn
+uvicorn.run('app.asgi:create_asgi_app', factory=True, host='127.0.0.1', port=int(sys.argv[1]),
+            log_level='warning', access_log=False)
+"""
+
+SERVERS = {"sync": SYNC_SERVER, "async": ASYNC_SERVER}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, database_uri):
+    """Start one server process and wait until it answers."""
+    port = free_port()
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI=database_uri, DEBUG="False")
+    process = subprocess.Popen([sys.executable, "-c", SERVERS[mode], str(port)], cwd=ROOT, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx2.get(f"{base_url}/api/todos/?limit=1").raise_for_status()
+            return process, base_url
+        except httpx2.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def drive(base_url, rows, concurrency, duration, seed_value):
+    """Keep ``concurrency`` requests in flight for ``duration`` seconds; returns the summary."""
+    latencies, errors = [], 0
+    limits = httpx2.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx2.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(worker_seed):
+            nonlocal errors
+            rng = random.Random(worker_seed)
+            while time.perf_counter() < deadline:
+                if rng.random() < 0.8:
+                    path = f"/api/todos/{rng.randint(1, rows)}"
+                else:
+                    path = f"/api/todos/?limit=100&after_id={rng.randint(0, rows)}"
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    response.raise_for_status()
+                except httpx2.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(seed_value + i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def prepare_database(directory, rows):
+    """Create and seed a SQLite file shared by both servers."""
+    path = os.path.join(directory, "async_vs_sync.db")
+    with create_app(config_class=make_config(path)).app_context():
+        db.create_all()
+        seed(rows)
+    return f"sqlite:///{path}"
+
+
+def run(rows, concurrency_levels, duration, database_uri=None):
+    """Requests/sec of the sync (WSGI) and async (ASGI) todos APIs side by side at rising concurrency."""
+    report = {"rows": rows, "duration_s": duration, "results": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        database_uri = database_uri or prepare_database(directory, rows)
+        for mode in SERVERS:
+            process, base_url = start_server(mode, database_uri)
+            try:
+                for concurrency in concurrency_levels:
+                    summary = asyncio.run(drive(base_url, rows, concurrency, duration, seed_value=1234))
+                    report["results"].setdefault(str(concurrency), {})[mode] = summary
+            finally:
+                process.terminate()
+                process.wait()
+
+    for concurrency, modes in report["results"].items():
+        print(f"concurrency {concurrency}")
+        for mode, summary in modes.items():
+            print(f"  {mode:<6} {summary['rps']:8.1f} req/s  p50 {summary['p50_ms']:8.2f} ms  "
+                  f"p95 {summary['p95_ms']:8.2f} ms  p99 {summary['p99_ms']:8.2f} ms  "
+                  f"errors {summary['errors']}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=run.__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--concurrency", default="10,100,500",
+                        help="Comma-separated numbers of requests kept in flight")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per concurrency level")
+    parser.add_argument("--database-uri",
+                        help="Benchmark against this existing, seeded database instead of a temporary SQLite file")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    options = parser.parse_args()
+    levels = [int(level) for level in options.concurrency.split(",")]
+    report = run(options.rows, levels, options.duration, options.database_uri)
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,74 @@
+# benchmarks/cache_hits.py
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.config import TestingConfig
+
+
+def make_config(check_interval):
+    class CacheConfig(TestingConfig):
+        TODOS_CACHE_ENABLED = True
+        TODOS_CACHE_VERSION_CHECK_INTERVAL = check_interval
+        SQL_PROFILING_ENABLED = False
+
+    return CacheConfig
+
+
+def measure(check_interval, todos, iterations):
+    """SQL statements and mean latency of a cached GET /api/todos/<id>."""
+    app = create_app(config_class=make_config(check_interval))
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    client.post("/api/todos/batch", json=[{"title": f"todo {index}"} for index in range(todos)])
+    for todo_id in range(1, todos + 1):
+        client.get(f"/api/todos/{todo_id}")
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        start = time.perf_counter()
+        for index in range(iterations):
+            client.get(f"/api/todos/{index % todos + 1}")
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return len(statements) / iterations, elapsed / iterations * 1e6
+
+
+def run(check_intervals, todos, iterations):
+    """Count the database work a cache hit does for each version check interval."""
+    results = {}
+    print(f"{'check interval':>15} {'statements/hit':>15} {'us/request':>11}")
+    for check_interval in check_intervals:
+        statements, latency = measure(check_interval, todos, iterations)
+        results[check_interval] = statements
+        print(f"{check_interval:>15g} {statements:>15.3f} {latency:>11.1f}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=run.__doc__)
+    parser.add_argument("--check-intervals", default="0,1",
+                        help="Comma-separated TODOS_CACHE_VERSION_CHECK_INTERVAL values")
+    parser.add_argument("--todos", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--max-statements", type=float, default=None,
+                        help="Exit non-zero if a hit at the largest interval runs more statements")
+    options = parser.parse_args()
+    intervals = [float(value) for value in options.check_intervals.split(",")]
+    results = run(intervals, options.todos, options.iterations)
+    worst = results[max(intervals)]
+    if options.max_statements is not None and worst > options.max_statements:
+        sys.exit(f"{worst:.3f} statements per hit exceeds {options.max_statements}")
@@ -0,0 +1,83 @@
+# benchmarks/compression_levels.py
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from benchmarks.serializer_ab import seed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVELS = range(1, 10)
+BROTLI_LEVELS = range(0, 12)
+
+
+def compressors():
+    """(encoding, level, compress function) for every level of every available encoding."""
+    for level in GZIP_LEVELS:
+        yield "gzip", level, lambda data, level=level: gzip.compress(data, level, mtime=0)
+    if brotli is not None:
+        for level in BROTLI_LEVELS:
+            yield "br", level, lambda data, level=level: brotli.compress(data, quality=level)
+
+
+def measure(compress, payload, repeats):
+    """Return ``(best CPU seconds, compressed size)`` of compressing ``payload``."""
+    timings = []
+    for _ in range(repeats):
+        start = time.process_time()
+        size = len(compress(payload))
+        timings.append(time.process_time() - start)
+    return min(timings), size
+
+
+def listing_payload(rows, page_size):
+    """Body of one GET /api/todos/ page of ``page_size`` rows, as the API sends it uncompressed."""
+    app = create_app(config_class="app.config.TestingConfig")
+    with app.app_context():
+        db.create_all()
+        seed(rows)
+        return app.test_client().get(f"/api/todos/?limit={page_size}").get_data()
+
+
+def run(rows, page_size, repeats):
+    """CPU time vs. bytes of gzip (and brotli, if installed) at every level for a todos listing."""
+    payload = listing_payload(rows, page_size)
+    print(f"payload: {len(payload):,} bytes ({page_size} todos)")
+    report = {"payload_bytes": len(payload), "results": []}
+    for encoding, level, compress in compressors():
+        elapsed, size = measure(compress, payload, repeats)
+        result = {
+            "encoding": encoding,
+            "level": level,
+            "bytes": size,
+            "ratio": round(len(payload) / size, 2),
+            "cpu_ms": round(elapsed * 1000, 3),
+            "mb_per_cpu_s": round(len(payload) / elapsed / 1e6, 1) if elapsed else None,
+        }
+        report["results"].append(result)
+        print(f"{encoding:>4} {level:>2}: {size:>10,} bytes  ratio {result['ratio']:6.2f}  "
+              f"{result['cpu_ms']:8.2f} ms CPU")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=run.__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--page-size", type=int, default=1000, help="Todos in the listing compressed")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    options = parser.parse_args()
+    report = run(options.rows, options.page_size, options.repeats)
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2)
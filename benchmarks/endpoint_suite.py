@@ -0,0 +1,235 @@
+# benchmarks/endpoint_suite.py
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.config import Config
+from app.models import Todo
+
+# Absolute latencies only compare on the machine that measured them, so the baseline is
+# generated locally with --save-baseline and kept out of git
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SEED_CHUNK = 10000
+# The full listing grows with the table; beyond this size it is not measured
+FULL_LISTING_MAX_ROWS = 100000
+
+
+def make_config(database_path):
+    """Production-like configuration on a throwaway SQLite file."""
+    class BenchmarkConfig(Config):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{database_path}"
+
+    return BenchmarkConfig
+
+
+def seed(rows):
+    """Fill the todos table with ``rows`` generated titles."""
+    for start in range(0, rows, SEED_CHUNK):
+        Todo.bulk_insert([f"Todo {i}" for i in range(start, min(rows, start + SEED_CHUNK))])
+        db.session.commit()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    """Throughput and latency percentiles for one operation."""
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {
+        "requests": len(ordered),
+        "rps": round(len(ordered) / total, 1) if total else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+def operations(rows, rng):
+    """Map of operation name to a callable issuing one request with the test client.
+
+    Each callable returns the response so the timing includes reading the body.
+    """
+    max_id = rows
+    created = []
+
+    def random_id():
+        return rng.randint(1, max_id)
+
+    def create(client):
+        response = client.post("/api/todos/", json={"title": "Benchmark todo"})
+        created.append(response.get_json()["id"])
+        return response
+
+    def delete(client):
+        todo_id = created.pop() if created else random_id()
+        return client.delete(f"/api/todos/{todo_id}")
+
+    # Reads run before the writes so they see a table of exactly ``rows`` todos
+    ops = {
+        "list_page": lambda client: client.get(f"/api/todos/?limit=100&after_id={random_id()}"),
+        "list_stream_page": lambda client: client.get(
+            f"/api/todos/?stream=1&limit=1000&after_id={random_id()}"),
+    }
+    # Seeded titles are "Todo <n>", so searching a number matches a single row
+    ops["search"] = lambda client: client.get(f"/api/todos/?q={random_id()}")
+    if rows <= FULL_LISTING_MAX_ROWS:
+        ops["list_full"] = lambda client: client.get("/api/todos/")
+    ops.update({
+        "get_todo": lambda client: client.get(f"/api/todos/{random_id()}"),
+        "create_todo": create,
+        "update_todo": lambda client: client.put(f"/api/todos/{random_id()}",
+                                                 json={"title": "Updated benchmark todo"}),
+        "batch_create_100": lambda client: client.post(
+            "/api/todos/batch", json=[{"title": "Batch todo"}] * 100),
+        # Runs after create_todo, so it removes the todos created above first
+        "delete_todo": delete,
+    })
+    return ops
+
+
+def run_size(rows, requests, seed_value=1234):
+    """Benchmark every operation against a table of ``rows`` todos."""
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(config_class=make_config(os.path.join(directory, "bench.db")))
+        with app.app_context():
+            db.create_all()
+            seed(rows)
+
+        client = app.test_client()
+        rng = random.Random(seed_value)
+        results = {}
+        for name, operation in operations(rows, rng).items():
+            count = requests if name != "list_full" else max(1, requests // 10)
+            operation(client).get_data()  # warm up
+            latencies = []
+            for _ in range(count):
+                start = time.perf_counter()
+                operation(client).get_data()
+                latencies.append(time.perf_counter() - start)
+            results[name] = summarize(latencies)
+            print(f"  {name:<18} {results[name]['rps']:>9.1f} req/s  "
+                  f"p50 {results[name]['p50_ms']:>8.3f} ms  p95 {results[name]['p95_ms']:>8.3f} ms  "
+                  f"p99 {results[name]['p99_ms']:>8.3f} ms")
+
+        with app.app_context():
+            db.engine.dispose()
+    return results
+
+
+def run(sizes, requests):
+    """Run the suite for every table size and return the results document."""
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": requests,
+        },
+        "results": {},
+    }
+    for rows in sizes:
+        print(f"{rows} todos")
+        report["results"][str(rows)] = run_size(rows, requests)
+    return report
+
+
+def baseline_mismatch(report, baseline):
+    """Return why ``baseline`` was not measured like ``report``, or None when it was.
+
+    The results are absolute timings, so they are only comparable when both
+    runs come from the same host, platform and Python.
+    """
+    for key in ("host", "platform", "python"):
+        current, previous = report["meta"].get(key), baseline.get("meta", {}).get(key)
+        if current != previous:
+            return f"baseline {key} {previous!r} differs from this run's {current!r}"
+    return None
+
+
+def compare(report, baseline, threshold):
+    """Return human-readable regressions of ``report`` against ``baseline``.
+
+    An operation regresses when its p95 latency grows, or its throughput
+    drops, by more than ``threshold`` (a fraction) compared to the baseline.
+    Sizes and operations missing from either side are skipped.
+    """
+    regressions = []
+    for size, operations_ in report["results"].items():
+        for name, current in operations_.items():
+            previous = baseline.get("results", {}).get(size, {}).get(name)
+            if previous is None:
+                continue
+            if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+                regressions.append(f"{size} todos {name}: p95 {previous['p95_ms']} ms -> "
+                                   f"{current['p95_ms']} ms")
+            if current["rps"] < previous["rps"] * (1 - threshold):
+                regressions.append(f"{size} todos {name}: {previous['rps']} req/s -> "
+                                   f"{current['rps']} req/s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Endpoint benchmark suite with regression thresholds")
+    parser.add_argument("--sizes", default="1000",
+                        help="Comma-separated table sizes to seed, e.g. 1000,100000,1000000")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per operation")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed regression as a fraction (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Write the results as the new baseline instead of comparing")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    options = parser.parse_args(argv)
+
+    sizes = [int(size) for size in options.sizes.split(",")]
+    report = run(sizes, options.requests)
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if options.save_baseline:
+        with open(options.baseline, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Baseline saved to {options.baseline}")
+        return 0
+
+    if not os.path.exists(options.baseline):
+        print(f"No baseline at {options.baseline}; run with --save-baseline first")
+        return 0
+
+    with open(options.baseline) as f:
+        baseline = json.load(f)
+    mismatch = baseline_mismatch(report, baseline)
+    if mismatch:
+        print(f"Not comparing: {mismatch}; run with --save-baseline on this machine")
+        return 2
+    regressions = compare(report, baseline, options.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        return 1
+    print("No regressions beyond the threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
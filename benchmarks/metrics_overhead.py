@@ -0,0 +1,67 @@
+# benchmarks/metrics_overhead.py
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Response
+
+from app import create_app
+from app.config import TestingConfig
+
+
+class NoMetricsConfig(TestingConfig):
+    METRICS_ENABLED = False
+
+
+def hook_overhead(iterations):
+    """Per-request cost of the metrics hooks alone, in microseconds."""
+    app = create_app(config_class=TestingConfig)
+    metrics = app.extensions["metrics"]
+    response = Response("x" * 100)
+
+    with app.test_request_context("/api/helloworld/"):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            metrics._before_request()
+            metrics._after_request(response)
+            metrics._teardown_request(None)
+        return (time.perf_counter() - start) / iterations * 1e6
+
+
+def end_to_end(config_class, iterations):
+    """Mean test-client latency of GET /api/helloworld/, in microseconds."""
+    client = create_app(config_class=config_class).test_client()
+    for _ in range(100):
+        client.get("/api/helloworld/")
+    start = time.perf_counter()
+    for _ in range(iterations):
+        client.get("/api/helloworld/")
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(iterations):
+    """Measure the overhead the Prometheus middleware adds to each request."""
+    hooks = hook_overhead(iterations * 10)
+    with_metrics = end_to_end(TestingConfig, iterations)
+    without_metrics = end_to_end(NoMetricsConfig, iterations)
+
+    print(f"metrics hooks alone:      {hooks:8.2f} us/request")
+    print(f"end to end with metrics:  {with_metrics:8.2f} us/request")
+    print(f"end to end without:       {without_metrics:8.2f} us/request")
+    print(f"end to end difference:    {with_metrics - without_metrics:8.2f} us/request")
+    return hooks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=run.__doc__)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--max-overhead-us", type=float, default=None,
+                        help="Exit non-zero if the hooks cost more than this")
+    options = parser.parse_args()
+    overhead = run(options.iterations)
+    if options.max_overhead_us is not None and overhead > options.max_overhead_us:
+        sys.exit(f"metrics overhead {overhead:.2f} us exceeds {options.max_overhead_us} us")
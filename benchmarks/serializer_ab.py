@@ -0,0 +1,56 @@
+# benchmarks/serializer_ab.py
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models import Todo
+
+
+def seed(rows):
+    """Fill the todos table with ``rows`` generated titles."""
+    for start in range(0, rows, 10000):
+        Todo.bulk_insert([f"Todo {i}" for i in range(start, min(rows, start + 10000))])
+    db.session.commit()
+
+
+def measure(client, repeats):
+    """Return the best wall time of ``repeats`` full listings, in seconds."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = client.get("/api/todos/")
+        response.get_data()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(rows, repeats):
+    """A/B the marshalling and fast serializer paths of GET /api/todos/."""
+    app = create_app(config_class="app.config.TestingConfig")
+    with app.app_context():
+        db.create_all()
+        seed(rows)
+        client = app.test_client()
+
+        results = {}
+        for name, fast in (("marshal", False), ("fast", True)):
+            app.config["TODOS_FAST_SERIALIZER"] = fast
+            elapsed = measure(client, repeats)
+            results[name] = rows / elapsed
+            print(f"{name:>8}: {elapsed * 1000:8.1f} ms  {results[name]:12,.0f} rows/sec")
+
+        print(f" speedup: {results['fast'] / results['marshal']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=run.__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeats", type=int, default=5)
+    options = parser.parse_args()
+    run(options.rows, options.repeats)
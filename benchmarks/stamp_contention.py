@@ -0,0 +1,85 @@
+# benchmarks/stamp_contention.py
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.config import Config
+from app.models import Todo
+
+
+def make_config(database_uri):
+    class StampConfig(Config):
+        DEBUG = False
+        SQLALCHEMY_DATABASE_URI = database_uri
+        SQL_PROFILING_ENABLED = False
+        TODOS_CACHE_ENABLED = False
+        TODOS_EVENTS_ENABLED = False
+
+    return StampConfig
+
+
+def write_rate(app, writers, writes):
+    """Updates per second with ``writers`` threads each renaming its own todo ``writes`` times."""
+    with app.app_context():
+        ids = Todo.bulk_insert([f"writer {index}" for index in range(writers)])
+        db.session.commit()
+    barrier = threading.Barrier(writers + 1)
+    errors = []
+
+    def write(todo_id):
+        client = app.test_client()
+        barrier.wait()
+        for index in range(writes):
+            response = client.put(f"/api/todos/{todo_id}", json={"title": f"write {index}"})
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    threads = [threading.Thread(target=write, args=(todo_id,)) for todo_id in ids]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        print(f"  {len(errors)} writes failed (status {errors[0]})")
+    return writers * writes / elapsed
+
+
+def run(database_uri, concurrency, writes):
+    """Compare write throughput with the todos version stamp against writes that skip it."""
+    app = create_app(config_class=make_config(database_uri))
+    with app.app_context():
+        db.create_all()
+    print(f"{'writers':>8} {'with stamp':>12} {'without':>12} {'ratio':>7}  (updates/s)")
+    for writers in concurrency:
+        stamped = write_rate(app, writers, writes)
+        # Every write stamped with version 0: no counter row, so nothing serializes the commits
+        with mock.patch.object(Todo, "next_change_version", classmethod(lambda cls: 0)):
+            unstamped = write_rate(app, writers, writes)
+        print(f"{writers:>8} {stamped:>12.1f} {unstamped:>12.1f} {stamped / unstamped:>7.2f}")
+    with app.app_context():
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=run.__doc__)
+    parser.add_argument("--database-uri",
+                        help="Database to write to (default: a throwaway SQLite file, where the "
+                             "database lock already serializes writers; use MySQL to see the stamp's cost)")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated writer thread counts")
+    parser.add_argument("--writes", type=int, default=200, help="Updates per writer")
+    options = parser.parse_args()
+    concurrency = [int(value) for value in options.concurrency.split(",")]
+    with tempfile.TemporaryDirectory() as directory:
+        uri = options.database_uri or f"sqlite:///{os.path.join(directory, 'stamp.db')}"
+        run(uri, concurrency, options.writes)
@@ -0,0 +1,149 @@
+# benchmarks/startup_profile.py
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter so every import is paid again, as on a worker start. With
+# STARTUP_PRELOAD set the app is built once and the request is served from a forked child,
+# as gunicorn --preload workers are, and the timings cover the child only.
+WORKER = """
+import json, os, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+if os.environ.get('STARTUP_PRELOAD'):
+    read_end, write_end = os.pipe()
+    start = imported = created = time.perf_counter()
+    if os.fork():
+        os.close(write_end)
+        print(os.read(read_end, 4096).decode())
+        os.wait()
+        raise SystemExit
+response = app.test_client().get('/api/todos/?limit=1')
+served = time.perf_counter()
+assert response.status_code == 200, response.status_code
+timings = json.dumps({
+    'worker_ms': (served - start) * 1000,
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+})
+if os.environ.get('STARTUP_PRELOAD'):
+    os.write(write_end, timings.encode())
+    os._exit(0)
+print(timings)
+"""
+
+MODES = {
+    "default": {"LEAN_STARTUP": "False"},
+    "lean": {"LEAN_STARTUP": "True"},
+    "lean_preload": {"LEAN_STARTUP": "True", "STARTUP_PRELOAD": "1"},
+}
+
+
+def import_breakdown(stderr, top=10):
+    """Import time in ms per top-level package, summed from `-X importtime` self times."""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(own) / 1000
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return {package: round(elapsed, 1) for package, elapsed in ranked[:top]}
+
+
+def start_worker(env):
+    """Start one worker, build the app and serve a request; returns its timings."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", WORKER],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    if "STARTUP_PRELOAD" in env:
+        # Forked workers start from the parent's memory, not from a new interpreter
+        timings["total_ms"] = timings["worker_ms"]
+    else:
+        timings["total_ms"] = (time.perf_counter() - start) * 1000
+    timings["imports"] = import_breakdown(result.stderr)
+    return timings
+
+
+def profile(mode, database_uri, runs):
+    """Median timings of `runs` cold starts in one mode."""
+    env = {key: value for key, value in os.environ.items() if key != "STARTUP_PRELOAD"}
+    env.update(SQLALCHEMY_DATABASE_URI=database_uri, DEBUG="False", **MODES[mode])
+    samples = [start_worker(env) for _ in range(runs)]
+    summary = {
+        key: round(statistics.median(sample[key] for sample in samples), 1)
+        for key in ("total_ms", "import_ms", "create_app_ms", "first_request_ms")
+    }
+    summary["imports"] = samples[-1]["imports"]
+    return summary
+
+
+def create_schema(database_uri):
+    sys.path.insert(0, ROOT)
+    from app import create_app, db
+    from app.config import TestingConfig
+
+    class SchemaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = database_uri
+
+    with create_app(config_class=SchemaConfig).app_context():
+        db.create_all()
+
+
+def run(runs):
+    """Profile the time from process start to first served request, default vs lean startup."""
+    with tempfile.TemporaryDirectory() as directory:
+        database_uri = "sqlite:///" + os.path.join(directory, "startup.db")
+        create_schema(database_uri)
+        report = {mode: profile(mode, database_uri, runs) for mode in MODES}
+
+    for mode, summary in report.items():
+        print(f"{mode}: {summary['total_ms']:.1f} ms to first request "
+              f"(imports {summary['import_ms']:.1f}, create_app {summary['create_app_ms']:.1f}, "
+              f"first request {summary['first_request_ms']:.1f})")
+        for package, elapsed in summary["imports"].items():
+            print(f"    {package:<24} {elapsed:8.1f} ms")
+
+    default = report["default"]["total_ms"]
+    report["reduction"] = {
+        mode: round(1 - report[mode]["total_ms"] / default, 3) for mode in MODES if mode != "default"
+    }
+    for mode, reduction in report["reduction"].items():
+        print(f"{mode} saves {reduction:.0%} of the default worker start")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=run.__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mode", choices=[mode for mode in MODES if mode != "default"],
+                        default="lean_preload", help="Mode checked against --min-reduction")
+    parser.add_argument("--min-reduction", type=float, default=None,
+                        help="Exit non-zero if the checked mode saves less than this fraction")
+    parser.add_argument("--output", help="Also write the report as JSON to this file")
+    options = parser.parse_args()
+    report = run(options.runs)
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2)
+    reduction = report["reduction"][options.mode]
+    if options.min_reduction is not None and reduction < options.min_reduction:
+        sys.exit(f"{options.mode} saved {reduction:.0%}, below {options.min_reduction:.0%}")
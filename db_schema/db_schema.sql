@@ -2,5 +2,43 @@
 
 CREATE TABLE IF NOT EXISTS todos (
     id INT PRIMARY KEY AUTO_INCREMENT,
-    title VARCHAR(255)
-);
\ No newline at end of file
+    title VARCHAR(255),
+    version BIGINT NOT NULL DEFAULT 0,
+    INDEX ix_todos_title (title),
+    INDEX ix_todos_version (version),
+    FULLTEXT INDEX ix_todos_title_fulltext (title)
+);
+
+CREATE TABLE IF NOT EXISTS todo_tombstones (
+    id INT PRIMARY KEY,
+    version BIGINT NOT NULL,
+    INDEX ix_todo_tombstones_version (version)
+);
+
+CREATE TABLE IF NOT EXISTS todo_events (
+    version BIGINT NOT NULL,
+    todo_id INT NOT NULL,
+    type VARCHAR(16) NOT NULL,
+    title VARCHAR(255),
+    created_at BIGINT NOT NULL,
+    PRIMARY KEY (version, todo_id),
+    INDEX ix_todo_events_created_at (created_at)
+);
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT IGNORE INTO table_versions (name, version) VALUES ('todos', 0);
+
+CREATE TABLE IF NOT EXISTS id_sequences (
+    name VARCHAR(64) PRIMARY KEY,
+    next_id BIGINT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    name VARCHAR(255) PRIMARY KEY,
+    source VARCHAR(1024) NOT NULL,
+    `rows` BIGINT NOT NULL
+);
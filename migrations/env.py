@@ -90,9 +90,17 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # The full-text search table and index are maintained by hand in their
+    # own migration; keep autogenerate from proposing to drop them
+    def include_object(object, name, type_, reflected, compare_to):
+        return not (reflected and compare_to is None
+                    and name.startswith(('todos_fts', 'ix_todos_title_fulltext')))
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
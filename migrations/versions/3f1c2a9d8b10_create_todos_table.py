@@ -0,0 +1,30 @@
+"""create todos table
+
+Revision ID: 3f1c2a9d8b10
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d8b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created from db_schema/db_schema.sql already have this table;
+    # mark them with `flask db stamp 3f1c2a9d8b10` instead of upgrading.
+    op.create_table('todos',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('todos')
@@ -0,0 +1,29 @@
+"""add table_versions
+
+Revision ID: 7b2e4d1a9c55
+Revises: 3f1c2a9d8b10
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2e4d1a9c55'
+down_revision = '3f1c2a9d8b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(table_versions, [{'name': 'todos', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('table_versions')
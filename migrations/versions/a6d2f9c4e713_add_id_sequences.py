@@ -0,0 +1,29 @@
+"""add id sequences
+
+Revision ID: a6d2f9c4e713
+Revises: f3a8c1d92b47
+Create Date: 2026-10-18 18:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2f9c4e713'
+down_revision = 'f3a8c1d92b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Blocks of todo ids for sharded deployments (TODOS_SHARD_URIS)
+    op.create_table('id_sequences',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('next_id', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('id_sequences')
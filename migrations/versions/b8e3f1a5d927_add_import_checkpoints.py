@@ -0,0 +1,30 @@
+"""add import checkpoints
+
+Revision ID: b8e3f1a5d927
+Revises: a6d2f9c4e713
+Create Date: 2026-10-18 19:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e3f1a5d927'
+down_revision = 'a6d2f9c4e713'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Progress of resumable `flask todos import --checkpoint NAME` runs
+    op.create_table('import_checkpoints',
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('source', sa.String(length=1024), nullable=False),
+    sa.Column('rows', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('import_checkpoints')
@@ -0,0 +1,54 @@
+"""add full-text search on todos.title
+
+Revision ID: c5a9e3f7d210
+Revises: 7b2e4d1a9c55
+Create Date: 2026-10-18 11:20:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a9e3f7d210'
+down_revision = '7b2e4d1a9c55'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE todos_fts USING fts5(title, content='todos', content_rowid='id')",
+    "CREATE TRIGGER todos_fts_insert AFTER INSERT ON todos BEGIN "
+    "INSERT INTO todos_fts(rowid, title) VALUES (new.id, new.title); END",
+    "CREATE TRIGGER todos_fts_delete AFTER DELETE ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title) VALUES ('delete', old.id, old.title); END",
+    "CREATE TRIGGER todos_fts_update AFTER UPDATE OF title ON todos BEGIN "
+    "INSERT INTO todos_fts(todos_fts, rowid, title) VALUES ('delete', old.id, old.title); "
+    "INSERT INTO todos_fts(rowid, title) VALUES (new.id, new.title); END",
+    # Index the rows that already exist
+    "INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS todos_fts_update",
+    "DROP TRIGGER IF EXISTS todos_fts_delete",
+    "DROP TRIGGER IF EXISTS todos_fts_insert",
+    "DROP TABLE IF EXISTS todos_fts",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.create_index('ix_todos_title_fulltext', 'todos', ['title'], mysql_prefix='FULLTEXT')
+    elif dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'mysql':
+        op.drop_index('ix_todos_title_fulltext', table_name='todos')
+    elif dialect == 'sqlite':
+        for statement in SQLITE_DOWNGRADE:
+            op.execute(statement)
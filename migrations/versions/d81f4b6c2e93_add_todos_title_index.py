@@ -0,0 +1,24 @@
+"""add index on todos.title
+
+Revision ID: d81f4b6c2e93
+Revises: c5a9e3f7d210
+Create Date: 2026-10-18 11:45:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f4b6c2e93'
+down_revision = 'c5a9e3f7d210'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # B-tree index for title prefix filters and sort=title listings
+    op.create_index(op.f('ix_todos_title'), 'todos', ['title'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_todos_title'), table_name='todos')
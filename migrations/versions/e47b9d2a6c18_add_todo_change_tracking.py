@@ -0,0 +1,38 @@
+"""add todo change tracking
+
+Revision ID: e47b9d2a6c18
+Revises: d81f4b6c2e93
+Create Date: 2026-10-18 14:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e47b9d2a6c18'
+down_revision = 'd81f4b6c2e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Change version of each todo's last write; existing rows start at 0 and are
+    # returned by a full sync (GET /api/todos/changes without since)
+    # (plain ALTERs: a batch table rebuild on SQLite would drop the title search triggers)
+    op.add_column('todos', sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'))
+    op.create_index(op.f('ix_todos_version'), 'todos', ['version'], unique=False)
+
+    op.create_table('todo_tombstones',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_todo_tombstones_version'), 'todo_tombstones', ['version'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_todo_tombstones_version'), table_name='todo_tombstones')
+    op.drop_table('todo_tombstones')
+    op.drop_index(op.f('ix_todos_version'), table_name='todos')
+    op.drop_column('todos', 'version')
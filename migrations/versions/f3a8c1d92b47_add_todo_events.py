@@ -0,0 +1,34 @@
+"""add todo events
+
+Revision ID: f3a8c1d92b47
+Revises: e47b9d2a6c18
+Create Date: 2026-10-18 16:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c1d92b47'
+down_revision = 'e47b9d2a6c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Outbox read by the database event broker (TODOS_EVENTS_BROKER=database)
+    op.create_table('todo_events',
+    sa.Column('version', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('todo_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('type', sa.String(length=16), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('version', 'todo_id')
+    )
+    op.create_index(op.f('ix_todo_events_created_at'), 'todo_events', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_todo_events_created_at'), table_name='todo_events')
+    op.drop_table('todo_events')
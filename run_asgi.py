@@ -0,0 +1,14 @@
+# run_asgi.py
+
+from dotenv import load_dotenv
+
+# Load environment variables from the .env file **before** importing create_asgi_app
+load_dotenv()
+
+from app.asgi import create_asgi_app
+
+app = create_asgi_app()
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=5001)
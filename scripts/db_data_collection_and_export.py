@@ -1,8 +1,13 @@
 # scripts/db_data_collection_and_export.py
 
+import argparse
+import csv
+import gzip
 import os
 import json
-from sqlalchemy import create_engine, text, inspect
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import MetaData, Table, create_engine, inspect, select, tuple_
 from dotenv import load_dotenv
 from decimal import Decimal
 from datetime import date
@@ -13,6 +18,15 @@ load_dotenv()
 # Fetch environment variables
 database_uri = os.getenv("SQLALCHEMY_DATABASE_URI")
 
+# Default location of the exported files
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "exports")
+
+FORMATS = ("ndjson", "csv")
+
+# Derived tables left out unless named with --tables: the SQLite full-text index on todo
+# titles and its shadow tables, which the todos triggers rebuild on import
+DERIVED_TABLE_PREFIXES = ("todos_fts",)
+
 # Custom JSON encoder to handle Decimal and date objects
 class CustomJSONEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -20,47 +34,126 @@ class CustomJSONEncoder(json.JSONEncoder):
             return float(obj)
         elif isinstance(obj, date):
             return obj.isoformat()  # Serialize date as ISO 8601 string
+        elif isinstance(obj, bytes):
+            return obj.hex()
         return super().default(obj)
 
-def collect_first_ten_records():
-    """Collects the first 10 records from each table and saves to a JSON file."""
-    try:
-        # Create a SQLAlchemy engine
-        engine = create_engine(database_uri)
+def open_output(path, compress):
+    """Open ``path`` for incremental text writes, gzip-compressed when asked."""
+    if compress:
+        return gzip.open(path + ".gz", "wt", encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
 
-        # Connect to the database
-        with engine.connect() as connection:
-            print("Database connection successful!")
+def table_chunks(connection, table, chunk_size):
+    """Yield the rows of ``table`` in primary-key order, ``chunk_size`` rows per query.
 
-            # Inspect the database to list all tables
-            inspector = inspect(engine)
-            tables = inspector.get_table_names()
+    Each chunk starts after the last key of the previous one (keyset
+    pagination), so every query is an index range scan and only one chunk is
+    held in memory. Rows are read through a server-side cursor where the
+    driver has one. Tables without a primary key are streamed by a single
+    query instead.
+    """
+    key = list(table.primary_key.columns)
+    streaming = connection.execution_options(stream_results=True, yield_per=chunk_size)
+    if not key:
+        for partition in streaming.execute(select(table)).partitions(chunk_size):
+            yield partition
+        return
 
-            if not tables:
-                print("No tables found in the database.")
-                return
+    last = None
+    while True:
+        statement = select(table).order_by(*key).limit(chunk_size)
+        if last is not None:
+            statement = statement.where(
+                key[0] > last[0] if len(key) == 1 else tuple_(*key) > tuple_(*last)
+            )
+        rows = streaming.execute(statement).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last = [rows[-1]._mapping[column.name] for column in key]
 
-            results = {}
+def export_table(engine, name, output_dir, fmt="ndjson", compress=False, chunk_size=10000):
+    """Stream table ``name`` to ``<output_dir>/<name>.<fmt>[.gz]`` on its own connection."""
+    table = Table(name, MetaData(), autoload_with=engine)
+    path = os.path.join(output_dir, f"{name}.{fmt}")
+    rows_written = 0
+    start = time.perf_counter()
+    with engine.connect() as connection, open_output(path, compress) as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(table.columns.keys())
+        for rows in table_chunks(connection, table, chunk_size):
+            if fmt == "csv":
+                writer.writerows(rows)
+            else:
+                f.writelines(json.dumps(dict(row._mapping), cls=CustomJSONEncoder) + "\n"
+                             for row in rows)
+            rows_written += len(rows)
+    elapsed = time.perf_counter() - start
+    return {
+        "table": name,
+        "path": path + (".gz" if compress else ""),
+        "rows": rows_written,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows_written / elapsed, 1) if elapsed else 0.0,
+    }
 
-            # Query the first 10 records from each table
-            for table in tables:
-                print(f"Fetching first 10 records from table: {table}")
-                query = text(f"SELECT * FROM {table} LIMIT 10;")
-                result = connection.execute(query).fetchall()
+def export_tables(uri, output_dir=OUTPUT_DIR, tables=None, fmt="ndjson", compress=False,
+                  chunk_size=10000, workers=4):
+    """Export ``tables`` (all tables by default) in parallel, one connection per table."""
+    engine = create_engine(uri, pool_size=workers, max_overflow=0)
+    try:
+        tables = tables or [
+            name for name in inspect(engine).get_table_names()
+            if not name.startswith(DERIVED_TABLE_PREFIXES)
+        ]
+        os.makedirs(output_dir, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(export_table, engine, name, output_dir, fmt, compress, chunk_size)
+                for name in tables
+            ]
+            return [future.result() for future in futures]
+    finally:
+        engine.dispose()
 
-                # Convert SQLAlchemy row objects to dictionaries
-                results[table] = [dict(row._mapping) for row in result] if result else []
+def collect_and_export(options):
+    """Exports every row of each table to NDJSON or CSV files and reports rows/sec."""
+    try:
+        start = time.perf_counter()
+        results = export_tables(
+            options.database_uri, options.output_dir, options.tables, options.format,
+            options.gzip, options.chunk_size, options.workers,
+        )
+        elapsed = time.perf_counter() - start
 
-            # Save results to a JSON file
-            output_file = os.path.join(os.path.dirname(__file__), "first_ten_records.json")
-            with open(output_file, "w") as f:
-                json.dump(results, f, indent=4, cls=CustomJSONEncoder)
+        if not results:
+            print("No tables found in the database.")
+            return
 
-            print(f"First 10 records successfully saved to {output_file}")
+        for result in results:
+            print(f"{result['table']}: {result['rows']} rows in {result['seconds']:.2f} s "
+                  f"({result['rows_per_sec']:.0f} rows/s) -> {result['path']}")
+        total = sum(result["rows"] for result in results)
+        print(f"Exported {total} rows from {len(results)} tables in {elapsed:.2f} s "
+              f"({total / elapsed:.0f} rows/s)")
 
     except Exception as e:
-        print("An error occurred while collecting records!")
+        print("An error occurred while exporting records!")
         print(f"Error: {e}")
+        raise SystemExit(1)
 
 if __name__ == "__main__":
-    collect_first_ten_records()
+    parser = argparse.ArgumentParser(description=collect_and_export.__doc__)
+    parser.add_argument("--database-uri", default=database_uri)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--tables", type=lambda value: value.split(","),
+                        help="Comma-separated tables to export (default: all)")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="Compress each file with gzip")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows fetched per query")
+    parser.add_argument("--workers", type=int, default=4, help="Tables exported in parallel")
+    collect_and_export(parser.parse_args())
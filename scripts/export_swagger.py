@@ -0,0 +1,27 @@
+# scripts/export_swagger.py
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.config import TestingConfig
+
+
+class ExportConfig(TestingConfig):
+    # The spec only depends on the registered routes, so no real database is needed
+    API_DOCS_ENABLED = True
+    METRICS_ENABLED = False
+    SQL_PROFILING_ENABLED = False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the Swagger spec to a static file at build time")
+    parser.add_argument("--output", default="swagger.json")
+    options = parser.parse_args()
+
+    app = create_app(config_class=ExportConfig)
+    etag = app.extensions["swagger_spec"].write(options.output)
+    print(f"Wrote {options.output} (ETag {etag})")
@@ -1,26 +1,37 @@
 # scripts/manual_endpoint_test.py
 
+import argparse
+import itertools
 import os
 import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 
 # Define the base URL of the API
 BASE_URL = "http://localhost:5001/api"
 
-# Define the endpoints to test
+# Define the endpoints to test; "weight" sets each endpoint's share of the load-test mix
 ENDPOINTS = [
-    {"name": "main", "url": f"{BASE_URL}/", "method": "GET"},
-    {"name": "helloworld", "url": f"{BASE_URL}/helloworld/", "method": "GET"},
-    {"name": "todos_list", "url": f"{BASE_URL}/todos/", "method": "GET"},
-    {"name": "create_todo", "url": f"{BASE_URL}/todos/", "method": "POST", "data": {"title": "Sample Todo"}},
-    {"name": "single_todo", "url": f"{BASE_URL}/todos/3/", "method": "GET"},
-    {"name": "update_todo", "url": f"{BASE_URL}/todos/3/", "method": "PUT", "data": {"title": "Updated Todo"}},
-    {"name": "delete_todo", "url": f"{BASE_URL}/todos/3/", "method": "DELETE"},
+    {"name": "main", "url": f"{BASE_URL}/", "method": "GET", "weight": 1},
+    {"name": "helloworld", "url": f"{BASE_URL}/helloworld/", "method": "GET", "weight": 1},
+    {"name": "todos_list", "url": f"{BASE_URL}/todos/", "method": "GET", "weight": 4},
+    {"name": "create_todo", "url": f"{BASE_URL}/todos/", "method": "POST", "data": {"title": "Sample Todo"}, "weight": 2},
+    {"name": "single_todo", "url": f"{BASE_URL}/todos/3/", "method": "GET", "weight": 6},
+    {"name": "update_todo", "url": f"{BASE_URL}/todos/3/", "method": "PUT", "data": {"title": "Updated Todo"}, "weight": 2},
+    # Deleting the same id over and over only produces 404s, so it is left out of the mix
+    {"name": "delete_todo", "url": f"{BASE_URL}/todos/3/", "method": "DELETE", "weight": 0},
 ]
 
 # Output file for results
 OUTPUT_FILE = os.path.join(os.path.dirname(__file__), "endpoint_test_results.json")
 
+# Percentiles reported by the load test, HdrHistogram style
+PERCENTILES = [50, 75, 90, 95, 99, 99.9, 99.99, 100]
+
 # Function to make requests and collect responses
 def test_endpoints():
     results = {}
@@ -58,12 +69,126 @@ def test_endpoints():
 
     return results
 
+
+def percentile_breakdown(latencies):
+    """Latency percentiles in milliseconds for an already sorted list of seconds."""
+    if not latencies:
+        return {}
+    breakdown = {}
+    for p in PERCENTILES:
+        index = min(len(latencies) - 1, max(0, int(round(p / 100 * len(latencies))) - 1))
+        breakdown[f"p{p:g}"] = round(latencies[index] * 1000, 3)
+    return breakdown
+
+
+def load_test(concurrency=10, duration=None, total_requests=None, seed=None):
+    """Drive the weighted ENDPOINTS mix from ``concurrency`` keep-alive sessions.
+
+    Runs until ``duration`` seconds have passed or ``total_requests`` requests
+    have been sent, whichever is given. A request counts as an error when it
+    raises or returns a status of 400 or above.
+    """
+    if duration is None and total_requests is None:
+        raise ValueError("Give a duration or a number of requests")
+    mix = [endpoint for endpoint in ENDPOINTS if endpoint.get("weight", 1) > 0]
+    weights = [endpoint.get("weight", 1) for endpoint in mix]
+
+    budget = itertools.count()
+    lock = threading.Lock()
+    stats = {endpoint["name"]: {"latencies": [], "errors": 0, "status_codes": {}} for endpoint in mix}
+    deadline = time.perf_counter() + duration if duration is not None else None
+
+    def worker(worker_id):
+        rng = random.Random(None if seed is None else seed + worker_id)
+        local = {name: {"latencies": [], "errors": 0, "status_codes": {}} for name in stats}
+        with requests.Session() as session:  # one keep-alive connection per worker
+            while True:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                if total_requests is not None and next(budget) >= total_requests:
+                    break
+                endpoint = rng.choices(mix, weights)[0]
+                result = local[endpoint["name"]]
+                start = time.perf_counter()
+                try:
+                    response = session.request(endpoint["method"], endpoint["url"], json=endpoint.get("data"))
+                    response.content  # read the whole body
+                    status = str(response.status_code)
+                    failed = response.status_code >= 400
+                except requests.RequestException:
+                    status, failed = "exception", True
+                result["latencies"].append(time.perf_counter() - start)
+                result["errors"] += failed
+                result["status_codes"][status] = result["status_codes"].get(status, 0) + 1
+
+        # Merge once at the end so workers never contend while measuring
+        with lock:
+            for name, result in local.items():
+                stats[name]["latencies"].extend(result["latencies"])
+                stats[name]["errors"] += result["errors"]
+                for status, count in result["status_codes"].items():
+                    codes = stats[name]["status_codes"]
+                    codes[status] = codes.get(status, 0) + count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    all_latencies = sorted(itertools.chain.from_iterable(s["latencies"] for s in stats.values()))
+    total = len(all_latencies)
+    errors = sum(s["errors"] for s in stats.values())
+    endpoints = {}
+    for endpoint in mix:
+        result = stats[endpoint["name"]]
+        count = len(result["latencies"])
+        endpoints[endpoint["name"]] = {
+            "url": endpoint["url"],
+            "method": endpoint["method"],
+            "weight": endpoint.get("weight", 1),
+            "requests": count,
+            "rps": round(count / elapsed, 1) if elapsed else 0.0,
+            "error_rate": round(result["errors"] / count, 4) if count else 0.0,
+            "status_codes": result["status_codes"],
+            "latency_ms": percentile_breakdown(sorted(result["latencies"])),
+        }
+
+    return {
+        "config": {"concurrency": concurrency, "duration": duration, "requests": total_requests},
+        "summary": {
+            "requests": total,
+            "elapsed_seconds": round(elapsed, 3),
+            "rps": round(total / elapsed, 1) if elapsed else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "latency_ms": percentile_breakdown(all_latencies),
+        },
+        "endpoints": endpoints,
+    }
+
+
 if __name__ == "__main__":
-    # Test endpoints and collect results
-    test_results = test_endpoints()
+    parser = argparse.ArgumentParser(description="Call each endpoint once, or load test the API")
+    parser.add_argument("--load", action="store_true", help="Run the concurrent load test")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent keep-alive sessions")
+    parser.add_argument("--duration", type=float, help="Load test length in seconds")
+    parser.add_argument("--requests", type=int, help="Total requests to send (instead of --duration)")
+    parser.add_argument("--seed", type=int, help="Seed for a reproducible endpoint mix")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="Results JSON file")
+    options = parser.parse_args()
+
+    if options.load:
+        duration = options.duration if options.duration or options.requests else 10.0
+        test_results = load_test(options.concurrency, duration, options.requests, options.seed)
+        summary = test_results["summary"]
+        print(f"{summary['requests']} requests in {summary['elapsed_seconds']} s: "
+              f"{summary['rps']} req/s, error rate {summary['error_rate']:.2%}, "
+              f"p50 {summary['latency_ms'].get('p50')} ms, p99 {summary['latency_ms'].get('p99')} ms")
+    else:
+        # Test endpoints and collect results
+        test_results = test_endpoints()
 
     # Save results to a JSON file
-    with open(OUTPUT_FILE, "w") as f:
+    with open(options.output, "w") as f:
         json.dump(test_results, f, indent=4)
 
-    print(f"Endpoint test results saved to {OUTPUT_FILE}")
+    print(f"Endpoint test results saved to {options.output}")
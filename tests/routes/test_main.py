@@ -1,5 +1,9 @@
 # tests/routes/test_main.py
 
+from app import create_app, db
+from app.config import Config, TestingConfig
+
+
 def test_health_check_success(client):
     """Test health check endpoint returns success."""
     response = client.get('/api/')
@@ -37,3 +41,34 @@ def test_health_check_content_type(client):
 
     assert response.status_code == 200
     assert response.content_type == 'application/json'
+
+
+def test_pool_stats_static_pool(client):
+    """Test pool stats report the in-memory StaticPool used in testing."""
+    response = client.get('/api/pool')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['status'] == 'success'
+    assert data['pool']['class'] == 'StaticPool'
+
+
+def test_pool_stats_metered_pool(tmp_path):
+    """Test pool stats for a file database running on the metered QueuePool."""
+    class FileConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'pool.db'}"
+        SQLALCHEMY_ENGINE_OPTIONS = dict(Config.SQLALCHEMY_ENGINE_OPTIONS, pool_size=3)
+
+    app = create_app(config_class=FileConfig)
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    client.get('/api/todos/')
+
+    pool = client.get('/api/pool').get_json()['pool']
+    assert pool['class'] == 'MeteredQueuePool'
+    assert pool['size'] == 3
+    assert pool['checked_out'] == 0
+    assert pool['checkouts'] >= 2
+    assert pool['connections_opened'] >= 1
+    assert pool['pre_ping'] is True
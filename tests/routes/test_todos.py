@@ -1,6 +1,15 @@
 # tests/routes/test_todos.py
 
-from app.models import Todo
+import itertools
+import json
+
+import pytest
+from sqlalchemy import event, update
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models import TableVersion, Todo
+from app.routes.todos import _listing_statement, list_parser
 
 
 # Happy Path Tests - List Todos
@@ -381,3 +390,779 @@ def test_create_multiple_todos(client):
     response = client.get('/api/todos/')
     data = response.get_json()
     assert len(data) == 3
+
+
+# Pagination Tests
+
+def test_list_todos_first_page(client, multiple_todos):
+    """Test limit returns the first page and a next cursor."""
+    response = client.get('/api/todos/?limit=2')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [todo['id'] for todo in data] == multiple_todos[:2]
+    assert response.headers['X-Next-Cursor'] == str(multiple_todos[1])
+    assert 'rel="next"' in response.headers['Link']
+
+
+def test_list_todos_next_page(client, multiple_todos):
+    """Test after_id resumes the listing after the cursor."""
+    response = client.get(f'/api/todos/?limit=2&after_id={multiple_todos[1]}')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [todo['id'] for todo in data] == multiple_todos[2:]
+    assert 'X-Next-Cursor' not in response.headers
+
+
+def test_list_todos_follow_cursor(client, multiple_todos):
+    """Test following next cursors visits every todo exactly once."""
+    seen = []
+    url = '/api/todos/?limit=1'
+    while url:
+        response = client.get(url)
+        seen.extend(todo['id'] for todo in response.get_json())
+        cursor = response.headers.get('X-Next-Cursor')
+        url = f'/api/todos/?limit=1&after_id={cursor}' if cursor else None
+
+    assert seen == multiple_todos
+
+
+def test_list_todos_after_id_uses_default_limit(client, multiple_todos):
+    """Test after_id without limit falls back to the default page size."""
+    response = client.get(f'/api/todos/?after_id={multiple_todos[0]}')
+
+    assert response.status_code == 200
+    assert [todo['id'] for todo in response.get_json()] == multiple_todos[1:]
+
+
+def test_list_todos_limit_out_of_range(client):
+    """Test limit outside the configured bounds returns 400."""
+    assert client.get('/api/todos/?limit=0').status_code == 400
+    assert client.get('/api/todos/?limit=100000').status_code == 400
+
+
+def test_list_todos_invalid_limit(client):
+    """Test non-integer limit returns 400."""
+    response = client.get('/api/todos/?limit=abc')
+
+    assert response.status_code == 400
+
+
+# Streaming Tests
+
+def test_stream_todos_query_param(client, multiple_todos):
+    """Test ?stream=1 returns one JSON object per line."""
+    response = client.get('/api/todos/?stream=1')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    todos = [json.loads(line) for line in lines]
+    assert [todo['id'] for todo in todos] == multiple_todos
+    assert todos[0] == {'id': multiple_todos[0], 'title': 'First Todo'}
+
+
+def test_stream_todos_accept_header(client, multiple_todos):
+    """Test Accept: application/x-ndjson opts into streaming."""
+    response = client.get('/api/todos/', headers={'Accept': 'application/x-ndjson'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert len(response.get_data(as_text=True).splitlines()) == 3
+
+
+def test_stream_todos_is_chunked(client, multiple_todos):
+    """Test the streamed listing is sent without a precomputed length."""
+    response = client.get('/api/todos/?stream=1')
+
+    assert response.is_streamed
+    assert 'Content-Length' not in response.headers
+
+
+def test_stream_todos_after_id(client, multiple_todos):
+    """Test streaming resumes after the given cursor."""
+    response = client.get(f'/api/todos/?stream=1&after_id={multiple_todos[0]}')
+
+    ids = [json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()]
+    assert ids == multiple_todos[1:]
+
+
+def test_stream_todos_empty(client):
+    """Test streaming an empty table returns an empty body."""
+    response = client.get('/api/todos/?stream=1')
+
+    assert response.status_code == 200
+    assert response.get_data() == b''
+
+
+def test_list_todos_defaults_to_json(client, multiple_todos):
+    """Test the listing stays plain JSON for ordinary clients."""
+    response = client.get('/api/todos/', headers={'Accept': '*/*'})
+
+    assert response.content_type == 'application/json'
+    assert len(response.get_json()) == 3
+
+
+def test_list_todos_fields_mask(client, multiple_todos):
+    """Test the X-Fields mask still applies to the JSON listing."""
+    response = client.get('/api/todos/', headers={'X-Fields': 'title'})
+
+    assert response.get_json()[0] == {'title': 'First Todo'}
+
+
+# Batch Create Tests
+
+def test_batch_create_todos(client, app):
+    """Test creating several todos in one request."""
+    response = client.post('/api/todos/batch',
+                           json=[{'title': 'One'}, {'title': 'Two'}, {'title': 'Three'}])
+
+    assert response.status_code == 201
+    data = response.get_json()
+    assert data['errors'] == []
+    assert [todo['title'] for todo in data['created']] == ['One', 'Two', 'Three']
+
+    with app.app_context():
+        for todo in data['created']:
+            assert Todo.query.get(todo['id']).title == todo['title']
+
+
+def test_batch_create_returns_ids_in_order(client):
+    """Test assigned ids follow the order of the request."""
+    response = client.post('/api/todos/batch', json=[{'title': str(i)} for i in range(50)])
+
+    created = response.get_json()['created']
+    ids = [todo['id'] for todo in created]
+    assert ids == sorted(ids)
+    assert [todo['title'] for todo in created] == [str(i) for i in range(50)]
+
+
+def test_batch_create_partial_failure(client):
+    """Test invalid items are reported while valid ones are created."""
+    response = client.post('/api/todos/batch',
+                           json=[{'title': 'Good'}, {}, {'title': ''}, 'nope', {'title': 'A' * 256}])
+
+    assert response.status_code == 207
+    data = response.get_json()
+    assert [todo['title'] for todo in data['created']] == ['Good']
+    assert [error['index'] for error in data['errors']] == [1, 2, 3, 4]
+    assert data['errors'][0]['message'] == 'Title is required'
+
+
+def test_batch_create_all_invalid(client):
+    """Test a batch with no valid items returns 400 and creates nothing."""
+    response = client.post('/api/todos/batch', json=[{}, {'title': 5}])
+
+    assert response.status_code == 400
+    assert len(response.get_json()['errors']) == 2
+    assert client.get('/api/todos/').get_json() == []
+
+
+def test_batch_create_not_a_list(client):
+    """Test a non-array body returns 400."""
+    assert client.post('/api/todos/batch', json={'title': 'x'}).status_code == 400
+    assert client.post('/api/todos/batch', json=[]).status_code == 400
+
+
+def test_batch_create_too_large(client, app):
+    """Test batches above TODOS_MAX_BATCH_SIZE are rejected."""
+    app.config['TODOS_MAX_BATCH_SIZE'] = 2
+    response = client.post('/api/todos/batch', json=[{'title': 'x'}] * 3)
+
+    assert response.status_code == 400
+    assert 'exceeds the maximum' in response.get_json()['message']
+
+
+# Batch Update Tests
+
+def test_batch_update_todos(client, app, multiple_todos):
+    """Test renaming several todos in one request."""
+    first, second, third = multiple_todos
+    response = client.patch('/api/todos/batch',
+                            json=[{'id': first, 'title': 'Uno'}, {'id': third, 'title': 'Tres'}])
+
+    assert response.status_code == 200
+    assert response.get_json() == {'updated': 2, 'errors': []}
+    with app.app_context():
+        assert Todo.query.get(first).title == 'Uno'
+        assert Todo.query.get(second).title == 'Second Todo'
+        assert Todo.query.get(third).title == 'Tres'
+
+
+def test_batch_update_counts_only_existing(client, multiple_todos):
+    """Test ids that do not exist are not counted as updated."""
+    response = client.patch('/api/todos/batch',
+                            json=[{'id': multiple_todos[0], 'title': 'x'}, {'id': 99999, 'title': 'y'}])
+
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 1
+
+
+def test_batch_update_reports_invalid_items(client, multiple_todos):
+    """Test invalid update items are reported by index."""
+    response = client.patch('/api/todos/batch',
+                            json=[{'id': multiple_todos[0], 'title': 'ok'},
+                                  {'id': 'abc', 'title': 'bad id'},
+                                  {'id': multiple_todos[1]}])
+
+    data = response.get_json()
+    assert data['updated'] == 1
+    assert [error['index'] for error in data['errors']] == [1, 2]
+
+
+def test_batch_update_all_invalid(client):
+    """Test a batch with no valid updates returns 400."""
+    response = client.patch('/api/todos/batch', json=[{'title': 'no id'}])
+
+    assert response.status_code == 400
+
+
+# Batch Delete Tests
+
+def test_batch_delete_by_ids(client, app, multiple_todos):
+    """Test deleting several todos by id."""
+    response = client.delete('/api/todos/batch', json={'ids': multiple_todos[:2] + [99999]})
+
+    assert response.status_code == 200
+    assert response.get_json() == {'deleted': 2}
+    with app.app_context():
+        assert [todo.id for todo in Todo.query.all()] == multiple_todos[2:]
+
+
+def test_batch_delete_by_title_prefix(client, app):
+    """Test deleting todos whose title starts with a prefix."""
+    client.post('/api/todos/batch',
+                json=[{'title': 'tmp_1'}, {'title': 'tmp_2'}, {'title': 'keep'}, {'title': 'tmp%x'}])
+
+    response = client.delete('/api/todos/batch', json={'filter': {'title_prefix': 'tmp_'}})
+
+    assert response.get_json() == {'deleted': 2}
+    titles = sorted(todo['title'] for todo in client.get('/api/todos/').get_json())
+    assert titles == ['keep', 'tmp%x']
+
+
+def test_batch_delete_by_id_range(client, multiple_todos):
+    """Test deleting todos within an id range."""
+    response = client.delete('/api/todos/batch',
+                             json={'filter': {'min_id': multiple_todos[1], 'max_id': multiple_todos[2]}})
+
+    assert response.get_json() == {'deleted': 2}
+
+
+def test_batch_delete_rejects_invalid_title_filter(client, app, multiple_todos):
+    """Test a filter title that is not a non-empty string is refused before anything is written."""
+    with app.app_context():
+        version = TableVersion.current(Todo.__tablename__)
+
+    for title in ({'x': 1}, None, '', 42):
+        response = client.delete('/api/todos/batch', json={'filter': {'title': title}})
+
+        assert response.status_code == 400
+        assert response.get_json()['message'] == 'filter: Title must be a non-empty string'
+    assert len(client.get('/api/todos/').get_json()) == 3
+    with app.app_context():
+        assert TableVersion.current(Todo.__tablename__) == version
+
+
+def test_batch_delete_requires_criteria(client, multiple_todos):
+    """Test a delete without ids or filter criteria is refused."""
+    assert client.delete('/api/todos/batch', json={}).status_code == 400
+    assert client.delete('/api/todos/batch', json={'filter': {}}).status_code == 400
+    assert client.delete('/api/todos/batch', json={'ids': []}).status_code == 400
+    assert client.delete('/api/todos/batch',
+                         json={'ids': [1], 'filter': {'min_id': 1}}).status_code == 400
+    assert len(client.get('/api/todos/').get_json()) == 3
+
+
+# Fast Serializer Tests
+
+def test_fast_serializer_matches_marshalled_listing(client, app, multiple_todos):
+    """Test the fast path returns the same todos as the marshalled path."""
+    marshalled = client.get('/api/todos/').get_json()
+    app.config['TODOS_FAST_SERIALIZER'] = True
+    response = client.get('/api/todos/')
+
+    assert response.status_code == 200
+    assert response.content_type == 'application/json'
+    assert response.get_json() == marshalled
+
+
+def test_fast_serializer_keeps_pagination(client, app, multiple_todos):
+    """Test the fast path still pages and advertises the next cursor."""
+    app.config['TODOS_FAST_SERIALIZER'] = True
+    response = client.get('/api/todos/?limit=2')
+
+    assert [todo['id'] for todo in response.get_json()] == multiple_todos[:2]
+    assert response.headers['X-Next-Cursor'] == str(multiple_todos[1])
+
+
+def test_fast_serializer_defers_to_fields_mask(client, app, multiple_todos):
+    """Test an X-Fields mask falls back to marshalling."""
+    app.config['TODOS_FAST_SERIALIZER'] = True
+    response = client.get('/api/todos/', headers={'X-Fields': 'id'})
+
+    assert response.get_json() == [{'id': todo_id} for todo_id in multiple_todos]
+
+
+def test_fast_serializer_empty(client, app):
+    """Test the fast path on an empty table."""
+    app.config['TODOS_FAST_SERIALIZER'] = True
+
+    assert client.get('/api/todos/').get_json() == []
+
+
+# Cache Tests
+
+@pytest.fixture
+def cached_app():
+    """Application with the single-todo cache enabled."""
+    class CachedConfig(TestingConfig):
+        TODOS_CACHE_ENABLED = True
+
+    app = create_app(config_class=CachedConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_cached_get_hits_cache(cached_app):
+    """Test repeated reads of a todo are served from the cache."""
+    client = cached_app.test_client()
+    todo_id = client.post('/api/todos/', json={'title': 'Hot'}).get_json()['id']
+
+    client.get(f'/api/todos/{todo_id}')
+    response = client.get(f'/api/todos/{todo_id}')
+
+    assert response.get_json()['title'] == 'Hot'
+    stats = client.get('/api/cache').get_json()
+    assert stats['status'] == 'enabled'
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_cached_get_sees_update(cached_app):
+    """Test PUT invalidates the cached todo."""
+    client = cached_app.test_client()
+    todo_id = client.post('/api/todos/', json={'title': 'Before'}).get_json()['id']
+    client.get(f'/api/todos/{todo_id}')
+
+    client.put(f'/api/todos/{todo_id}', json={'title': 'After'})
+
+    assert client.get(f'/api/todos/{todo_id}').get_json()['title'] == 'After'
+
+
+def test_cached_get_sees_delete(cached_app):
+    """Test DELETE invalidates the cached todo."""
+    client = cached_app.test_client()
+    todo_id = client.post('/api/todos/', json={'title': 'Gone'}).get_json()['id']
+    client.get(f'/api/todos/{todo_id}')
+
+    client.delete(f'/api/todos/{todo_id}')
+
+    assert client.get(f'/api/todos/{todo_id}').status_code == 404
+
+
+def test_cached_get_sees_bulk_writes(cached_app):
+    """Test the batch endpoints invalidate cached todos."""
+    client = cached_app.test_client()
+    todo_id = client.post('/api/todos/', json={'title': 'Bulk'}).get_json()['id']
+    client.get(f'/api/todos/{todo_id}')
+
+    client.patch('/api/todos/batch', json=[{'id': todo_id, 'title': 'Patched'}])
+    assert client.get(f'/api/todos/{todo_id}').get_json()['title'] == 'Patched'
+
+    client.delete('/api/todos/batch', json={'filter': {'title': 'Patched'}})
+    assert client.get(f'/api/todos/{todo_id}').status_code == 404
+
+
+def _write_from_other_worker(todo_id, title):
+    """Simulate another worker process writing straight to the database."""
+    db.session.execute(update(Todo).where(Todo.id == todo_id)
+                       .values(title=title, version=Todo.next_change_version()))
+    db.session.commit()
+
+
+def test_cached_get_sees_write_from_other_worker(cached_app):
+    """Test by default a write committed elsewhere is seen by the next hit, and only drops its todo."""
+    cache = cached_app.extensions['todo_cache']
+    client = cached_app.test_client()
+    todo_id, other_id = (client.post('/api/todos/', json={'title': title}).get_json()['id']
+                         for title in ('Shared', 'Other'))
+    client.get(f'/api/todos/{todo_id}')
+    etag = client.get(f'/api/todos/{other_id}').headers['ETag']
+
+    _write_from_other_worker(todo_id, 'Changed')
+
+    assert client.get(f'/api/todos/{todo_id}').get_json()['title'] == 'Changed'
+    hits = cache.stats()['hits']
+    assert client.get(f'/api/todos/{other_id}').headers['ETag'] == etag
+    assert cache.stats()['hits'] == hits + 1
+
+
+def test_cached_get_version_check_interval(cached_app):
+    """Test an opted-in version check interval serves another worker's write late, until it elapses."""
+    cache = cached_app.extensions['todo_cache']
+    cache.version_check_interval = 1
+    now = [0.0]
+    cache.clock = lambda: now[0]
+    client = cached_app.test_client()
+    todo_id = client.post('/api/todos/', json={'title': 'Shared'}).get_json()['id']
+    client.get(f'/api/todos/{todo_id}')
+
+    _write_from_other_worker(todo_id, 'Changed')
+
+    assert client.get(f'/api/todos/{todo_id}').get_json()['title'] == 'Shared'
+    now[0] = 1
+    assert client.get(f'/api/todos/{todo_id}').get_json()['title'] == 'Changed'
+
+
+def test_cached_get_hit_runs_no_sql(cached_app):
+    """Test a cache hit within an opted-in version check interval does no database work."""
+    cached_app.extensions['todo_cache'].version_check_interval = 1
+    client = cached_app.test_client()
+    todo_id = client.post('/api/todos/', json={'title': 'Hot'}).get_json()['id']
+    client.get(f'/api/todos/{todo_id}')
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(f'/api/todos/{todo_id}')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert response.get_json()['title'] == 'Hot'
+    assert statements == []
+
+
+def test_cache_disabled_in_testing(client):
+    """Test TestingConfig runs without the cache."""
+    assert client.get('/api/cache').get_json() == {'status': 'disabled'}
+
+
+# Conditional GET Tests
+
+def test_get_todo_sets_etag(client, sample_todo):
+    """Test single todo responses carry an ETag."""
+    response = client.get(f'/api/todos/{sample_todo}')
+
+    assert response.headers['ETag'].startswith('"')
+
+
+def test_get_todo_not_modified(client, sample_todo):
+    """Test If-None-Match with the current ETag returns 304 and no body."""
+    etag = client.get(f'/api/todos/{sample_todo}').headers['ETag']
+    response = client.get(f'/api/todos/{sample_todo}', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_get_todo_etag_changes_on_update(client, sample_todo):
+    """Test an updated todo no longer matches its old ETag."""
+    etag = client.get(f'/api/todos/{sample_todo}').headers['ETag']
+    client.put(f'/api/todos/{sample_todo}', json={'title': 'Changed'})
+    response = client.get(f'/api/todos/{sample_todo}', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.get_json()['title'] == 'Changed'
+    assert response.headers['ETag'] != etag
+
+
+def test_list_todos_not_modified(client, multiple_todos):
+    """Test an unchanged collection answers If-None-Match with 304."""
+    etag = client.get('/api/todos/').headers['ETag']
+    response = client.get('/api/todos/', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_list_todos_etag_changes_on_write(client, multiple_todos):
+    """Test any write to todos changes the collection ETag."""
+    etag = client.get('/api/todos/').headers['ETag']
+    client.post('/api/todos/', json={'title': 'New'})
+    response = client.get('/api/todos/', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == 4
+
+
+def test_list_todos_etag_depends_on_query(client, multiple_todos):
+    """Test each page and representation has its own ETag."""
+    etags = {
+        client.get('/api/todos/').headers['ETag'],
+        client.get('/api/todos/?limit=1').headers['ETag'],
+        client.get('/api/todos/?stream=1').headers['ETag'],
+        client.get('/api/todos/', headers={'X-Fields': 'id'}).headers['ETag'],
+    }
+
+    assert len(etags) == 4
+
+
+def test_list_todos_wildcard_if_none_match(client):
+    """Test If-None-Match: * matches the existing collection."""
+    response = client.get('/api/todos/', headers={'If-None-Match': '*'})
+
+    assert response.status_code == 304
+
+
+# Search Tests
+
+@pytest.fixture
+def searchable_todos(client):
+    """Create todos with overlapping words for search testing."""
+    titles = ['milk', 'buy milk and bread', 'milk the cow, then more milk', 'bread', 'Milky way']
+    return [client.post('/api/todos/', json={'title': title}).get_json()['id'] for title in titles]
+
+
+def test_search_todos_ranked(client, searchable_todos):
+    """Test q returns only matching todos, best match first."""
+    response = client.get('/api/todos/?q=milk')
+
+    assert response.status_code == 200
+    titles = [todo['title'] for todo in response.get_json()]
+    assert titles == ['milk', 'milk the cow, then more milk', 'buy milk and bread']
+
+
+def test_search_todos_requires_every_word(client, searchable_todos):
+    """Test every word of q must appear, in any case."""
+    response = client.get('/api/todos/?q=BREAD milk')
+
+    assert [todo['id'] for todo in response.get_json()] == [searchable_todos[1]]
+
+
+def test_search_todos_paginated(client, searchable_todos):
+    """Test search results are paged with offset and advertise the next page."""
+    first = client.get('/api/todos/?q=milk&limit=2')
+    assert len(first.get_json()) == 2
+    assert first.headers['X-Next-Cursor'] == '2'
+    assert 'offset=2' in first.headers['Link']
+
+    second = client.get('/api/todos/?q=milk&limit=2&offset=2')
+    assert [todo['title'] for todo in second.get_json()] == ['buy milk and bread']
+    assert 'X-Next-Cursor' not in second.headers
+
+
+def test_search_todos_sees_writes(client, searchable_todos):
+    """Test the index follows single and batch updates and deletes."""
+    client.put(f'/api/todos/{searchable_todos[3]}', json={'title': 'bread and milk'})
+    client.patch('/api/todos/batch', json=[{'id': searchable_todos[0], 'title': 'water'}])
+    client.delete(f'/api/todos/{searchable_todos[2]}')
+
+    response = client.get('/api/todos/?q=milk')
+
+    assert sorted(todo['id'] for todo in response.get_json()) == [searchable_todos[1], searchable_todos[3]]
+
+
+def test_search_todos_ignores_query_syntax(client, searchable_todos):
+    """Test search operators and quotes in q are treated as plain words."""
+    assert client.get('/api/todos/', query_string={'q': '"milk'}).status_code == 200
+    assert client.get('/api/todos/', query_string={'q': 'milk OR NEAR('}).get_json() == []
+
+
+def test_search_todos_invalid_arguments(client):
+    """Test q without words, offset without q and after_id with q return 400."""
+    assert client.get('/api/todos/?q=***').status_code == 400
+    assert client.get('/api/todos/?offset=5').status_code == 400
+    assert client.get('/api/todos/?q=milk&after_id=1').status_code == 400
+    assert client.get('/api/todos/?q=milk&offset=-1').status_code == 400
+
+
+# Filtering and Sorting Tests
+
+@pytest.fixture
+def titled_todos(client):
+    """Create todos whose titles sort differently from their ids."""
+    titles = ['pear', 'apple', 'banana', 'apricot', 'Apple pie']
+    return [client.post('/api/todos/', json={'title': title}).get_json()['id'] for title in titles]
+
+
+def test_list_todos_title_prefix(client, titled_todos):
+    """Test title_prefix keeps only titles starting with it, in id order."""
+    response = client.get('/api/todos/?title_prefix=ap')
+
+    assert [todo['title'] for todo in response.get_json()] == ['apple', 'apricot']
+
+
+def test_list_todos_id_range(client, titled_todos):
+    """Test min_id and max_id bound the listing."""
+    response = client.get(f'/api/todos/?min_id={titled_todos[1]}&max_id={titled_todos[3]}')
+
+    assert [todo['id'] for todo in response.get_json()] == titled_todos[1:4]
+
+
+def test_list_todos_sort_by_title(client, titled_todos):
+    """Test sort=title in both directions."""
+    ascending = [todo['title'] for todo in client.get('/api/todos/?sort=title').get_json()]
+    descending = [todo['title'] for todo in client.get('/api/todos/?sort=title&order=desc').get_json()]
+
+    assert ascending == ['Apple pie', 'apple', 'apricot', 'banana', 'pear']
+    assert descending == ascending[::-1]
+
+
+def test_list_todos_sort_by_id_descending(client, titled_todos):
+    """Test order=desc lists newest first and pages backwards."""
+    response = client.get('/api/todos/?order=desc&limit=2')
+
+    assert [todo['id'] for todo in response.get_json()] == titled_todos[:-3:-1]
+    assert response.headers['X-Next-Cursor'] == str(titled_todos[-2])
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_list_todos_follow_title_cursor(client, titled_todos, order):
+    """Test following next links through a title sort visits every todo once, in order."""
+    seen = []
+    url = f'/api/todos/?sort=title&order={order}&limit=2'
+    while url:
+        response = client.get(url)
+        seen.extend(todo['title'] for todo in response.get_json())
+        link = response.headers.get('Link')
+        url = link[1:link.index('>')] if link else None
+
+    expected = sorted(['pear', 'apple', 'banana', 'apricot', 'Apple pie'])
+    assert seen == (expected if order == 'asc' else expected[::-1])
+
+
+def test_list_todos_filters_combine_with_search(client, titled_todos):
+    """Test filters narrow search results too."""
+    response = client.get(f'/api/todos/?q=apple&max_id={titled_todos[1]}')
+
+    assert [todo['title'] for todo in response.get_json()] == ['apple']
+
+
+def test_list_todos_invalid_sort_arguments(client):
+    """Test unsupported or inconsistent sort and cursor arguments return 400."""
+    assert client.get('/api/todos/?sort=random').status_code == 400
+    assert client.get('/api/todos/?order=up').status_code == 400
+    assert client.get('/api/todos/?title_prefix=').status_code == 400
+    assert client.get('/api/todos/?sort=title&after_id=1').status_code == 400
+    assert client.get('/api/todos/?after_title=x&after_id=1').status_code == 400
+    assert client.get('/api/todos/?q=apple&sort=title').status_code == 400
+
+
+def test_listing_queries_use_indexes(app):
+    """Test every filter/sort/cursor combination is answered from an index.
+
+    The only plan without a SEARCH is the unfiltered id listing, which walks
+    the primary key (SQLite's rowid B-tree) in order and stops at the limit.
+    """
+    filters = ['', 'title_prefix=ap', 'min_id=10&max_id=20', 'title_prefix=ap&min_id=10']
+    sorts = ['', 'sort=id', 'sort=title', 'order=desc', 'sort=title&order=desc']
+    cursors = ['', 'after_id=5']
+
+    for filter_args, sort_args, cursor_args in itertools.product(filters, sorts, cursors):
+        if cursor_args and 'title' in sort_args:
+            cursor_args += '&after_title=m'
+        query = '&'.join(part for part in ('limit=100', filter_args, sort_args, cursor_args) if part)
+        with app.test_request_context(f'/api/todos/?{query}'):
+            statement = _listing_statement(list_parser.parse_args(), Todo.id, Todo.title).limit(100)
+        sql = statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+        plan = [row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+        if not filter_args and not cursor_args and 'title' not in sort_args:
+            assert plan == ['SCAN todos'], query
+            continue
+        access = plan[0]
+        assert access.startswith('SEARCH todos') or 'USING COVERING INDEX' in access, (query, plan)
+        assert all('SCAN todos' not in step or 'INDEX' in step for step in plan), (query, plan)
+
+
+# Change Feed Tests
+
+def test_changes_full_sync(client):
+    """Test the change feed without since returns every todo as an upsert."""
+    client.post('/api/todos/batch', json=[{'title': 'a'}, {'title': 'b'}])
+
+    body = client.get('/api/todos/changes').get_json()
+
+    assert [(change['op'], change['title']) for change in body['changes']] == [('upsert', 'a'), ('upsert', 'b')]
+    assert body['has_more'] is False
+    assert body['since'] == body['changes'][-1]['version']
+
+
+def test_changes_since_version(client):
+    """Test only writes after since are returned: updates with the new title, deletes as tombstones."""
+    ids = [todo['id'] for todo in client.post(
+        '/api/todos/batch', json=[{'title': 'keep'}, {'title': 'edit'}, {'title': 'drop'}]).get_json()['created']]
+    since = client.get('/api/todos/changes').get_json()['since']
+
+    client.put(f'/api/todos/{ids[1]}', json={'title': 'edited'})
+    client.delete(f'/api/todos/{ids[2]}')
+    created = client.post('/api/todos/', json={'title': 'new'}).get_json()['id']
+    body = client.get(f'/api/todos/changes?since={since}').get_json()
+
+    assert [(change['op'], change['id'], change['title']) for change in body['changes']] == [
+        ('upsert', ids[1], 'edited'), ('delete', ids[2], None), ('upsert', created, 'new')]
+    assert client.get(f"/api/todos/changes?since={body['since']}").get_json()['changes'] == []
+
+
+def test_changes_paginate_within_a_version(client):
+    """Test a page boundary inside one version continues by id, without gaps or repeats."""
+    client.post('/api/todos/batch', json=[{'title': f'todo {i}'} for i in range(5)])
+
+    seen, url = [], '/api/todos/changes?limit=2'
+    while True:
+        response = client.get(url)
+        body = response.get_json()
+        seen += [change['id'] for change in body['changes']]
+        if not body['has_more']:
+            break
+        assert body['after_id'] == seen[-1]
+        assert 'rel="next"' in response.headers['Link']
+        url = f"/api/todos/changes?limit=2&since={body['since']}&after_id={body['after_id']}"
+
+    assert seen == [1, 2, 3, 4, 5]
+
+
+def test_changes_record_batch_deletes(client):
+    """Test a filtered batch delete leaves a tombstone for each deleted todo."""
+    client.post('/api/todos/batch', json=[{'title': f'todo {i}'} for i in range(4)])
+    since = client.get('/api/todos/changes').get_json()['since']
+
+    client.delete('/api/todos/batch', json={'filter': {'min_id': 3}})
+    body = client.get(f'/api/todos/changes?since={since}').get_json()
+
+    assert [(change['op'], change['id']) for change in body['changes']] == [('delete', 3), ('delete', 4)]
+
+
+def test_ids_and_versions_past_64_bits_are_rejected(client, sample_todo):
+    """Test ids and versions the database cannot store answer 400 (404 in the path), not 500."""
+    huge = 2 ** 70
+    for url in (f'/api/todos/?min_id={huge}', f'/api/todos/?max_id=-{huge}', f'/api/todos/?after_id={huge}',
+                f'/api/todos/changes?since={huge}', f'/api/todos/changes?since=1&after_id={huge}'):
+        assert client.get(url).status_code == 400, url
+    assert client.patch('/api/todos/batch', json=[{'id': huge, 'title': 'x'}]).status_code == 400
+    assert client.delete('/api/todos/batch', json={'ids': [huge]}).status_code == 400
+    assert client.delete('/api/todos/batch', json={'filter': {'min_id': huge}}).status_code == 400
+    assert client.get(f'/api/todos/{huge}').status_code == 404
+    assert client.put(f'/api/todos/{huge}', json={'title': 'x'}).status_code == 404
+    assert client.get(f'/api/todos/?min_id={2 ** 63 - 1}').get_json() == []
+
+
+def test_deleting_a_reused_id_again(client):
+    """Test an id SQLite hands out again after its delete can be deleted again, one at a time or in a batch."""
+    todo_id = client.post('/api/todos/', json={'title': 'first'}).get_json()['id']
+    assert client.delete(f'/api/todos/{todo_id}').status_code == 204
+    assert client.post('/api/todos/', json={'title': 'second'}).get_json()['id'] == todo_id
+    assert client.delete(f'/api/todos/{todo_id}').status_code == 204
+
+    client.post('/api/todos/batch', json=[{'title': 'a'}, {'title': 'b'}])
+    [batch_id] = [todo['id'] for todo in client.get('/api/todos/').get_json() if todo['title'] == 'b']
+    assert client.delete('/api/todos/batch', json={'ids': [batch_id]}).get_json()['deleted'] == 1
+    assert client.post('/api/todos/batch', json=[{'title': 'c'}]).get_json()['created'][0]['id'] == batch_id
+    assert client.delete('/api/todos/batch', json={'ids': [batch_id]}).get_json()['deleted'] == 1
+
+    # 'a' took todo_id after its second delete: replayed in order, the feed leaves it live
+    changes = client.get('/api/todos/changes').get_json()['changes']
+    assert [(change['op'], change['id'], change['title']) for change in changes] == [
+        ('delete', todo_id, None), ('upsert', todo_id, 'a'), ('delete', batch_id, None)]
+
+
+def test_changes_invalid_arguments(client):
+    """Test a negative since, or after_id without since, returns 400."""
+    assert client.get('/api/todos/changes?since=-1').status_code == 400
+    assert client.get('/api/todos/changes?after_id=1').status_code == 400
@@ -0,0 +1,30 @@
+# tests/test_app.py
+
+from app import create_app
+from app.config import TestingConfig
+
+
+class LeanConfig(TestingConfig):
+    MIGRATIONS_ENABLED = False
+    API_DOCS_ENABLED = False
+
+
+def test_default_startup_registers_migrations_and_docs():
+    """Test the default app sets up Flask-Migrate and serves the Swagger docs."""
+    app = create_app(config_class=TestingConfig)
+    client = app.test_client()
+
+    assert 'migrate' in app.extensions
+    assert client.get('/api/docs').status_code == 200
+    assert client.get('/swagger.json').status_code == 200
+
+
+def test_lean_startup_skips_migrations_and_docs():
+    """Test lean startup leaves out Flask-Migrate and the docs but still serves the API."""
+    app = create_app(config_class=LeanConfig)
+    client = app.test_client()
+
+    assert 'migrate' not in app.extensions
+    assert client.get('/api/docs').status_code == 404
+    assert client.get('/swagger.json').status_code == 404
+    assert client.get('/api/helloworld/').status_code == 200
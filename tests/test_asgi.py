@@ -0,0 +1,162 @@
+# tests/test_asgi.py
+
+from urllib.parse import urlsplit
+
+import pytest
+from starlette.testclient import TestClient
+
+from app import create_app, db
+from app.asgi import async_database_uri, create_asgi_app
+from app.config import TestingConfig
+
+
+@pytest.fixture
+def asgi_client():
+    """Test client for the async todos API on an in-memory database."""
+    app = create_asgi_app(config_class=TestingConfig)
+
+    async def create_tables():
+        async with app.state.engine.begin() as connection:
+            await connection.run_sync(db.metadata.create_all)
+
+    with TestClient(app) as client:
+        client.portal.call(create_tables)
+        yield client
+
+
+# Same requests against both serving modes; each must answer with the same status and body
+PARITY_REQUESTS = [
+    ('post', '/api/todos/', {'title': 'buy milk'}),
+    ('post', '/api/todos/batch', [{'title': 'read'}, {'nope': 1}, {'title': 'milk the cow'}]),
+    ('get', '/api/todos/', None),
+    ('get', '/api/todos/?limit=2', None),
+    ('get', '/api/todos/?limit=1&after_id=1', None),
+    ('get', '/api/todos/?q=milk', None),
+    ('get', '/api/todos/?sort=title&order=desc', None),
+    ('get', '/api/todos/?title_prefix=re', None),
+    ('get', '/api/todos/?limit=0', None),
+    ('get', '/api/todos/?limit=abc', None),
+    ('get', '/api/todos/2', None),
+    ('get', '/api/todos/99/', None),
+    ('put', '/api/todos/2', {'title': 'write'}),
+    ('put', '/api/todos/2', {}),
+    ('patch', '/api/todos/batch', [{'id': 1, 'title': 'buy oat milk'}, {'id': 'x', 'title': 'y'}]),
+    ('patch', '/api/todos/batch', {'not': 'a list'}),
+    ('delete', '/api/todos/batch', {'filter': {'min_id': 3}}),
+    ('delete', '/api/todos/batch', {}),
+    ('delete', '/api/todos/batch', {'filter': {'title': {'x': 1}}}),
+    ('delete', '/api/todos/1', None),
+    ('delete', '/api/todos/1', None),
+    # SQLite hands the deleted id 3 out again; deleting it again replaces its tombstone
+    ('post', '/api/todos/batch', [{'title': 'again'}]),
+    ('delete', '/api/todos/batch', {'ids': [3]}),
+    ('post', '/api/todos/', {'title': 'once more'}),
+    ('delete', '/api/todos/3', None),
+    ('get', '/api/todos', None),
+    ('get', '/api/todos/changes', None),
+    ('get', '/api/todos/changes?since=2&limit=1', None),
+    ('get', '/api/todos/changes?after_id=1', None),
+    # Past the signed 64-bit range of ids and versions
+    ('get', f'/api/todos/?min_id={2 ** 63}', None),
+    ('get', f'/api/todos/changes?since={2 ** 63}', None),
+    ('patch', '/api/todos/batch', [{'id': 2 ** 63, 'title': 'x'}]),
+    ('delete', '/api/todos/batch', {'filter': {'max_id': -2 ** 70}}),
+]
+
+
+def _send(client, method, url, body):
+    """Issue a request through either a Flask or a Starlette test client, without following redirects."""
+    kwargs = {} if body is None else {'json': body}
+    if hasattr(client, 'open'):
+        return client.open(url, method=method.upper(), **kwargs)
+    return client.request(method.upper(), url, follow_redirects=False, **kwargs)
+
+
+def test_asgi_matches_flask_contract(client, asgi_client):
+    """Test the async API answers every request exactly like the Flask API."""
+    for method, url, body in PARITY_REQUESTS:
+        expected = _send(client, method, url, body)
+        actual = _send(asgi_client, method, url, body)
+
+        assert actual.status_code == expected.status_code, (method, url)
+        if expected.status_code == 404:
+            # flask-restx appends route suggestions to 404 messages
+            assert expected.get_json()['message'].startswith(actual.json()['message'])
+        elif expected.status_code == 308:
+            assert urlsplit(actual.headers['Location']).path == urlsplit(expected.headers['Location']).path
+        elif expected.status_code != 204:
+            assert actual.json() == expected.get_json(), (method, url)
+        assert actual.headers.get('X-Next-Cursor') == expected.headers.get('X-Next-Cursor'), (method, url)
+        assert actual.headers.get('ETag') == expected.headers.get('ETag'), (method, url)
+        if 'Link' in expected.headers:
+            # The test clients use different host names; the path and query must match
+            assert (urlsplit(actual.headers['Link'][1:].split('>')[0])[2:]
+                    == urlsplit(expected.headers['Link'][1:].split('>')[0])[2:]), (method, url)
+
+
+def test_asgi_todo_id_past_64_bits(asgi_client):
+    """Test a path id the database cannot store is not found rather than a server error."""
+    for method in ('get', 'put', 'delete'):
+        assert getattr(asgi_client, method)(f'/api/todos/{2 ** 70}').status_code == 404
+
+
+def test_asgi_stream_todos(asgi_client):
+    """Test the NDJSON listing streams one todo per line."""
+    asgi_client.post('/api/todos/batch', json=[{'title': 'a'}, {'title': 'b'}])
+
+    response = asgi_client.get('/api/todos/', headers={'Accept': 'application/x-ndjson'})
+
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert response.text == '{"id": 1, "title": "a"}\n{"id": 2, "title": "b"}\n'
+
+
+def test_asgi_conditional_get(asgi_client):
+    """Test listing and single todo ETags answer 304 until a write."""
+    asgi_client.post('/api/todos/', json={'title': 'a'})
+    listing_etag = asgi_client.get('/api/todos/').headers['ETag']
+    todo_etag = asgi_client.get('/api/todos/1').headers['ETag']
+
+    assert asgi_client.get('/api/todos/', headers={'If-None-Match': listing_etag}).status_code == 304
+    assert asgi_client.get('/api/todos/1', headers={'If-None-Match': todo_etag}).status_code == 304
+
+    asgi_client.put('/api/todos/1', json={'title': 'b'})
+
+    assert asgi_client.get('/api/todos/', headers={'If-None-Match': listing_etag}).status_code == 200
+    assert asgi_client.get('/api/todos/1', headers={'If-None-Match': todo_etag}).status_code == 200
+
+
+def test_asgi_fields_mask(asgi_client):
+    """Test X-Fields masks the async listing like the Flask one."""
+    asgi_client.post('/api/todos/', json={'title': 'a'})
+
+    response = asgi_client.get('/api/todos/', headers={'X-Fields': 'title'})
+
+    assert response.json() == [{'title': 'a'}]
+
+
+def test_asgi_writes_bump_version_seen_by_flask(tmp_path):
+    """Test a write through the async API changes the listing ETag served by Flask workers."""
+    class SharedConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'shared.db'}"
+
+    flask_app = create_app(config_class=SharedConfig)
+    with flask_app.app_context():
+        db.create_all()
+    flask_client = flask_app.test_client()
+    etag = flask_client.get('/api/todos/').headers['ETag']
+
+    with TestClient(create_asgi_app(config_class=SharedConfig)) as asgi:
+        asgi.post('/api/todos/', json={'title': 'from asgi'})
+
+    response = flask_client.get('/api/todos/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json() == [{'id': 1, 'title': 'from asgi'}]
+
+
+def test_async_database_uri():
+    """Test sync driver URIs map to their asyncio drivers."""
+    assert async_database_uri('sqlite:///todos.db') == 'sqlite+aiosqlite:///todos.db'
+    assert (async_database_uri('mysql+pymysql://user:secret@db:3306/todos')
+            == 'mysql+aiomysql://user:secret@db:3306/todos')
+    with pytest.raises(ValueError):
+        async_database_uri('oracle://db/todos')
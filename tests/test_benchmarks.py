@@ -0,0 +1,73 @@
+# tests/test_benchmarks.py
+
+from benchmarks.endpoint_suite import baseline_mismatch, compare, percentile, run_size, summarize
+from benchmarks.startup_profile import import_breakdown
+
+
+def report_with(p95_ms, rps):
+    return {"results": {"1000": {"get_todo": {"p95_ms": p95_ms, "rps": rps}}}}
+
+
+def test_percentile_nearest_rank():
+    """Test percentiles use the nearest-rank method."""
+    values = list(range(1, 101))
+
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) == 0.0
+
+
+def test_summarize_reports_throughput():
+    """Test throughput is requests divided by total time."""
+    summary = summarize([0.01] * 10)
+
+    assert summary["requests"] == 10
+    assert summary["rps"] == 100.0
+    assert summary["p95_ms"] == 10.0
+
+
+def test_compare_within_threshold():
+    """Test small changes are not reported."""
+    assert compare(report_with(11, 95), report_with(10, 100), threshold=0.25) == []
+
+
+def test_compare_flags_latency_and_throughput():
+    """Test slower p95 and lower throughput are both reported."""
+    regressions = compare(report_with(20, 50), report_with(10, 100), threshold=0.25)
+
+    assert len(regressions) == 2
+    assert "p95" in regressions[0]
+
+
+def test_baseline_from_another_machine_is_not_compared():
+    """Test a baseline is only comparable when measured on the same host, platform and Python."""
+    meta = {"host": "ci-1", "platform": "Linux", "python": "3.11.7"}
+
+    assert baseline_mismatch({"meta": meta}, {"meta": dict(meta)}) is None
+    assert "host" in baseline_mismatch({"meta": meta}, {"meta": dict(meta, host="laptop")})
+    assert baseline_mismatch({"meta": meta}, {}) is not None
+
+
+def test_compare_skips_unknown_operations():
+    """Test operations without a baseline are ignored."""
+    assert compare(report_with(20, 50), {"results": {}}, threshold=0.25) == []
+
+
+def test_run_size_smoke():
+    """Test the suite runs end to end on a tiny table."""
+    results = run_size(rows=20, requests=3)
+
+    assert set(results) >= {"list_page", "list_full", "get_todo", "create_todo", "delete_todo"}
+    assert all(result["requests"] >= 1 for result in results.values())
+
+
+def test_import_breakdown_sums_self_time_per_package():
+    """Test -X importtime output is grouped by top-level package."""
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:      1000 |       1000 |     sqlalchemy.sql",
+        "import time:      2500 |       3500 |   sqlalchemy",
+        "import time:       500 |        500 | flask",
+    ])
+
+    assert import_breakdown(stderr) == {"sqlalchemy": 3.5, "flask": 0.5}
@@ -0,0 +1,109 @@
+# tests/test_cache.py
+
+from app.cache import TodoCache
+
+
+class FakeClock:
+    """Manually advanced clock for TTL tests."""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_hit_after_miss():
+    """Test the loader runs once and later lookups are hits."""
+    cache = TodoCache(max_size=10, ttl=60)
+    calls = []
+    loader = lambda: calls.append(1) or {'id': 1}
+
+    assert cache.get_or_load(1, loader) == {'id': 1}
+    assert cache.get_or_load(1, loader) == {'id': 1}
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_does_not_store_none():
+    """Test missing values are not cached."""
+    cache = TodoCache(max_size=10, ttl=60)
+
+    assert cache.get_or_load(1, lambda: None) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_cache_evicts_least_recently_used():
+    """Test the oldest unused entry is evicted once full."""
+    cache = TodoCache(max_size=2, ttl=60)
+    cache.get_or_load(1, lambda: 'one')
+    cache.get_or_load(2, lambda: 'two')
+    cache.get_or_load(1, lambda: 'unused')  # 1 is now most recently used
+    cache.get_or_load(3, lambda: 'three')
+
+    assert cache.stats()['evictions'] == 1
+    assert cache.get_or_load(1, lambda: 'reloaded') == 'one'
+    assert cache.get_or_load(2, lambda: 'reloaded') == 'reloaded'
+
+
+def test_cache_entries_expire():
+    """Test entries older than the TTL are reloaded."""
+    clock = FakeClock()
+    cache = TodoCache(max_size=10, ttl=5, clock=clock)
+    cache.get_or_load(1, lambda: 'old')
+    clock.now = 6
+
+    assert cache.get_or_load(1, lambda: 'new') == 'new'
+
+
+def test_cache_invalidate_keys_and_all():
+    """Test explicit invalidation of some or all keys."""
+    cache = TodoCache(max_size=10, ttl=60)
+    for key in (1, 2, 3):
+        cache.get_or_load(key, lambda: key)
+
+    cache.invalidate([1])
+    assert cache.stats()['size'] == 2
+    cache.invalidate()
+    assert cache.stats()['size'] == 0
+
+
+def test_cache_version_change_invalidates():
+    """Test a new shared version stamp makes older entries stale."""
+    version = [1]
+    cache = TodoCache(max_size=10, ttl=60, version_loader=lambda: version[0])
+    cache.get_or_load(1, lambda: 'v1')
+    version[0] = 2
+
+    assert cache.get_or_load(1, lambda: 'v2') == 'v2'
+
+
+def test_cache_version_check_interval():
+    """Test the version stamp is re-read at most once per interval."""
+    clock = FakeClock()
+    reads = []
+    cache = TodoCache(max_size=10, ttl=60, clock=clock, version_check_interval=1,
+                      version_loader=lambda: reads.append(1) or 1)
+    cache.get_or_load(1, lambda: 'value')
+    cache.get_or_load(1, lambda: 'value')
+    assert len(reads) == 1
+
+    clock.now = 2
+    cache.get_or_load(1, lambda: 'value')
+    assert len(reads) == 2
+
+
+def test_cache_version_change_drops_only_changed_keys():
+    """Test the changes loader limits invalidation to the keys written since the last check."""
+    version = [1]
+    cache = TodoCache(max_size=10, ttl=60, version_loader=lambda: version[0],
+                      changes_loader=lambda since, limit: [1] if since == 1 else None)
+    for key in (1, 2):
+        cache.get_or_load(key, lambda: 'old')
+    version[0] = 2
+
+    assert cache.get_or_load(1, lambda: 'new') == 'new'
+    assert cache.get_or_load(2, lambda: 'new') == 'old'
+
+    version[0] = 3
+    assert cache.get_or_load(2, lambda: 'newer') == 'newer'
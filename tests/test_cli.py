@@ -0,0 +1,94 @@
+# tests/test_cli.py
+
+import json
+
+from app import db
+from app.models import ImportCheckpoint, TableVersion, Todo
+
+
+def titles():
+    return [todo.title for todo in Todo.query.order_by(Todo.id)]
+
+
+def test_import_csv(app, tmp_path):
+    """Test a CSV file is imported in chunks and the rate is reported."""
+    path = tmp_path / 'todos.csv'
+    path.write_text('id,title\n' + ''.join(f'{i},Todo {i}\n' for i in range(1, 8)))
+
+    result = app.test_cli_runner().invoke(args=['todos', 'import', str(path), '--chunk-size', '3'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Imported 7 todos' in result.output
+    assert 'rows/s' in result.output
+    assert titles() == [f'Todo {i}' for i in range(1, 8)]
+    assert TableVersion.current(Todo.__tablename__) == 3  # one bump per committed chunk
+
+
+def test_import_ndjson_from_stdin_keeping_ids(app):
+    """Test NDJSON read from stdin, with --keep-ids inserting the given ids."""
+    lines = [json.dumps({'id': 10, 'title': 'Ten'}), '', json.dumps({'id': 20, 'title': 'Twenty'})]
+
+    result = app.test_cli_runner().invoke(
+        args=['todos', 'import', '-', '--format', 'ndjson', '--keep-ids'],
+        input='\n'.join(lines) + '\n',
+    )
+
+    assert result.exit_code == 0, result.output
+    assert {todo.id: todo.title for todo in Todo.query} == {10: 'Ten', 20: 'Twenty'}
+
+
+def test_import_stdin_needs_format(app):
+    """Test the format cannot be guessed for stdin."""
+    result = app.test_cli_runner().invoke(args=['todos', 'import'], input='{"title": "x"}\n')
+
+    assert result.exit_code == 2
+    assert '--format' in result.output
+
+
+def test_import_resumes_from_checkpoint(app, tmp_path):
+    """Test a failed import keeps its committed chunks and resumes after them once fixed."""
+    path = tmp_path / 'todos.ndjson'
+    records = [{'title': f'Todo {i}'} for i in range(10)]
+    records[5] = {'title': ''}
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+    args = ['todos', 'import', str(path), '--chunk-size', '2', '--checkpoint', 'nightly']
+
+    failed = app.test_cli_runner().invoke(args=args)
+
+    assert failed.exit_code == 1
+    assert 'Line 6: Title must be a non-empty string' in failed.output
+    assert titles() == [f'Todo {i}' for i in range(4)]
+    assert db.session.get(ImportCheckpoint, 'nightly').rows == 4
+
+    records[5] = {'title': 'Todo 5'}
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records))
+    resumed = app.test_cli_runner().invoke(args=args)
+
+    assert resumed.exit_code == 0, resumed.output
+    assert 'Resuming after 4 committed rows' in resumed.output
+    assert 'Imported 6 todos' in resumed.output
+    assert titles() == [f'Todo {i}' for i in range(10)]
+
+    # Re-running a finished import is a no-op
+    assert 'Imported 0 todos' in app.test_cli_runner().invoke(args=args).output
+    assert len(titles()) == 10
+
+
+def test_import_checkpoint_commits_with_its_chunk(app, tmp_path):
+    """Test a chunk whose INSERT fails rolls back its checkpoint too, so resuming retries it."""
+    path = tmp_path / 'todos.ndjson'
+    path.write_text(''.join(json.dumps({'id': i, 'title': f'Todo {i}'}) + '\n' for i in (1, 2, 3, 1)))
+    args = ['todos', 'import', str(path), '--keep-ids', '--chunk-size', '2', '--checkpoint', 'ids']
+
+    failed = app.test_cli_runner().invoke(args=args)
+
+    assert failed.exit_code == 1
+    assert [todo.id for todo in Todo.query.order_by(Todo.id)] == [1, 2]
+    assert db.session.get(ImportCheckpoint, 'ids').rows == 2
+
+    path.write_text(''.join(json.dumps({'id': i, 'title': f'Todo {i}'}) + '\n' for i in (1, 2, 3, 4)))
+    resumed = app.test_cli_runner().invoke(args=args)
+
+    assert resumed.exit_code == 0, resumed.output
+    assert [todo.id for todo in Todo.query.order_by(Todo.id)] == [1, 2, 3, 4]
+    assert db.session.get(ImportCheckpoint, 'ids').rows == 4
@@ -0,0 +1,96 @@
+# tests/test_compression.py
+
+import gzip
+import json
+
+import pytest
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models import Todo
+
+
+@pytest.fixture
+def many_todos(app):
+    """Enough todos for the listing to pass the compression threshold."""
+    Todo.bulk_insert([f'Todo number {i}' for i in range(200)])
+    db.session.commit()
+
+
+def test_large_listing_is_gzipped(client, many_todos):
+    """Test a large JSON listing is gzipped, with a weak ETag and Vary header."""
+    plain = client.get('/api/todos/')
+    response = client.get('/api/todos/', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert int(response.headers['Content-Length']) == len(response.data) < len(plain.data) / 4
+    assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+    assert response.headers['ETag'] == 'W/' + plain.headers['ETag']
+
+
+def test_compressed_listing_revalidates(client, many_todos):
+    """Test the weak ETag of a compressed listing still gets a 304."""
+    etag = client.get('/api/todos/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+    response = client.get('/api/todos/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+
+    assert response.status_code == 304
+
+
+def test_identity_without_accept_encoding(client, many_todos):
+    """Test clients that do not accept gzip get the plain body, marked as varying."""
+    for accept_encoding in (None, 'identity', 'gzip;q=0'):
+        headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+        response = client.get('/api/todos/', headers=headers)
+
+        assert 'Content-Encoding' not in response.headers
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert len(response.get_json()) == 200
+
+
+def test_small_responses_are_not_compressed(client):
+    """Test the health checks stay below the threshold and skip compression."""
+    for path in ('/api/', '/api/helloworld/'):
+        response = client.get(path, headers={'Accept-Encoding': 'gzip, br'})
+
+        assert response.status_code == 200
+        assert 'Content-Encoding' not in response.headers
+        assert 'Vary' not in response.headers
+
+
+def test_streamed_listing_is_gzipped(client, many_todos):
+    """Test the NDJSON stream is compressed while staying a stream."""
+    plain = client.get('/api/todos/?stream=1')
+    response = client.get('/api/todos/?stream=1', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.is_streamed
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.data) == plain.data
+
+
+def test_brotli_preferred_when_available(client, many_todos):
+    """Test brotli is chosen over gzip when installed and accepted."""
+    brotli = pytest.importorskip('brotli')
+    plain = client.get('/api/todos/')
+    response = client.get('/api/todos/', headers={'Accept-Encoding': 'gzip, br'})
+
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.data)) == plain.get_json()
+
+    streamed = client.get('/api/todos/?stream=1', headers={'Accept-Encoding': 'br'})
+    assert brotli.decompress(streamed.data) == client.get('/api/todos/?stream=1').data
+
+
+def test_compression_disabled():
+    """Test COMPRESSION_ENABLED=False leaves responses alone."""
+    class NoCompressionConfig(TestingConfig):
+        COMPRESSION_ENABLED = False
+        COMPRESSION_MIN_SIZE = 0
+
+    app = create_app(config_class=NoCompressionConfig)
+    response = app.test_client().get('/api/', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'compression' not in app.extensions
+    assert 'Content-Encoding' not in response.headers
@@ -0,0 +1,294 @@
+# tests/test_events.py
+
+import asyncio
+import json
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+from app import create_app, db
+from app.asgi import create_asgi_app
+from app.config import TestingConfig
+from app.events import EventBroker, parse_event_id
+from app.models import TodoEvent
+
+
+def make_app(tmp_path=None, **settings):
+    class EventsConfig(TestingConfig):
+        TODOS_EVENTS_HEARTBEAT = 0.05
+        TODOS_EVENTS_POLL_INTERVAL = 0.01
+
+    if tmp_path is not None:
+        EventsConfig.SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'events.db'}"
+    for name, value in settings.items():
+        setattr(EventsConfig, name, value)
+    app = create_app(config_class=EventsConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def parse(frames):
+    """(id, event, data) of each event in ``frames``, skipping retry and keepalive frames."""
+    events = []
+    for frame in frames.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in frame.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['id'], fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def read_events(stream, count, timeout=5):
+    """Read frames from ``stream`` until it has sent ``count`` events."""
+    frames, deadline = '', time.monotonic() + timeout
+    while len(parse(frames)) < count:
+        assert time.monotonic() < deadline, frames
+        chunk = next(stream)
+        frames += chunk.decode() if isinstance(chunk, bytes) else chunk
+    return parse(frames)
+
+
+def open_stream(client, last_event_id=None):
+    headers = {'Last-Event-ID': last_event_id} if last_event_id else {}
+    response = client.get('/api/todos/events', headers=headers, buffered=False)
+    stream = iter(response.response)
+    assert next(stream).startswith(b'retry: ')
+    return response, stream
+
+
+def test_stream_pushes_writes():
+    """Test creates, updates and deletes are pushed to an open stream, in order."""
+    client = make_app().test_client()
+    response, stream = open_stream(client)
+
+    todo_id = client.post('/api/todos/', json={'title': 'a'}).get_json()['id']
+    client.put(f'/api/todos/{todo_id}', json={'title': 'b'})
+    client.delete(f'/api/todos/{todo_id}')
+
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert read_events(stream, 3) == [
+        ('1:1', 'created', {'id': 1, 'title': 'a', 'version': 1}),
+        ('2:1', 'updated', {'id': 1, 'title': 'b', 'version': 2}),
+        ('3:1', 'deleted', {'id': 1, 'title': None, 'version': 3}),
+    ]
+    assert client.get('/api/events').get_json()['subscribers'] == 1
+    response.close()
+    assert client.get('/api/events').get_json()['subscribers'] == 0
+
+
+def test_stream_resumes_from_last_event_id():
+    """Test a reconnecting client gets only the events after its Last-Event-ID."""
+    client = make_app().test_client()
+    for title in ('a', 'b', 'c'):
+        client.post('/api/todos/', json={'title': title})
+
+    response, stream = open_stream(client, last_event_id='1:1')
+
+    assert [data['title'] for _, _, data in read_events(stream, 2)] == ['b', 'c']
+    response.close()
+
+
+def test_stream_resets_when_history_is_gone():
+    """Test resuming from before the local history sends a reset pointing at the newest event."""
+    client = make_app(TODOS_EVENTS_HISTORY=1).test_client()
+    for title in ('a', 'b', 'c'):
+        client.post('/api/todos/', json={'title': title})
+
+    response, stream = open_stream(client, last_event_id='1:1')
+
+    assert read_events(stream, 1) == [('3:3', 'reset', {})]
+    response.close()
+
+
+def test_database_broker_fans_out_across_workers(tmp_path):
+    """Test a stream in one worker receives the writes of another through todo_events."""
+    writer = make_app(tmp_path, TODOS_EVENTS_BROKER='database').test_client()
+    reader = make_app(tmp_path, TODOS_EVENTS_BROKER='database')
+    response, stream = open_stream(reader.test_client())
+
+    writer.post('/api/todos/', json={'title': 'from another worker'})
+
+    assert read_events(stream, 1) == [('1:1', 'created', {'id': 1, 'title': 'from another worker',
+                                                          'version': 1})]
+    response.close()
+    reader.extensions['todo_events'].stop()
+
+
+def test_database_broker_resumes_from_storage(tmp_path):
+    """Test a new worker replays stored events after Last-Event-ID, and resets once they are pruned."""
+    writer = make_app(tmp_path, TODOS_EVENTS_BROKER='database').test_client()
+    for title in ('a', 'b', 'c'):
+        writer.post('/api/todos/', json={'title': title})
+
+    restarted = make_app(tmp_path, TODOS_EVENTS_BROKER='database')
+    response, stream = open_stream(restarted.test_client(), last_event_id='1:1')
+    assert [data['title'] for _, _, data in read_events(stream, 2)] == ['b', 'c']
+    response.close()
+    restarted.extensions['todo_events'].stop()
+
+    pruned = make_app(tmp_path, TODOS_EVENTS_BROKER='database')
+    with pruned.app_context():
+        db.session.execute(TodoEvent.__table__.delete().where(TodoEvent.version < 3))
+        db.session.commit()
+    response, stream = open_stream(pruned.test_client(), last_event_id='1:1')
+    assert read_events(stream, 1) == [('3:3', 'reset', {})]
+    response.close()
+    pruned.extensions['todo_events'].stop()
+
+
+def test_group_commit_publishes_created_events(tmp_path):
+    """Test todos created through the group commit are pushed too."""
+    app = make_app(tmp_path, TODOS_GROUP_COMMIT_ENABLED=True)
+    client = app.test_client()
+    response, stream = open_stream(client)
+
+    client.post('/api/todos/', json={'title': 'batched'})
+
+    assert read_events(stream, 1)[0][1:] == ('created', {'id': 1, 'title': 'batched', 'version': 1})
+    response.close()
+    app.extensions['group_commit'].stop()
+
+
+def test_batch_writes_publish_events():
+    """Test batch creates, updates and deletes push one event per todo they wrote."""
+    client = make_app().test_client()
+    response, stream = open_stream(client)
+
+    client.post('/api/todos/batch', json=[{'title': 'a'}, {'title': 'b'}])
+    client.patch('/api/todos/batch', json=[{'id': 2, 'title': 'B'}, {'id': 99, 'title': 'none'}])
+    client.delete('/api/todos/batch', json={'filter': {'min_id': 1}})
+
+    assert read_events(stream, 5) == [
+        ('1:1', 'created', {'id': 1, 'title': 'a', 'version': 1}),
+        ('1:2', 'created', {'id': 2, 'title': 'b', 'version': 1}),
+        ('2:2', 'updated', {'id': 2, 'title': 'B', 'version': 2}),
+        ('3:1', 'deleted', {'id': 1, 'title': None, 'version': 3}),
+        ('3:2', 'deleted', {'id': 2, 'title': None, 'version': 3}),
+    ]
+    response.close()
+
+
+def test_large_batch_publishes_reset(tmp_path):
+    """Test a batch above TODOS_EVENTS_MAX_BATCH sends one stored reset event instead of its todos."""
+    app = make_app(tmp_path, TODOS_EVENTS_BROKER='database', TODOS_EVENTS_MAX_BATCH=2)
+    client = app.test_client()
+    response, stream = open_stream(client)
+
+    client.post('/api/todos/batch', json=[{'title': title} for title in 'abc'])
+    client.patch('/api/todos/batch', json=[{'id': 1, 'title': 'A'}])
+
+    assert read_events(stream, 2) == [
+        ('1:0', 'reset', {}),
+        ('2:1', 'updated', {'id': 1, 'title': 'A', 'version': 2}),
+    ]
+    response.close()
+    app.extensions['todo_events'].stop()
+
+
+def test_import_publishes_events(tmp_path):
+    """Test each imported chunk pushes its created events, or a reset when it is too large."""
+    app = make_app(TODOS_EVENTS_MAX_BATCH=2)
+    client = app.test_client()
+    response, stream = open_stream(client)
+    path = tmp_path / 'todos.ndjson'
+    path.write_text(''.join(json.dumps({'title': title}) + '\n' for title in 'abcde'))
+
+    result = app.test_cli_runner().invoke(args=['todos', 'import', str(path), '--chunk-size', '3'])
+
+    assert result.exit_code == 0, result.output
+    assert read_events(stream, 3) == [
+        ('1:0', 'reset', {}),
+        ('2:4', 'created', {'id': 4, 'title': 'd', 'version': 2}),
+        ('2:5', 'created', {'id': 5, 'title': 'e', 'version': 2}),
+    ]
+    response.close()
+
+
+def test_asgi_batch_writes_publish_events():
+    """Test the async API's batch endpoints publish the same events as the Flask ones."""
+    app = create_asgi_app(config_class=TestingConfig)
+
+    async def create_tables():
+        async with app.state.engine.begin() as connection:
+            await connection.run_sync(db.metadata.create_all)
+
+    with TestClient(app) as client:
+        client.portal.call(create_tables)
+        client.post('/api/todos/batch', json=[{'title': 'a'}, {'title': 'b'}])
+        client.patch('/api/todos/batch', json=[{'id': 2, 'title': 'B'}])
+        client.request('DELETE', '/api/todos/batch', json={'ids': [1, 99]})
+
+        events, complete = app.state.flask_app.extensions['todo_events'].replay((0, 0))
+
+    assert complete
+    assert [(event.id, event.type, event.title) for event in events] == [
+        ('1:1', 'created', 'a'), ('1:2', 'created', 'b'), ('2:2', 'updated', 'B'), ('3:1', 'deleted', None),
+    ]
+
+
+def test_asgi_stream_pushes_writes():
+    """Test the async API streams its own writes without a thread per stream."""
+    app = create_asgi_app(config_class=TestingConfig)
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+             'scheme': 'http', 'path': '/api/todos/events', 'raw_path': b'/api/todos/events',
+             'query_string': b'', 'root_path': '', 'headers': [], 'client': ('test', 1),
+             'server': ('test', 80)}
+
+    async def create_tables():
+        async with app.state.engine.begin() as connection:
+            await connection.run_sync(db.metadata.create_all)
+
+    async def read_stream():
+        chunks, done, requested = [], asyncio.Event(), False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            chunks.append(message.get('body', b'').decode())
+            if len(parse(''.join(chunks))) == 2:
+                done.set()
+
+        await app(scope, receive, send)
+        return parse(''.join(chunks))
+
+    with TestClient(app) as client:
+        client.portal.call(create_tables)
+        stream = client.portal.start_task_soon(read_stream)
+        while not app.state.flask_app.extensions['todo_events'].stats()['subscribers']:
+            time.sleep(0.01)
+        client.post('/api/todos/', json={'title': 'a'})
+        client.delete('/api/todos/1')
+
+        assert stream.result(timeout=5) == [
+            ('1:1', 'created', {'id': 1, 'title': 'a', 'version': 1}),
+            ('2:1', 'deleted', {'id': 1, 'title': None, 'version': 2}),
+        ]
+
+
+def test_events_disabled():
+    """Test TODOS_EVENTS_ENABLED=False turns the stream into a 404."""
+    app = make_app(TODOS_EVENTS_ENABLED=False)
+
+    assert app.test_client().get('/api/todos/events').status_code == 404
+    assert app.test_client().get('/api/events').get_json() == {'status': 'disabled'}
+
+
+def test_parse_event_id():
+    """Test only version:todo_id pairs are accepted as Last-Event-ID."""
+    assert parse_event_id('12:3') == (12, 3)
+    for value in (None, '', '12', 'a:b', '1:2:3', '-1:2'):
+        assert parse_event_id(value) is None
+
+
+def test_broker_must_implement_published():
+    """Test a broker without a publish step cannot be created."""
+    with pytest.raises(TypeError):
+        EventBroker()
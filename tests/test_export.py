@@ -0,0 +1,53 @@
+# tests/test_export.py
+
+import csv
+import gzip
+import json
+import sqlite3
+
+from scripts.db_data_collection_and_export import export_tables
+
+
+def make_database(path):
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE todos (id INTEGER PRIMARY KEY, title VARCHAR(255) NOT NULL);
+        CREATE TABLE tags (todo_id INTEGER, name VARCHAR(50), PRIMARY KEY (todo_id, name));
+        CREATE TABLE events (message TEXT);
+    """)
+    connection.executemany("INSERT INTO todos (title) VALUES (?)", [(f"Todo {i}",) for i in range(25)])
+    connection.executemany("INSERT INTO tags VALUES (?, ?)",
+                           [(todo_id, name) for todo_id in (1, 2, 3) for name in ("a", "b", "c")])
+    connection.executemany("INSERT INTO events VALUES (?)", [(f"event {i}",) for i in range(7)])
+    connection.commit()
+    connection.close()
+    return f"sqlite:///{path}"
+
+
+def test_export_ndjson_in_key_chunks(tmp_path):
+    """Test every row of every table is written once, in key order, across chunk boundaries."""
+    uri = make_database(tmp_path / "source.db")
+
+    results = export_tables(uri, tmp_path / "out", chunk_size=4, workers=2)
+
+    assert {result["table"]: result["rows"] for result in results} == {"events": 7, "tags": 9, "todos": 25}
+    with open(tmp_path / "out" / "todos.ndjson") as f:
+        todos = [json.loads(line) for line in f]
+    assert todos == [{"id": i + 1, "title": f"Todo {i}"} for i in range(25)]
+    with open(tmp_path / "out" / "tags.ndjson") as f:
+        tags = [(row["todo_id"], row["name"]) for row in map(json.loads, f)]
+    assert tags == sorted(tags) and len(set(tags)) == 9
+
+
+def test_export_csv_gzip(tmp_path):
+    """Test CSV output has a header row and can be gzip-compressed."""
+    uri = make_database(tmp_path / "source.db")
+
+    [result] = export_tables(uri, tmp_path / "out", tables=["todos"], fmt="csv", compress=True,
+                             chunk_size=10)
+
+    assert result["path"].endswith("todos.csv.gz")
+    with gzip.open(result["path"], "rt", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["id", "title"]
+    assert rows[1:] == [[str(i + 1), f"Todo {i}"] for i in range(25)]
@@ -0,0 +1,172 @@
+# tests/test_group_commit.py
+
+import threading
+
+import pytest
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models import TableVersion, Todo
+
+
+def make_app(tmp_path, interval=0.05, max_batch=100):
+    class GroupCommitConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'group_commit.db'}"
+        TODOS_GROUP_COMMIT_ENABLED = True
+        TODOS_GROUP_COMMIT_INTERVAL = interval
+        TODOS_GROUP_COMMIT_MAX_BATCH = max_batch
+
+    app = create_app(config_class=GroupCommitConfig)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def post_concurrently(app, titles):
+    """POST every title from its own thread at once; returns the responses in title order."""
+    responses = [None] * len(titles)
+    barrier = threading.Barrier(len(titles))
+
+    def post(index):
+        client = app.test_client()
+        barrier.wait()
+        responses[index] = client.post('/api/todos/', json={'title': titles[index]})
+
+    threads = [threading.Thread(target=post, args=(index,)) for index in range(len(titles))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def test_group_commit_batches_concurrent_creates(tmp_path):
+    """Test concurrent POSTs share commits and each get their own committed id."""
+    app = make_app(tmp_path)
+    titles = [f'Todo {index}' for index in range(20)]
+
+    responses = post_concurrently(app, titles)
+
+    assert [response.status_code for response in responses] == [201] * 20
+    assert [response.get_json()['title'] for response in responses] == titles
+    ids = [response.get_json()['id'] for response in responses]
+    assert len(set(ids)) == 20
+    with app.app_context():
+        assert {todo.id: todo.title for todo in Todo.query} == dict(zip(ids, titles))
+        assert TableVersion.current(Todo.__tablename__) == app.extensions['group_commit'].batches
+    stats = app.extensions['group_commit'].stats()
+    assert stats['items'] == 20
+    assert stats['batches'] < 20
+    app.extensions['group_commit'].stop()
+
+
+def test_group_commit_respects_max_batch_size(tmp_path):
+    """Test no batch holds more than TODOS_GROUP_COMMIT_MAX_BATCH titles."""
+    app = make_app(tmp_path, max_batch=3)
+
+    responses = post_concurrently(app, [f'Todo {index}' for index in range(10)])
+
+    assert all(response.status_code == 201 for response in responses)
+    stats = app.extensions['group_commit'].stats()
+    assert stats['largest_batch'] <= 3
+    assert stats['batches'] >= 4
+    app.extensions['group_commit'].stop()
+
+
+def test_group_commit_failed_row_only_fails_its_own_request(tmp_path):
+    """Test a batch with a bad row is retried so the other titles still commit."""
+    app = make_app(tmp_path, interval=0.2)
+    committer = app.extensions['group_commit']
+
+    good = committer.submit('Good')
+    bad = committer.submit(None)  # violates NOT NULL
+    also_good = committer.submit('Also good')
+
+    assert isinstance(good.result(5), int)
+    assert isinstance(also_good.result(5), int)
+    with pytest.raises(Exception):
+        bad.result(5)
+    assert committer.stats()['failed_batches'] == 1
+    with app.app_context():
+        assert sorted(todo.title for todo in Todo.query) == ['Also good', 'Good']
+    committer.stop()
+
+
+def test_group_commit_does_not_retry_a_committed_batch(tmp_path):
+    """Test a failure publishing a committed batch's events neither retries nor fails its titles."""
+    app = make_app(tmp_path, interval=0.2)
+
+    def fail(events):
+        raise RuntimeError('publish failed')
+
+    app.extensions['todo_events'].published = fail
+    committer = app.extensions['group_commit']
+
+    futures = [committer.submit(title) for title in ('One', 'Two', 'Three')]
+
+    assert all(isinstance(future.result(5), int) for future in futures)
+    assert committer.stats()['failed_batches'] == 0
+    with app.app_context():
+        assert sorted(todo.title for todo in Todo.query) == ['One', 'Three', 'Two']
+    committer.stop()
+
+
+def test_group_commit_timeout_does_not_create_the_todo(tmp_path):
+    """Test a create that times out in the queue answers 503 and is never written."""
+    app = make_app(tmp_path, interval=0.3)
+    app.config['TODOS_GROUP_COMMIT_TIMEOUT'] = 0.01
+    committer = app.extensions['group_commit']
+    queued = committer.submit('Queued')
+
+    response = app.test_client().post('/api/todos/', json={'title': 'Timed out'})
+
+    assert response.status_code == 503
+    assert isinstance(queued.result(5), int)
+    committer.stop()
+    with app.app_context():
+        assert [todo.title for todo in Todo.query] == ['Queued']
+    assert committer.stats()['items'] == 1
+
+
+def test_group_commit_timeout_waits_for_a_started_batch(tmp_path):
+    """Test a create whose batch is already committing when it times out still gets its id."""
+    app = make_app(tmp_path, interval=0.001)
+    committer = app.extensions['group_commit']
+    started, commit = threading.Event(), committer._commit
+
+    def slow_commit(titles):
+        started.set()
+        threading.Event().wait(0.5)
+        return commit(titles)
+
+    committer._commit = slow_commit
+
+    todo_id = committer.create('Slow', timeout=0.1)
+
+    assert started.is_set()
+    with app.app_context():
+        assert db.session.get(Todo, todo_id).title == 'Slow'
+    committer.stop()
+
+
+def test_group_commit_batch_sizes_in_metrics(tmp_path):
+    """Test achieved batch sizes are exported at /api/metrics and /api/group-commit."""
+    app = make_app(tmp_path, interval=0.001)
+    client = app.test_client()
+    client.post('/api/todos/', json={'title': 'Only one'})
+
+    body = client.get('/api/metrics').get_data(as_text=True)
+    assert 'todo_group_commit_batch_size_bucket{le="1"} 1' in body
+    assert 'todo_group_commit_batch_size_count 1' in body
+
+    data = client.get('/api/group-commit').get_json()
+    assert data['status'] == 'enabled'
+    assert data['batches'] == 1
+    assert data['mean_batch_size'] == 1
+    app.extensions['group_commit'].stop()
+
+
+def test_group_commit_disabled_by_default(client):
+    """Test creation commits inline unless group commit is enabled."""
+    assert client.get('/api/group-commit').get_json() == {'status': 'disabled'}
+    assert client.post('/api/todos/', json={'title': 'Inline'}).status_code == 201
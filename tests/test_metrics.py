@@ -0,0 +1,99 @@
+# tests/test_metrics.py
+
+import os
+import subprocess
+import sys
+
+from app import create_app
+from app.config import TestingConfig
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample(body, name, **labels):
+    """Return the value of sample ``name`` with ``labels`` from a scrape."""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    prefix = f'{name}{{{label_text}}} ' if labels else f'{name} '
+    for line in body.splitlines():
+        if line.startswith(prefix):
+            return float(line.split()[-1])
+    return None
+
+
+def test_metrics_content_type(client):
+    """Test the scrape endpoint serves the Prometheus text format."""
+    response = client.get('/api/metrics')
+
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+
+
+def test_metrics_count_requests_per_endpoint(client):
+    """Test requests are counted per endpoint, method and status."""
+    client.get('/api/')
+    client.get('/api/helloworld/')
+    client.get('/api/helloworld/')
+    client.get('/api/todos/99999')
+    client.get('/api/todos/99999/')
+
+    body = client.get('/api/metrics').get_data(as_text=True)
+    assert sample(body, 'http_requests_total',
+                  endpoint='HelloWorld', method='GET', status='200') == 2
+    assert sample(body, 'http_requests_total',
+                  endpoint='MainResource', method='GET', status='200') == 1
+    assert sample(body, 'http_requests_total',
+                  endpoint='TodoResource', method='GET', status='404') == 2
+
+
+def test_metrics_latency_and_size_histograms(client):
+    """Test latency and response size histograms are observed."""
+    client.get('/api/helloworld/')
+
+    body = client.get('/api/metrics').get_data(as_text=True)
+    labels = dict(endpoint='HelloWorld', method='GET', status='200')
+    assert sample(body, 'http_request_duration_seconds_count', **labels) == 1
+    assert sample(body, 'http_request_duration_seconds_bucket', **labels, le='+Inf') == 1
+    assert sample(body, 'http_response_size_bytes_sum', **labels) > 0
+
+
+def test_metrics_in_flight_returns_to_zero(client):
+    """Test the in-flight gauge only counts the scrape being served."""
+    client.get('/api/')
+
+    body = client.get('/api/metrics').get_data(as_text=True)
+    assert sample(body, 'http_requests_in_flight') == 1
+
+
+def test_metrics_disabled():
+    """Test the endpoint 404s when metrics are switched off."""
+    class NoMetricsConfig(TestingConfig):
+        METRICS_ENABLED = False
+
+    client = create_app(config_class=NoMetricsConfig).test_client()
+
+    assert client.get('/api/metrics').status_code == 404
+
+
+WORKER = """
+from app import create_app
+client = create_app(config_class='app.config.TestingConfig').test_client()
+for _ in range({requests}):
+    client.get('/api/helloworld/')
+{scrape}
+"""
+
+
+def test_metrics_aggregate_across_processes(tmp_path):
+    """Test counts from several worker processes are summed in one scrape."""
+    workers = 2
+    env = dict(os.environ, METRICS_MULTIPROC_DIR=str(tmp_path))
+    for _ in range(workers):
+        subprocess.run([sys.executable, '-c', WORKER.format(requests=3, scrape='')],
+                       cwd=ROOT, env=env, check=True, capture_output=True)
+
+    scrape = "print(client.get('/api/metrics').get_data(as_text=True))"
+    result = subprocess.run([sys.executable, '-c', WORKER.format(requests=0, scrape=scrape)],
+                            cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+
+    assert sample(result.stdout, 'http_requests_total',
+                  endpoint='HelloWorld', method='GET', status='200') == 3 * workers
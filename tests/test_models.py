@@ -0,0 +1,97 @@
+# tests/test_models.py
+
+from sqlalchemy import delete, false
+
+from app import db
+from app.models import TableVersion, Todo
+
+
+def test_bulk_insert_returns_ids(app):
+    """Test bulk_insert returns one id per title, in order."""
+    ids = Todo.bulk_insert(['a', 'b', 'c'])
+    db.session.commit()
+
+    assert [Todo.query.get(todo_id).title for todo_id in ids] == ['a', 'b', 'c']
+
+
+def test_bulk_insert_without_returning(app, monkeypatch):
+    """Test the flush fallback used by dialects without executemany RETURNING."""
+    monkeypatch.setattr(Todo, '_bulk_returning_supported', staticmethod(lambda session: False))
+    ids = Todo.bulk_insert(['x', 'y'])
+    db.session.commit()
+
+    assert [Todo.query.get(todo_id).title for todo_id in ids] == ['x', 'y']
+
+
+def test_bulk_insert_empty(app):
+    """Test bulk_insert with no titles is a no-op."""
+    assert Todo.bulk_insert([]) == []
+
+
+def test_search_terms():
+    """Test free text is split into plain words."""
+    assert Todo.search_terms('Buy "milk", NEAR(bread)*') == ['Buy', 'milk', 'NEAR', 'bread']
+
+
+def test_search_statement_uses_fts_index(app):
+    """Test SQLite searches go through the FTS5 index rather than scanning todos."""
+    statement = Todo.search_statement(['milk'], Todo.id, Todo.title)
+    compiled = statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+
+    plan = ' '.join(row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {compiled}')))
+
+    assert 'todos_fts VIRTUAL TABLE' in plan
+    assert 'SCAN todos' not in plan.replace('SCAN todos_fts', '')
+
+
+def test_changes_statement_uses_version_indexes(app):
+    """Test a page of changes seeks both version indexes in order and cuts each side to the page size."""
+    for since, after_id in ((10, 5), (10, None), (None, None)):
+        statement = Todo.changes_statement(since, after_id, limit=100)
+        compiled = statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+
+        plan = [row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {compiled}'))]
+
+        assert any('todos USING INDEX ix_todos_version' in step for step in plan), plan
+        assert any('todo_tombstones USING COVERING INDEX ix_todo_tombstones_version' in step
+                   for step in plan), plan
+        # Only the merge of the two bounded sides is sorted
+        assert [step for step in plan if 'TEMP B-TREE' in step] == ['USE TEMP B-TREE FOR ORDER BY']
+        assert plan[-1] == 'USE TEMP B-TREE FOR ORDER BY'
+        assert str(compiled).count('LIMIT 100') == 3
+
+
+def test_table_version_is_seeded_with_the_table(app):
+    """Test creating the tables seeds the todos counter, so the first bump is a plain UPDATE."""
+    assert db.session.get(TableVersion, Todo.__tablename__).version == 0
+
+    assert Todo.next_change_version() == 1
+
+
+def test_table_version_bump_recreates_a_missing_counter(app):
+    """Test a bump without a counter row creates it in a savepoint and keeps counting from there."""
+    db.session.execute(delete(TableVersion))
+    db.session.commit()
+
+    assert TableVersion.bump(Todo.__tablename__) == 1
+    assert TableVersion.bump(Todo.__tablename__) == 2
+    db.session.commit()
+    assert TableVersion.current(Todo.__tablename__) == 2
+
+
+def test_table_version_bump_survives_a_concurrent_seed(app, monkeypatch):
+    """Test a bump that finds no counter, but loses the race to create it, increments the winner's."""
+    bump_statement = TableVersion.bump_statement.__func__
+    calls = []
+
+    def first_misses(cls, name):
+        calls.append(name)
+        statement = bump_statement(cls, name)
+        return statement.where(false()) if len(calls) == 1 else statement
+
+    monkeypatch.setattr(TableVersion, 'bump_statement', classmethod(first_misses))
+
+    assert TableVersion.bump(Todo.__tablename__) == 1
+    assert len(calls) == 2
+    db.session.commit()
+    assert TableVersion.current(Todo.__tablename__) == 1
@@ -0,0 +1,47 @@
+# tests/test_pool.py
+
+import pytest
+from sqlalchemy import create_engine, exc
+
+from app.pool import MeteredQueuePool, pool_status
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Engine with a single-connection metered pool and a short timeout."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=MeteredQueuePool,
+                           pool_size=1, max_overflow=0, pool_timeout=0.05)
+    yield engine
+    engine.dispose()
+
+
+def test_metered_pool_counts_checkouts_and_connects(engine):
+    """Test checkouts and new connections are counted."""
+    for _ in range(3):
+        with engine.connect():
+            pass
+
+    status = pool_status(engine)
+    assert status['checkouts'] == 3
+    assert status['connections_opened'] == 1
+    assert status['checked_out'] == 0
+
+
+def test_metered_pool_records_timeouts(engine):
+    """Test an exhausted pool records the timeout and the time spent waiting."""
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    status = pool_status(engine)
+    assert status['timeouts'] == 1
+    assert status['wait_time_max_ms'] >= 40
+
+
+def test_metered_pool_counts_closed_connections(engine):
+    """Test connections closed by the pool count towards churn."""
+    with engine.connect():
+        pass
+    engine.pool.dispose()
+
+    assert engine.pool.stats.connections_closed == 1
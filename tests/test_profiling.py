@@ -0,0 +1,102 @@
+# tests/test_profiling.py
+
+import logging
+import re
+
+import pytest
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.profiling import RequestProfile
+
+
+def query_count(response):
+    """Return the statement count reported in the Server-Timing header."""
+    return int(re.search(r'desc="(\d+) queries"', response.headers['Server-Timing']).group(1))
+
+
+@pytest.fixture
+def strict_app():
+    """Application that warns as soon as a statement repeats within a request."""
+    class StrictConfig(TestingConfig):
+        SQL_REPEAT_WARNING_THRESHOLD = 2
+
+    app = create_app(config_class=StrictConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_server_timing_without_queries(client):
+    """Test endpoints without database access report zero statements."""
+    response = client.get('/api/helloworld/')
+
+    assert query_count(response) == 0
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+
+
+def test_server_timing_counts_statements(client, sample_todo):
+    """Test a single todo lookup is counted as one statement."""
+    response = client.get(f'/api/todos/{sample_todo}')
+
+    assert query_count(response) == 1
+
+
+def test_batch_create_is_constant_in_statements(client):
+    """Test a bulk insert does not issue one statement per row."""
+    client.post('/api/todos/batch', json=[{'title': 'warm-up'}])  # creates the version row
+    small = client.post('/api/todos/batch', json=[{'title': 'x'}] * 2)
+    large = client.post('/api/todos/batch', json=[{'title': 'x'}] * 50)
+
+    assert query_count(large) == query_count(small)
+
+
+def test_repeated_statement_warns(strict_app, caplog):
+    """Test the re-SELECT issued by PUT after its commit is flagged."""
+    client = strict_app.test_client()
+    todo_id = client.post('/api/todos/', json={'title': 'Original'}).get_json()['id']
+
+    with caplog.at_level(logging.WARNING, logger='app.profiling'):
+        client.put(f'/api/todos/{todo_id}', json={'title': 'Updated'})
+
+    assert any('Possible N+1 query' in record.message for record in caplog.records)
+
+
+def test_no_warning_below_threshold(client, sample_todo, caplog):
+    """Test ordinary requests stay below the default threshold."""
+    with caplog.at_level(logging.WARNING, logger='app.profiling'):
+        client.get(f'/api/todos/{sample_todo}')
+
+    assert not caplog.records
+
+
+def test_debug_log_summary(client, sample_todo, caplog):
+    """Test the per-request summary is logged at debug level."""
+    with caplog.at_level(logging.DEBUG, logger='app.profiling'):
+        client.get(f'/api/todos/{sample_todo}')
+
+    assert any('1 queries' in record.message for record in caplog.records)
+
+
+def test_request_profile_tracks_slowest():
+    """Test the slowest statement and repeats are tracked."""
+    profile = RequestProfile()
+    profile.record('SELECT 1', 0.001)
+    profile.record('SELECT 2', 0.005)
+    profile.record('SELECT 1', 0.002)
+
+    assert profile.count == 3
+    assert profile.slowest_statement == 'SELECT 2'
+    assert profile.repeated(2) == [('SELECT 1', 2)]
+
+
+def test_profiling_disabled():
+    """Test no Server-Timing header is added when profiling is off."""
+    class NoProfilingConfig(TestingConfig):
+        SQL_PROFILING_ENABLED = False
+
+    client = create_app(config_class=NoProfilingConfig).test_client()
+
+    assert 'Server-Timing' not in client.get('/api/').headers
@@ -0,0 +1,181 @@
+# tests/test_replicas.py
+
+import threading
+
+import pytest
+from flask import g
+from sqlalchemy import create_engine, insert
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models import Todo
+
+
+def make_database(path, title):
+    """A SQLite file with the app's schema and one todo titled after its role."""
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Todo), [{'title': title}])
+    engine.dispose()
+    return f"sqlite:///{path}"
+
+
+def make_app(tmp_path, replica_uris=None, **settings):
+    primary = make_database(tmp_path / 'primary.db', 'primary')
+    if replica_uris is None:
+        replica_uris = [make_database(tmp_path / f'replica_{name}.db', f'replica {name}')
+                        for name in ('a', 'b')]
+
+    class ReplicaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = primary
+        SQLALCHEMY_REPLICA_URIS = replica_uris
+        DB_REPLICA_RETRY_INTERVAL = 30
+
+    for name, value in settings.items():
+        setattr(ReplicaConfig, name, value)
+    return create_app(config_class=ReplicaConfig)
+
+
+def title(client, **headers):
+    return client.get('/api/todos/1', headers=headers).get_json()['title']
+
+
+def test_reads_round_robin_across_replicas(tmp_path):
+    """Test read-only views alternate between the replicas."""
+    client = make_app(tmp_path).test_client()
+
+    assert [title(client) for _ in range(4)] == ['replica a', 'replica b'] * 2
+    assert client.get('/api/todos/').get_json() == [{'id': 1, 'title': 'replica a'}]
+
+
+def test_writes_go_to_primary_and_stick_reads_there(tmp_path):
+    """Test a write lands on the primary and its client then reads the primary."""
+    app = make_app(tmp_path)
+    writer = app.test_client()
+
+    response = writer.post('/api/todos/', json={'title': 'new'})
+
+    assert response.status_code == 201
+    assert 'recent_write=1' in response.headers['Set-Cookie']
+    assert writer.get(f"/api/todos/{response.get_json()['id']}").get_json()['title'] == 'new'
+    assert title(writer) == 'primary'
+    assert title(app.test_client()).startswith('replica')
+
+
+def test_read_primary_header(tmp_path):
+    """Test X-Read-Primary forces a single read onto the primary."""
+    client = make_app(tmp_path).test_client()
+
+    assert title(client, **{'X-Read-Primary': '1'}) == 'primary'
+    assert title(client).startswith('replica')
+
+
+def test_cache_is_filled_from_the_primary_only(tmp_path):
+    """Test todos read from a replica are not cached, and primary-pinned reads bypass the cache."""
+    app = make_app(tmp_path, TODOS_CACHE_ENABLED=True)
+    client = app.test_client()
+    cache = app.extensions['todo_cache']
+
+    assert title(client) == 'replica a'
+    assert title(client, **{'X-Read-Primary': '1'}) == 'primary'
+    assert title(client) == 'replica b'
+    assert cache.stats()['size'] == 0
+
+    for replica in app.extensions['replicas'].replicas:
+        replica.ejected_until = float('inf')
+    assert title(client) == 'primary'
+    assert cache.stats()['size'] == 1
+    # A pinned read still goes to the primary itself, not through the cache
+    assert title(client, **{'X-Read-Primary': '1'}) == 'primary'
+    assert cache.stats()['hits'] == 0
+
+
+def test_least_connections_picks_idle_replica(tmp_path):
+    """Test least-connections balancing avoids the replica with a request in flight."""
+    app = make_app(tmp_path, DB_REPLICA_BALANCING='least_connections')
+    router = app.extensions['replicas']
+
+    with app.app_context():
+        busy = router.acquire()
+        with app.app_context():  # a second request, with its own g
+            assert router.acquire() is not busy
+            router.release()
+        router.release()
+
+    assert [replica.in_flight for replica in router.replicas] == [0, 0]
+
+
+def test_failed_replica_is_ejected_and_readmitted(tmp_path):
+    """Test a replica that cannot connect is ejected, reads retry elsewhere, and it comes back."""
+    missing = tmp_path / 'missing'
+    app = make_app(tmp_path, replica_uris=[f"sqlite:///{missing / 'replica.db'}"],
+                   DB_REPLICA_RETRY_INTERVAL=0)
+    client = app.test_client()
+
+    assert title(client) == 'primary'
+    [replica] = client.get('/api/replicas').get_json()['replicas']
+    assert replica['failures'] == 1
+    assert replica['healthy'] is False
+
+    missing.mkdir()
+    make_database(missing / 'replica.db', 'recovered')
+
+    assert title(client) == 'recovered'
+    assert client.get('/api/replicas').get_json()['replicas'][0]['healthy'] is True
+
+
+def test_query_error_does_not_eject_replica(tmp_path):
+    """Test an error that is not a lost connection propagates and leaves the replica in rotation."""
+    empty = tmp_path / 'empty.db'
+    create_engine(f"sqlite:///{empty}").dispose()
+    app = make_app(tmp_path, replica_uris=[f"sqlite:///{empty}"])
+    client = app.test_client()
+
+    with pytest.raises(OperationalError):
+        client.get('/api/todos/1')
+
+    [replica] = client.get('/api/replicas').get_json()['replicas']
+    assert replica['failures'] == 0
+    assert replica['healthy'] is True
+
+
+def test_ejected_replica_is_probed_once_outside_the_lock(tmp_path):
+    """Test one request probes a due replica while others keep being routed to the healthy ones."""
+    app = make_app(tmp_path, DB_REPLICA_RETRY_INTERVAL=0)
+    router = app.extensions['replicas']
+    ejected, healthy = router.replicas
+    router.eject(ejected)
+    probing, resume = threading.Event(), threading.Event()
+    probes = []
+
+    def slow_probe(replica):
+        probes.append(replica)
+        probing.set()
+        resume.wait(5)
+        with router._lock:
+            replica.ejected_until, replica.probing = None, False
+
+    router._probe = slow_probe
+
+    def acquire():
+        with app.test_request_context():
+            router.acquire()
+
+    prober = threading.Thread(target=acquire)
+    prober.start()
+    assert probing.wait(5)
+    with app.test_request_context():
+        assert router.acquire() is healthy
+    resume.set()
+    prober.join()
+
+    assert probes == [ejected]
+    assert ejected.ejected_until is None
+
+
+def test_replicas_disabled_by_default(client):
+    """Test all queries use the primary when no replica is configured."""
+    assert client.get('/api/replicas').get_json() == {'status': 'disabled'}
+    assert g.get('_db_replica') is None
@@ -0,0 +1,328 @@
+# tests/test_sharding.py
+
+import itertools
+
+import pytest
+from sqlalchemy import create_engine, inspect, select
+
+from app import create_app, db
+from app.asgi import create_asgi_app
+from app.config import TestingConfig
+from app.models import TableVersion, Todo, TodoTombstone
+
+TITLES = ['pear', 'apple', 'Banana', 'fig', 'apple', 'kiwi', 'date', 'fig', 'cherry', 'plum',
+          'grape', 'lime']
+
+
+def make_app(tmp_path, name, shards=0, **settings):
+    class ShardConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / f'{name}.db'}"
+        TODOS_SHARD_URIS = [f"sqlite:///{tmp_path / f'{name}_shard_{index}.db'}"
+                            for index in range(shards)]
+        TODOS_SHARD_ID_BLOCK_SIZE = 5
+        TODOS_EVENTS_ENABLED = False
+
+    for setting, value in settings.items():
+        setattr(ShardConfig, setting, value)
+    app = create_app(config_class=ShardConfig)
+    with app.app_context():
+        db.create_all()
+        if shards:
+            app.extensions['todo_shards'].create_all()
+    return app
+
+
+def shard_ids(tmp_path, name, index, model=Todo):
+    """Ids stored on one shard, read straight from its database file."""
+    engine = create_engine(f"sqlite:///{tmp_path / f'{name}_shard_{index}.db'}")
+    with engine.connect() as connection:
+        ids = connection.scalars(select(model.id).order_by(model.id)).all()
+    engine.dispose()
+    return ids
+
+
+def stamp(path):
+    """The todos version stamp stored in the database file at ``path``."""
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as connection:
+        version = connection.scalar(TableVersion.current_statement(Todo.__tablename__))
+    engine.dispose()
+    return version
+
+
+def drain(client, url, limit=2):
+    """Read the change feed from ``url`` page by page; returns the (op, id, title) changes and the final since."""
+    response = client.get(f'{url}{"&" if "?" in url else "?"}limit={limit}')
+    changes = []
+    while True:
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        changes += [(change['op'], change['id'], change['title']) for change in body['changes']]
+        if not body['has_more']:
+            assert 'X-Next-Cursor' not in response.headers
+            return sorted(changes), body['since']
+        response = client.get(response.headers['Link'].split('>')[0][1:])
+
+
+@pytest.fixture
+def clients(tmp_path):
+    """Test clients of an unsharded app and of an app sharding todos over three databases."""
+    return (make_app(tmp_path, 'single').test_client(),
+            make_app(tmp_path, 'sharded', shards=3).test_client())
+
+
+def both(clients, method, url, **kwargs):
+    """Send the same request to both apps and check they answer alike."""
+    single, sharded = (getattr(client, method)(url, **kwargs) for client in clients)
+    assert (sharded.status_code, sharded.get_json(silent=True)) == (single.status_code,
+                                                          single.get_json(silent=True)), url
+    for header in ('X-Next-Cursor', 'Link'):
+        assert sharded.headers.get(header) == single.headers.get(header), url
+    return sharded
+
+
+def test_todos_are_spread_over_shards(tmp_path):
+    """Test each todo is stored on the shard its id hashes to, and nowhere else."""
+    app = make_app(tmp_path, 'sharded', shards=3)
+    client = app.test_client()
+    for title in TITLES:
+        client.post('/api/todos/', json={'title': title})
+    shards = app.extensions['todo_shards']
+
+    stored = [shard_ids(tmp_path, 'sharded', index) for index in range(3)]
+
+    assert all(stored)
+    assert sorted(itertools.chain(*stored)) == list(range(1, len(TITLES) + 1))
+    for index, ids in enumerate(stored):
+        assert all(shards.shard_of(todo_id) == index for todo_id in ids)
+    engine = create_engine(f"sqlite:///{tmp_path / 'sharded.db'}")
+    with engine.connect() as connection:
+        assert connection.scalars(select(Todo.id)).all() == []
+    engine.dispose()
+    assert [shard['url'] for shard in client.get('/api/shards').get_json()['shards']] == [
+        f"sqlite:///{tmp_path / f'sharded_shard_{index}.db'}" for index in range(3)]
+
+
+def test_single_todo_crud_matches_unsharded(clients):
+    """Test creating, reading, updating and deleting single todos answers as without shards."""
+    for title in TITLES:
+        both(clients, 'post', '/api/todos/', json={'title': title})
+    for todo_id in (1, 5, len(TITLES) + 1):
+        both(clients, 'get', f'/api/todos/{todo_id}')
+        both(clients, 'put', f'/api/todos/{todo_id}', json={'title': f'renamed {todo_id}'})
+        both(clients, 'get', f'/api/todos/{todo_id}')
+    both(clients, 'delete', '/api/todos/3')
+    both(clients, 'get', '/api/todos/3')
+    both(clients, 'delete', '/api/todos/3')
+
+
+def test_listings_match_unsharded(clients):
+    """Test every sort, order, filter and page of the merged listing equals the unsharded one."""
+    both(clients, 'post', '/api/todos/batch', json=[{'title': title} for title in TITLES])
+    filters = ['', '&title_prefix=a', '&min_id=3&max_id=10', '&fields=id']
+    for sort, order, criteria in itertools.product(('id', 'title'), ('asc', 'desc'), filters):
+        url = f'/api/todos/?sort={sort}&order={order}{criteria}'
+        both(clients, 'get', url)
+        response = both(clients, 'get', f'{url}&limit=5')
+        while 'X-Next-Cursor' in response.headers:
+            response = both(clients, 'get', response.headers['Link'].split('>')[0][1:])
+
+
+def test_mixed_case_titles_merge_in_code_point_order(clients):
+    """Test titles differing only by case sort alike on every shard, merged and paged."""
+    titles = ['apple', 'Banana', 'banana', 'Apple', 'cherry', 'Zed', 'apple', 'BANANA', 'zed', 'Cherry']
+    created = both(clients, 'post', '/api/todos/batch', json=[{'title': title} for title in titles])
+    ids = {todo['id']: todo['title'] for todo in created.get_json()['created']}
+
+    for order in ('asc', 'desc'):
+        expected = sorted(ids, key=lambda todo_id: (ids[todo_id], todo_id), reverse=order == 'desc')
+        listing = both(clients, 'get', f'/api/todos/?sort=title&order={order}')
+        listed = [todo['id'] for todo in listing.get_json()]
+        response = both(clients, 'get', f'/api/todos/?sort=title&order={order}&limit=3')
+        paged = [todo['id'] for todo in response.get_json()]
+        while 'X-Next-Cursor' in response.headers:
+            response = both(clients, 'get', response.headers['Link'].split('>')[0][1:])
+            paged += [todo['id'] for todo in response.get_json()]
+        assert listed == paged == expected
+    prefixed = both(clients, 'get', '/api/todos/?sort=title&title_prefix=B').get_json()
+    assert [todo['title'] for todo in prefixed] == ['BANANA', 'Banana']
+
+
+def test_fast_serializer_listing_matches_unsharded(clients):
+    """Test the fast serializer's merged listing equals the unsharded one."""
+    for client in clients:
+        client.application.config['TODOS_FAST_SERIALIZER'] = True
+    both(clients, 'post', '/api/todos/batch', json=[{'title': title} for title in TITLES])
+
+    both(clients, 'get', '/api/todos/?limit=4&after_id=2')
+    both(clients, 'get', '/api/todos/?sort=title&order=desc&limit=4')
+
+
+def test_batches_and_changes_match_unsharded(clients):
+    """Test batch writes reach every shard and the change feed is unchanged by sharding."""
+    both(clients, 'post', '/api/todos/batch', json=[{'title': title} for title in TITLES])
+    both(clients, 'patch', '/api/todos/batch',
+         json=[{'id': 2, 'title': 'two'}, {'id': 7, 'title': 'seven'}, {'id': 99, 'title': 'none'}])
+    both(clients, 'delete', '/api/todos/batch', json={'ids': [1, 4, 8, 99]})
+    both(clients, 'delete', '/api/todos/batch', json={'filter': {'title_prefix': 'f'}})
+    both(clients, 'delete', '/api/todos/batch', json={'filter': {'min_id': 10}})
+
+    both(clients, 'get', '/api/todos/')
+    # Versions are per shard, so compare the changes themselves, paged and in one go
+    (changes, single_since), (sharded_changes, sharded_since) = (drain(client, '/api/todos/changes')
+                                                                 for client in clients)
+    assert sharded_changes == changes
+    assert drain(clients[1], '/api/todos/changes', limit=100)[0] == changes
+
+    both(clients, 'put', '/api/todos/2', json={'title': 'second'})
+    both(clients, 'delete', '/api/todos/3')
+    for client, since in zip(clients, (single_since, sharded_since)):
+        # Sharded ids come in blocks, so each app has its own
+        created = client.post('/api/todos/batch', json=[{'title': 'new'}]).get_json()['created']
+        assert drain(client, f'/api/todos/changes?since={since}')[0] == [
+            ('delete', 3, None), ('upsert', 2, 'second'), ('upsert', created[0]['id'], 'new')]
+
+
+def test_each_shard_has_its_own_version_stamp(tmp_path):
+    """Test a write bumps the stamp of the shard it lands on only, and the collection ETag with it."""
+    app = make_app(tmp_path, 'sharded', shards=2)
+    client = app.test_client()
+    shards = app.extensions['todo_shards']
+    client.post('/api/todos/batch', json=[{'title': title} for title in TITLES])
+    etag = client.get('/api/todos/').headers['ETag']
+
+    stamps = [stamp(tmp_path / f'sharded_shard_{index}.db') for index in range(2)]
+    client.put('/api/todos/1', json={'title': 'renamed'})
+
+    assert stamps == [1, 1]
+    assert stamp(tmp_path / 'sharded.db') == 0
+    assert [stamp(tmp_path / f'sharded_shard_{index}.db') for index in range(2)] == [
+        stamps[index] + (index == shards.shard_of(1)) for index in range(2)]
+    assert client.get('/api/todos/', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_cache_follows_every_shard_stamp(tmp_path):
+    """Test a worker's cache drops a todo another worker changed, whichever shard holds it."""
+    reader = make_app(tmp_path, 'sharded', shards=2, TODOS_CACHE_ENABLED=True).test_client()
+    writer = make_app(tmp_path, 'sharded', shards=2).test_client()
+    writer.post('/api/todos/batch', json=[{'title': title} for title in TITLES])
+    for todo_id in (1, 2):
+        assert reader.get(f'/api/todos/{todo_id}').get_json()['title'] == TITLES[todo_id - 1]
+
+    for todo_id in (1, 2):
+        writer.put(f'/api/todos/{todo_id}', json={'title': f'renamed {todo_id}'})
+        assert reader.get(f'/api/todos/{todo_id}').get_json()['title'] == f'renamed {todo_id}'
+
+
+def test_sharded_change_feed_token(tmp_path):
+    """Test the sharded feed's since token resumes every shard, and malformed tokens are refused."""
+    client = make_app(tmp_path, 'sharded', shards=3).test_client()
+    client.post('/api/todos/batch', json=[{'title': title} for title in TITLES])
+
+    first = client.get('/api/todos/changes?limit=4')
+    body = first.get_json()
+
+    assert body['has_more'] and body['since'] == first.headers['X-Next-Cursor']
+    assert len(body['since'].split('.')) == 3
+    rest, since = drain(client, f"/api/todos/changes?since={body['since']}")
+    seen = sorted((change['op'], change['id'], change['title']) for change in body['changes'])
+    assert sorted(seen + rest) == drain(client, '/api/todos/changes')[0]
+    assert client.get(f'/api/todos/changes?since={since}').get_json()['changes'] == []
+    for bad in ('1', '1.2', '1.2.x', '1.2.-2', '1:2:3.1.1'):
+        assert client.get(f'/api/todos/changes?since={bad}').status_code == 400, bad
+    assert client.get(f'/api/todos/changes?since={since}&after_id=1').status_code == 400
+
+
+def test_tombstones_live_on_the_todo_shard(tmp_path):
+    """Test a deleted todo's tombstone is stored with the shard that held it."""
+    app = make_app(tmp_path, 'sharded', shards=2)
+    client = app.test_client()
+    client.post('/api/todos/batch', json=[{'title': title} for title in TITLES])
+
+    client.delete('/api/todos/batch', json={'ids': [1, 2, 3, 4]})
+
+    shards = app.extensions['todo_shards']
+    for index in range(2):
+        assert shard_ids(tmp_path, 'sharded', index, TodoTombstone) == [
+            todo_id for todo_id in (1, 2, 3, 4) if shards.shard_of(todo_id) == index]
+
+
+def test_ids_are_unique_across_workers(tmp_path):
+    """Test two apps sharing the primary hand out distinct ids, one block at a time."""
+    first = make_app(tmp_path, 'sharded', shards=2)
+    second = make_app(tmp_path, 'sharded', shards=2)
+
+    ids = []
+    for _ in range(3):
+        for app in (first, second):
+            with app.app_context():
+                ids.extend(app.extensions['todo_shards'].allocate_ids(4))
+
+    assert len(set(ids)) == len(ids)
+    assert ids[:4] == [1, 2, 3, 4]
+    assert ids[4:8] == [6, 7, 8, 9]
+
+
+def test_unsupported_listings_are_refused(tmp_path):
+    """Test full-text search and NDJSON streaming are refused when sharded."""
+    client = make_app(tmp_path, 'sharded', shards=2).test_client()
+
+    assert client.get('/api/todos/?q=apple').status_code == 400
+    assert client.get('/api/todos/?stream=true').status_code == 400
+    assert client.get('/api/todos/', headers={'Accept': 'application/x-ndjson'}).status_code == 400
+
+
+def test_sharding_refuses_unsupported_setups(tmp_path):
+    """Test sharding cannot be combined with read replicas, the group commit, events, the async API or
+    databases other than SQLite and MySQL."""
+    with pytest.raises(ValueError):
+        make_app(tmp_path, 'sharded', shards=2, SQLALCHEMY_REPLICA_URIS=['sqlite://'])
+    with pytest.raises(ValueError):
+        make_app(tmp_path, 'sharded', shards=2, TODOS_GROUP_COMMIT_ENABLED=True)
+    with pytest.raises(ValueError):
+        make_app(tmp_path, 'sharded', shards=2, TODOS_EVENTS_ENABLED=True)
+    # Their title collations sort by locale, not in the merge's code point order
+    with pytest.raises(ValueError):
+        make_app(tmp_path, 'sharded', TODOS_SHARD_URIS=['postgresql://localhost/todos'])
+
+    class AsyncShardConfig(TestingConfig):
+        TODOS_SHARD_URIS = [f"sqlite:///{tmp_path / 'shard.db'}"]
+
+    with pytest.raises(ValueError):
+        create_asgi_app(config_class=AsyncShardConfig)
+
+
+def test_cli_imports_into_shards(tmp_path):
+    """Test the import command routes rows to shards, skips kept ids and refuses checkpoints."""
+    app = make_app(tmp_path, 'sharded', shards=2)
+    runner = app.test_cli_runner()
+    path = tmp_path / 'todos.csv'
+    path.write_text('title\n' + '\n'.join(TITLES) + '\n')
+
+    assert runner.invoke(args=['todos', 'import', str(path), '--chunk-size', '5']).exit_code == 0
+    result = runner.invoke(args=['todos', 'import', '-', '--format', 'ndjson', '--keep-ids'],
+                           input='{"id": 40, "title": "kept"}\n')
+    assert result.exit_code == 0, result.output
+
+    stored = sorted(shard_ids(tmp_path, 'sharded', 0) + shard_ids(tmp_path, 'sharded', 1))
+    assert stored == list(range(1, len(TITLES) + 1)) + [40]
+    refused = runner.invoke(args=['todos', 'import', str(path), '--checkpoint', 'nightly'])
+    assert refused.exit_code != 0 and '--checkpoint' in refused.output
+    with app.app_context():
+        assert app.extensions['todo_shards'].allocate_ids(1)[0] > 40
+
+
+def test_cli_init_shards(tmp_path):
+    """Test init-shards creates the sharded tables, and needs TODOS_SHARD_URIS."""
+    app = make_app(tmp_path, 'fresh', shards=0, TODOS_SHARD_URIS=[f"sqlite:///{tmp_path / 'new.db'}"])
+
+    result = app.test_cli_runner().invoke(args=['todos', 'init-shards'])
+
+    assert result.exit_code == 0
+    assert 'ready on 1 shards' in result.output
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    assert {'todos', 'todo_tombstones', 'table_versions'} <= set(inspect(engine).get_table_names())
+    engine.dispose()
+
+    unsharded = make_app(tmp_path, 'single').test_cli_runner().invoke(args=['todos', 'init-shards'])
+    assert unsharded.exit_code != 0
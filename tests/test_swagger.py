@@ -0,0 +1,82 @@
+# tests/test_swagger.py
+
+import json
+
+from flask_restx import Resource
+
+from app.swagger import routes_fingerprint
+
+
+def test_swagger_spec_is_served_with_cache_headers(client):
+    """Test /swagger.json carries an ETag and a public max-age."""
+    response = client.get('/swagger.json')
+
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'public, max-age=3600'
+    assert '/api/todos/' in response.get_json()['paths']
+
+
+def test_swagger_spec_revalidates_with_etag(client):
+    """Test a matching If-None-Match gets 304 without a body."""
+    etag = client.get('/swagger.json').headers['ETag']
+
+    response = client.get('/swagger.json', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_compressed_swagger_spec_revalidates(client):
+    """Test the weak ETag of the gzipped spec still gets a 304."""
+    response = client.get('/swagger.json', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+
+    response = client.get('/swagger.json', headers={'Accept-Encoding': 'gzip',
+                                                    'If-None-Match': response.headers['ETag']})
+
+    assert response.status_code == 304
+
+
+def test_swagger_spec_is_built_once(app, client):
+    """Test repeated fetches reuse the encoded spec."""
+    spec = app.extensions['swagger_spec']
+
+    first = client.get('/swagger.json').data
+    second = client.get('/swagger.json').data
+
+    assert first == second
+    assert spec.builds == 1
+
+
+def test_swagger_spec_rebuilds_when_routes_change(app):
+    """Test registering a new route invalidates the cached spec."""
+    spec = app.extensions['swagger_spec']
+    with app.test_request_context():
+        _, etag = spec.spec()
+    before = routes_fingerprint(app)
+
+    namespace = spec.api.namespace('extra', path='/api/extra')
+
+    @namespace.route('/')
+    class ExtraResource(Resource):
+        def get(self):
+            return {}
+
+    with app.test_request_context():
+        body, new_etag = spec.spec()
+
+    assert routes_fingerprint(app) != before
+    assert new_etag != etag
+    assert '/api/extra/' in json.loads(body)['paths']
+    assert spec.builds == 2
+
+
+def test_swagger_spec_write(app, tmp_path):
+    """Test the spec can be emitted to a static file matching the served ETag."""
+    path = tmp_path / 'swagger.json'
+
+    etag = app.extensions['swagger_spec'].write(path)
+
+    assert json.loads(path.read_text())['info']['title'] == 'Todo Management API'
+    assert app.test_client().get('/swagger.json').headers['ETag'] == f'"{etag}"'